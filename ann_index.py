@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+근사 최근접 검색(ANN) 인덱스 모듈
+대규모 갤러리(수만~수십만 명)에서 전수 비교 대신 IVF(역색인) 방식으로 후보만 비교
+
+    1. k-means로 갤러리를 nlist개 군집(리스트)으로 나눔 (순수 NumPy)
+    2. 쿼리와 가까운 군집 nprobe개를 고르고 (nprobe ↑ → 재현율 ↑, 지연 ↑)
+    3. 그 군집에 속한 후보들과 정확한 유클리드 거리로 재순위(re-rank)
+
+군집 중심과 행별 군집 번호는 DB 옆 <db>.ivf.npz 파일에 세대 번호와 함께 저장하여
+다음 실행에서는 학습 없이 바로 사용 (새로 등록된 얼굴만 가까운 군집에 배정)
+
+사용법 (인식 시작 전에 미리 학습):
+    python ann_index.py --db face_recognition.db
+    python ann_index.py --model arcface    # 임베딩 모델마다 인덱스 파일이 따로 있음
+"""
+import os
+import time
+import numpy as np
+from face_index import FaceIndex, best_of, empty_topk, squared_norms, top_k
+
+IVF_SUFFIX = ".ivf.npz"
+DEFAULT_NPROBE = 8
+KMEANS_ITERATIONS = 10
+TRAIN_POINTS_PER_LIST = 32  # 군집당 학습 표본 수
+ASSIGN_CHUNK = 4096  # 군집 배정 시 한 번에 처리할 행 수 (메모리 제한)
+
+
+def ivf_path(db_name, tag=None):
+    """
+    DB 파일 경로 → IVF 인덱스 파일 경로 (face_recognition.db → face_recognition.ivf.npz)
+
+    tag를 주면 같은 DB의 다른 갤러리용 경로 (예: arcface → face_recognition.arcface.ivf.npz)
+    """
+    base = os.path.splitext(db_name)[0]
+    if tag:
+        base += f".{tag}"
+    return base + IVF_SUFFIX
+
+
+def choose_nlist(count):
+    """갤러리 크기에 맞는 군집 수 (약 2·√N, 군집당 최소 표본 수 보장)"""
+    return int(max(1, min(2 * np.sqrt(count), count // TRAIN_POINTS_PER_LIST)))
+
+
+def assign_to_centroids(encodings, centroids):
+    """각 행을 가장 가까운 군집 중심에 배정 → (N,) int32"""
+    index = FaceIndex(centroids)
+    assignments = np.empty(len(encodings), dtype=np.int32)
+    for start in range(0, len(encodings), ASSIGN_CHUNK):
+        chunk = encodings[start:start + ASSIGN_CHUNK]
+        assignments[start:start + len(chunk)] = index.search(chunk)[0]
+    return assignments
+
+
+def train_kmeans(encodings, nlist, iterations=KMEANS_ITERATIONS, seed=0):
+    """
+    k-means 군집 중심 학습 (표본 추출 + Lloyd 반복)
+
+    Args:
+        encodings: (N, dim) 갤러리 (np.memmap 가능)
+        nlist: 군집 수
+
+    Returns:
+        (nlist, dim) float32 군집 중심
+    """
+    rng = np.random.default_rng(seed)
+    count = len(encodings)
+    nlist = min(nlist, count)
+    sample_size = min(count, nlist * TRAIN_POINTS_PER_LIST)
+    # 정렬된 위치로 읽어야 memmap에서 순차 접근이 됨
+    sample = np.asarray(encodings[np.sort(rng.choice(count, sample_size, replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = assign_to_centroids(sample, centroids)
+
+        # 군집별 합계: 군집 번호로 정렬한 뒤 구간별로 더함
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=nlist)
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts[nonempty])[:-1]))
+        centroids[nonempty] = np.add.reduceat(sample[order], starts, axis=0) / counts[nonempty, None]
+
+        # 빈 군집은 임의의 표본으로 다시 시작
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = sample[rng.choice(sample_size, len(empty), replace=False)]
+
+    return centroids
+
+
+def match_stored_ids(stored_ids, ids):
+    """
+    저장된 id 배열에서 ids 각각의 위치 찾기 (정렬 후 이진 탐색)
+
+    Returns:
+        (found (N,) bool, positions (found.sum(),) 저장된 배열에서의 위치)
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if len(stored_ids) == 0:
+        return np.zeros(len(ids), dtype=bool), np.empty(0, dtype=np.intp)
+    order = np.argsort(stored_ids)
+    sorted_ids = stored_ids[order]
+    pos = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    found = sorted_ids[pos] == ids
+    return found, order[pos[found]]
+
+
+def save_ivf(path, centroids, ids, assignments, generation):
+    """IVF 인덱스 파일을 원자적으로 저장 (임시 파일 작성 후 os.replace)"""
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                centroids=np.asarray(centroids, dtype=np.float32),
+                ids=np.asarray(ids, dtype=np.int64),
+                assignments=np.asarray(assignments, dtype=np.int32),
+                generation=np.int64(generation)
+            )
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_ivf(path):
+    """IVF 인덱스 파일 읽기 (없거나 손상되었으면 None)"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            return {
+                "centroids": data["centroids"],
+                "ids": data["ids"],
+                "assignments": data["assignments"],
+                "generation": int(data["generation"])
+            }
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[WARN] IVF 인덱스 로드 실패: {e}")
+        return None
+
+
+class IVFIndex:
+    """
+    IVF 근사 검색 인덱스 (FaceIndex와 같은 search() 인터페이스)
+
+    LiveGallery의 뷰 하나에 묶이며, 뷰가 바뀌면 update()로 새 인덱스를 만듦
+    (행이 뒤에 추가되기만 한 경우 새 행만 군집에 배정)
+    """
+
+    def __init__(self, centroids, encodings, sq_norms, assignments, ids, nprobe=DEFAULT_NPROBE, source_ids=None):
+        """
+        Args:
+            centroids: (nlist, dim) 군집 중심
+            encodings: (N, dim) 갤러리 (뷰의 버퍼, 복사하지 않음)
+            sq_norms: (N,) 행별 노름 제곱 (삭제된 행은 inf)
+            assignments: (N,) 행별 군집 번호
+            ids: 행별 얼굴 id 목록 (N개)
+            nprobe: 쿼리마다 살펴볼 군집 수
+            source_ids: ids를 잘라 온 LiveGallery 공유 목록 (다음 뷰에서 배정 재사용 판단용)
+        """
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.encodings = encodings
+        self.sq_norms = sq_norms
+        self.assignments = assignments
+        self.ids = ids
+        self.source_ids = ids if source_ids is None else source_ids
+        self.count = len(assignments)
+        self.nprobe = max(1, min(nprobe, len(self.centroids)))
+        self._centroid_norms = squared_norms(self.centroids)
+
+        # 군집별 행 목록: 군집 번호로 정렬한 행 순서 + 군집 시작 위치
+        self._order = np.argsort(assignments, kind="stable")
+        self._offsets = np.searchsorted(assignments[self._order], np.arange(len(self.centroids) + 1))
+
+    @classmethod
+    def from_view(cls, view, centroids, nprobe=DEFAULT_NPROBE, previous=None, stored=None):
+        """
+        GalleryView로 인덱스 생성
+
+        Args:
+            previous: 이전 뷰의 IVFIndex (같은 행 순서면 배정 재사용)
+            stored: load_ivf() 결과 (id가 같은 행은 저장된 배정 재사용)
+        """
+        encodings = view.encodings
+        sq_norms = view.sq_norms
+        if view.dead_count:
+            sq_norms = np.where(view.alive, sq_norms, np.float32(np.inf))
+        # view.ids는 watcher 스레드가 계속 늘리는 공유 목록이므로 뷰 행 수만큼만 사용
+        ids = view.ids[:view.count]
+
+        if previous is not None and previous.source_ids is view.ids and previous.count <= view.count:
+            # 뒤에 추가된 행만 배정
+            assignments = np.concatenate((
+                previous.assignments,
+                assign_to_centroids(encodings[previous.count:], centroids)
+            ))
+        else:
+            assignments = np.empty(view.count, dtype=np.int32)
+            missing = np.ones(view.count, dtype=bool)
+            if stored is not None:
+                # 저장된 id와 같은 행은 저장된 배정 재사용
+                found, positions = match_stored_ids(stored["ids"], ids)
+                assignments[found] = stored["assignments"][positions]
+                missing = ~found
+            if missing.any():
+                rows = np.flatnonzero(missing)
+                assignments[rows] = assign_to_centroids(encodings[rows], centroids)
+
+        return cls(centroids, encodings, sq_norms, assignments, ids, nprobe, source_ids=view.ids)
+
+    def update(self, view):
+        """새 뷰에 맞춘 인덱스 (군집 중심은 그대로 사용)"""
+        return IVFIndex.from_view(view, self.centroids, self.nprobe, previous=self)
+
+    def __len__(self):
+        return self.count
+
+    def search_topk(self, queries, k):
+        """
+        쿼리마다 가까운 nprobe개 군집의 후보와 정확한 거리 비교
+
+        Returns:
+            FaceIndex.search_topk()와 같음 (indices (M, k), distances (M, k))
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.centroids.shape[1])
+        count = len(queries)
+        indices, distances = empty_topk(count, k)
+        if count == 0 or self.count == 0:
+            return indices, distances
+
+        # 1단계: 군집 중심과의 거리 (GEMM 한 번) → 가까운 nprobe개 군집
+        query_norms = squared_norms(queries)
+        centroid_distances = self._centroid_norms - 2.0 * (queries @ self.centroids.T)
+        if self.nprobe < len(self.centroids):
+            probes = np.argpartition(centroid_distances, self.nprobe - 1, axis=1)[:, :self.nprobe]
+        else:
+            probes = np.broadcast_to(np.arange(len(self.centroids)), centroid_distances.shape)
+
+        # 2단계: 후보 행과 정확한 거리로 재순위
+        for i in range(count):
+            candidates = np.concatenate([self._order[self._offsets[c]:self._offsets[c + 1]] for c in probes[i]])
+            if len(candidates) == 0:
+                continue
+
+            sq_distances = self.sq_norms[candidates] - 2.0 * (self.encodings[candidates] @ queries[i])
+            sq_distances += query_norms[i]
+            np.maximum(sq_distances, 0.0, out=sq_distances)
+
+            columns, distances[i] = top_k(sq_distances[None, :], k)
+            indices[i] = candidates[columns[0]]
+            distances[i, columns[0] >= len(candidates)] = np.inf
+
+        return indices, distances
+
+    def search(self, queries):
+        """
+        쿼리마다 최근접 행 찾기
+
+        Returns:
+            FaceIndex.search()와 같음 (best_indices, best_distances, margins)
+        """
+        return best_of(*self.search_topk(queries, 2))
+
+
+def load_or_train(path, view, nprobe=DEFAULT_NPROBE, nlist=None):
+    """
+    저장된 IVF 인덱스를 불러오거나 (없으면) 학습해서 뷰에 맞춘 인덱스 반환
+
+    뷰와 저장된 배정이 다르면 (새 등록/삭제) 갱신된 배정을 다시 저장
+    """
+    stored = load_ivf(path)
+    dim = view.encodings.shape[1]
+    if stored is not None and stored["centroids"].shape[1] != dim:
+        stored = None
+
+    if stored is None:
+        live_rows = np.flatnonzero(view.alive)
+        nlist = nlist or choose_nlist(len(live_rows))
+        print(f"[INFO] IVF 인덱스 학습 중... ({len(live_rows)}명, 군집 {nlist}개)")
+        start_time = time.time()
+        centroids = train_kmeans(view.encodings[live_rows], nlist)
+        print(f"[INFO] IVF 인덱스 학습 완료 ({time.time() - start_time:.1f}초)")
+    else:
+        centroids = stored["centroids"]
+
+    index = IVFIndex.from_view(view, centroids, nprobe, stored=stored)
+
+    if stored is None or stored["generation"] != view.generation:
+        alive = np.asarray(view.alive, dtype=bool)
+        save_ivf(path, centroids, np.asarray(index.ids, dtype=np.int64)[alive],
+                 index.assignments[alive], view.generation)
+    return index
+
+
+def main():
+    import argparse
+    from database import DEFAULT_EMBEDDING_MODEL, EMBEDDING_MODELS, FaceDatabase
+    from live_gallery import LiveGallery
+
+    parser = argparse.ArgumentParser(description="IVF 근사 검색 인덱스 학습")
+    parser.add_argument("--db", default="face_recognition.db", help="DB 파일 경로")
+    parser.add_argument("--model", choices=sorted(EMBEDDING_MODELS), default=DEFAULT_EMBEDDING_MODEL,
+                        help="인덱스를 만들 임베딩 모델의 갤러리")
+    parser.add_argument("--nlist", type=int, default=None, help="군집 수 (기본: 약 2·√N)")
+    parser.add_argument("--rebuild", action="store_true", help="기존 인덱스를 지우고 다시 학습")
+    args = parser.parse_args()
+
+    db = FaceDatabase(args.db, embedding_model=args.model)
+    try:
+        path = ivf_path(args.db, db.gallery_tag)
+        if args.rebuild and os.path.exists(path):
+            os.remove(path)
+
+        view = LiveGallery(db).view
+        if view.size == 0:
+            print("[WARN] 등록된 얼굴이 없습니다")
+            return 1
+        index = load_or_train(path, view, nlist=args.nlist)
+        print(f"[INFO] ✅ IVF 인덱스: {len(index)}명, 군집 {len(index.centroids)}개 → {path}")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+사진 폴더 일괄 등록 도구
+CSV(이름, 학번, 학과, 학년, 사진 경로)와 사진 폴더를 받아
+프로세스 풀에서 얼굴 감지/인코딩을 병렬로 수행하고 큰 트랜잭션 단위로 DB에 저장
+(인코딩은 DB의 임베딩 모델 엔진으로 계산하고, 나중에 모델을 바꿀 수 있도록 얼굴 사진도 함께 저장)
+감지는 인식 화면과 같은 감지기 레지스트리(detector_registry)를 사용하고 (작업 프로세스마다 한 번 로드),
+감지기의 5점 랜드마크를 임베딩 엔진과 등록 사진에 그대로 전달해 실시간 인식과 같은 방식으로 정렬
+
+사용법:
+    python bulk_enroll.py students.csv photos/ --workers 4 --detector auto --report failures.csv
+
+CSV 형식 (첫 줄은 헤더):
+    name,student_id,department,grade,image
+    홍길동,20240001,컴퓨터공학과,1,20240001.jpg
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from gallery_analysis import DUPLICATE_THRESHOLD, find_close_pairs
+
+CSV_COLUMNS = ("name", "student_id", "department", "grade", "image")
+COMMIT_SIZE = 500  # 트랜잭션당 등록 수
+
+# 실패 사유
+NO_FACE = "no_face"
+MULTIPLE_FACES = "multiple_faces"
+DUPLICATE_ID = "duplicate_student_id"
+DUPLICATE_FACE = "duplicate_face"  # 다른 학번으로 이미 등록된 (또는 같은 CSV의) 같은 얼굴
+MISSING_FIELD = "missing_field"
+IMAGE_ERROR = "image_error"
+
+
+def read_roster_csv(csv_path):
+    """CSV 읽기 → (행 번호, {name, student_id, department, grade, image}) 목록"""
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        rows = []
+        for line_number, record in enumerate(reader, start=2):
+            rows.append((line_number, {key: (record.get(key) or "").strip() for key in CSV_COLUMNS}))
+    return rows
+
+
+# 작업 프로세스 상태 (_init_worker에서 프로세스마다 한 번 설정)
+_worker = {}
+
+
+def _init_worker(detector, upsample_times, det_size, embedding_model, dlib_landmarks, store_crops):
+    """
+    프로세스 풀 초기화: 감지기/임베딩 엔진을 작업 프로세스마다 한 번만 로드
+
+    Args:
+        detector: 감지기 선택 ('auto', 'retinaface', 'yolo', 'hog', DetectorRegistry.get()과 같음)
+        upsample_times: HOG 업샘플 횟수
+        det_size: RetinaFace 입력 크기
+        embedding_model: 임베딩 모델
+        dlib_landmarks: dlib 정렬에 감지기 랜드마크 사용 (인식 화면 설정과 같아야 함)
+        store_crops: 등록 사진 저장 여부
+    """
+    from detector_registry import DetectorRegistry
+    from embedding_engine import get_engine
+
+    engine = get_engine(embedding_model)
+    if engine.name == "dlib":
+        engine.use_landmarks = dlib_landmarks
+    _worker["detector"] = DetectorRegistry(upsample_times, det_size).get(detector)
+    _worker["engine"] = engine
+    _worker["store_crops"] = store_crops
+
+
+def _encode_image(task):
+    """
+    프로세스 풀 작업: 사진 한 장에서 얼굴 감지 + 인코딩
+
+    Returns:
+        (line_number, encoding 또는 None, 등록 사진 또는 None, 실패 사유 또는 None)
+    """
+    import face_recognition
+    from embedding_engine import make_crop
+
+    line_number, image_path = task
+    try:
+        image = face_recognition.load_image_file(image_path)
+        faces = _worker["detector"].detect(image)
+    except Exception as e:
+        return line_number, None, None, f"{IMAGE_ERROR}: {e}"
+
+    if len(faces) == 0:
+        return line_number, None, None, NO_FACE
+    if len(faces) > 1:
+        return line_number, None, None, MULTIPLE_FACES
+
+    encoding = _worker["engine"].embed(image, faces)[0]
+    crop = None
+    if _worker["store_crops"]:
+        crop = make_crop(image, faces[0], None if faces.landmarks is None else faces.landmarks[0])
+    return line_number, encoding, crop, None
+
+
+def find_duplicate_faces(db, student_ids, encodings, threshold=DUPLICATE_THRESHOLD):
+    """
+    새 인코딩 묶음의 중복 얼굴 검사 (등록된 갤러리 + 묶음 내부)
+
+    Returns:
+        {묶음 내 번호: 같은 얼굴로 의심되는 학번}
+    """
+    queries = np.asarray(encodings, dtype=np.float32)
+    duplicates = {}
+
+    gallery = db.load_gallery()
+    if len(gallery["ids"]):
+        rows, cols, _ = find_close_pairs(gallery["encodings"], threshold, queries=queries)
+        for row, col in zip(rows, cols):
+            duplicates.setdefault(int(row), gallery["student_ids"][col])
+
+    # 묶음 안에서는 뒤쪽 행을 중복으로 처리
+    rows, cols, _ = find_close_pairs(queries, threshold)
+    for row, col in zip(rows, cols):
+        if int(row) not in duplicates:
+            duplicates.setdefault(int(col), student_ids[row])
+    return duplicates
+
+
+def bulk_enroll(db, csv_path, image_dir, workers=None, detector="auto", upsample_times=1,
+                commit_size=COMMIT_SIZE, progress=None, duplicate_threshold=DUPLICATE_THRESHOLD,
+                store_crops=True, det_size=640, dlib_landmarks=False):
+    """
+    CSV + 사진 폴더 일괄 등록
+
+    Args:
+        db: FaceDatabase
+        csv_path: 명단 CSV 경로
+        image_dir: 사진 폴더 (CSV의 image 열은 이 폴더 기준 상대 경로)
+        workers: 프로세스 수 (None이면 CPU 수)
+        detector: 감지기 선택 ('auto', 'retinaface', 'yolo', 'hog', 인식 화면의 detector_type과 같음)
+        upsample_times: HOG 업샘플링 횟수
+        commit_size: 트랜잭션당 등록 수
+        progress: progress(처리한 행 수, 전체 행 수) 콜백
+        duplicate_threshold: 이 거리 미만으로 가까운 얼굴이 있으면 등록하지 않음 (None이면 검사 안 함,
+                             db.embedding_model의 거리 기준이므로 보통 db.duplicate_threshold)
+        store_crops: 얼굴 사진을 함께 저장 (임베딩 모델을 바꿀 때 다시 계산하는 원본)
+        det_size: RetinaFace 입력 크기
+        dlib_landmarks: dlib 정렬에 감지기 랜드마크 사용 (인식 화면의 dlib_detector_landmarks와 같아야 함)
+
+    Returns:
+        (등록 수, [(행 번호, 학번, 실패 사유), ...])
+    """
+    rows = read_roster_csv(csv_path)
+    records = dict(rows)
+    failures = []
+    tasks = []
+    seen_ids = set()
+
+    # 인코딩 전에 걸러낼 수 있는 행 (빈 칸, 중복 학번)
+    for line_number, record in rows:
+        student_id = record["student_id"]
+        if not all(record.values()):
+            failures.append((line_number, student_id, MISSING_FIELD))
+        elif student_id in seen_ids or db.exists(student_id):
+            failures.append((line_number, student_id, DUPLICATE_ID))
+        else:
+            seen_ids.add(student_id)
+            image_path = os.path.join(image_dir, record["image"])
+            tasks.append((line_number, image_path))
+
+    total = len(rows)
+    done = len(failures)
+    enrolled = 0
+    pending = []
+
+    def commit():
+        nonlocal enrolled
+        if duplicate_threshold is not None:
+            duplicates = find_duplicate_faces(
+                db, [face[1] for _, face in pending], [face[4] for _, face in pending], duplicate_threshold
+            )
+            for i in sorted(duplicates, reverse=True):
+                line_number, face = pending.pop(i)
+                failures.append((line_number, face[1], f"{DUPLICATE_FACE}: {duplicates[i]}"))
+            if not pending:
+                return
+        
+        skipped = set(db.add_faces([face for _, face in pending]))
+        for line_number, face in pending:
+            if face[1] in skipped:
+                failures.append((line_number, face[1], DUPLICATE_ID))
+            else:
+                enrolled += 1
+        pending.clear()
+
+    initargs = (detector, upsample_times, det_size, db.embedding_model, dlib_landmarks, store_crops)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as executor:
+        # 결과를 순서대로 흘려 받으면서 commit_size마다 저장
+        for line_number, encoding, crop, error in executor.map(_encode_image, tasks, chunksize=8):
+            record = records[line_number]
+            if error is None:
+                pending.append((line_number, (record["name"], record["student_id"],
+                                              record["department"], record["grade"], encoding,
+                                              [crop] if crop is not None else None)))
+                if len(pending) >= commit_size:
+                    commit()
+            else:
+                failures.append((line_number, record["student_id"], error))
+
+            done += 1
+            if progress:
+                progress(done, total)
+
+    if pending:
+        commit()
+
+    failures.sort()
+    return enrolled, failures
+
+
+def write_failure_report(path, failures):
+    """실패 목록을 CSV로 저장"""
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(["line", "student_id", "reason"])
+        writer.writerows(failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="사진 폴더 일괄 얼굴 등록")
+    parser.add_argument("csv_path", help="명단 CSV (name,student_id,department,grade,image)")
+    parser.add_argument("image_dir", help="사진 폴더")
+    parser.add_argument("--db", default="face_recognition.db", help="DB 파일 경로")
+    parser.add_argument("--workers", type=int, default=None, help="프로세스 수 (기본: CPU 수)")
+    parser.add_argument("--detector", choices=["auto", "retinaface", "yolo", "hog"], default="auto",
+                        help="얼굴 감지기 (인식 화면 설정과 같게, 모델 파일이 없으면 다음 감지기로 대체)")
+    parser.add_argument("--upsample", type=int, default=1, help="HOG 업샘플링 횟수 (0-2)")
+    parser.add_argument("--det-size", type=int, default=640, help="RetinaFace 입력 크기")
+    parser.add_argument("--report", help="실패 목록 CSV 저장 경로")
+    parser.add_argument("--duplicate-threshold", type=float, default=None,
+                        help="이 거리 미만으로 가까운 얼굴이 이미 있으면 등록하지 않음 (기본: 임베딩 모델별 값)")
+    parser.add_argument("--allow-duplicate-faces", action="store_true", help="중복 얼굴 검사 생략")
+    parser.add_argument("--embedding", choices=["dlib", "arcface"], default="dlib",
+                        help="임베딩 모델 (인식 화면 설정과 같아야 함)")
+    parser.add_argument("--no-crops", action="store_true", help="얼굴 사진을 저장하지 않음 (모델 변경 시 재등록 필요)")
+    parser.add_argument("--dlib-landmarks", action="store_true",
+                        help="dlib 정렬에 감지기 랜드마크 사용 (인식 화면의 dlib_detector_landmarks를 켰을 때만)")
+    args = parser.parse_args()
+
+    from database import FaceDatabase
+
+    db = FaceDatabase(args.db, embedding_model=args.embedding)
+    duplicate_threshold = args.duplicate_threshold
+    if duplicate_threshold is None:
+        duplicate_threshold = db.duplicate_threshold
+    start_time = time.time()
+
+    def progress(done, total):
+        print(f"\r[INFO] 진행: {done}/{total}", end="", flush=True)
+
+    try:
+        enrolled, failures = bulk_enroll(
+            db, args.csv_path, args.image_dir,
+            workers=args.workers,
+            detector=args.detector,
+            upsample_times=args.upsample,
+            det_size=args.det_size,
+            progress=progress,
+            duplicate_threshold=None if args.allow_duplicate_faces else duplicate_threshold,
+            store_crops=not args.no_crops,
+            dlib_landmarks=args.dlib_landmarks
+        )
+    finally:
+        db.close()
+
+    print()
+    print(f"[INFO] ✅ 등록 완료: {enrolled}명 ({time.time() - start_time:.1f}초)")
+    if failures:
+        print(f"[WARN] 실패: {len(failures)}건")
+        for line_number, student_id, reason in failures:
+            print(f"  - {line_number}행 ({student_id or 'N/A'}): {reason}")
+        if args.report:
+            write_failure_report(args.report, failures)
+            print(f"[INFO] 실패 목록 저장: {args.report}")
+
+    return 0 if not failures else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
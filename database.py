@@ -1,91 +1,1038 @@
 import sqlite3
 import pickle
 import os
+import time
+import threading
+import itertools
+from contextlib import contextmanager
+import numpy as np
+from gallery_snapshot import snapshot_path, write_snapshot, open_snapshot
+import gallery_archive
+import gallery_analysis
+
+# 스키마 버전 (PRAGMA user_version)
+#   0: 인코딩을 pickle BLOB으로 저장 (v2.3.x 이전)
+#   1: 인코딩을 little-endian float32 원시 바이트로 저장
+#   2: 개인별 보정 임계값 열 (match_threshold)
+#   3: 사람별 여러 인코딩(템플릿) 테이블, registered_faces.encoding은 템플릿 평균(중심)
+#   4: 임베딩 모델 태그 열 (registered_faces.embedding_model), 등록 사진(face_crops) 테이블
+SCHEMA_VERSION = 4
+
+# 얼굴 인코딩 저장 형식
+ENCODING_DIM = 128  # dlib 기본 차원
+ENCODING_DTYPE = np.dtype('<f4')
+ENCODING_BYTES = ENCODING_DIM * ENCODING_DTYPE.itemsize
+
+# 🔔 임베딩 모델별 벡터 형식 (embedding_engine의 엔진 이름과 같음)
+#   모델마다 임베딩 공간이 다르므로 행마다 모델을 태그하고, 같은 모델의 행끼리만 비교
+#   normalized: 단위 벡터 모델은 템플릿 평균(중심)도 다시 정규화
+#   duplicate_threshold: 등록 시 중복 얼굴로 의심할 거리
+#   min_threshold / max_threshold: 개인별 보정 임계값 범위 (gallery_analysis calibrate)
+EMBEDDING_MODELS = {
+    "dlib": {"dim": ENCODING_DIM, "normalized": False,
+             "duplicate_threshold": gallery_analysis.DUPLICATE_THRESHOLD,
+             "min_threshold": gallery_analysis.MIN_THRESHOLD,
+             "max_threshold": gallery_analysis.MAX_THRESHOLD},
+    # 단위 벡터 거리 (코사인 유사도 s → √(2 - 2s)), 인식 기본값 1.10 ≈ 유사도 0.4
+    "arcface": {"dim": 512, "normalized": True, "duplicate_threshold": 0.8,
+                "min_threshold": 0.95, "max_threshold": 1.20},
+}
+DEFAULT_EMBEDDING_MODEL = "dlib"
+
+# SQLite 저널 설정 (WAL + NORMAL: 커밋마다 fsync하지 않고 체크포인트에서만 동기화)
+JOURNAL_MODE = "WAL"
+SYNCHRONOUS = "NORMAL"
+BUSY_TIMEOUT = 30.0  # 다른 연결이 쓰기 중일 때 대기할 최대 시간 (초)
+
+# 갤러리 변경 기록(change feed) 보존 개수 (이보다 뒤처진 구독자는 전체 다시 로드)
+GALLERY_CHANGES_KEEP = 10000
+
+# 로그 보존/압축 기본값
+LOG_RETENTION_DAYS = 90        # 원본 로그 보존 기간
+COMPACTION_BATCH_SIZE = 500    # 트랜잭션당 처리할 원본 로그 수
+COMPACTION_INTERVAL = 3600.0   # 백그라운드 압축 주기 (초)
+
+
+def format_timestamp(t):
+    """epoch 초 → SQLite CURRENT_TIMESTAMP와 같은 UTC 문자열"""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(t))
+
+
+def encode_encoding(encoding, dim=ENCODING_DIM):
+    """인코딩 벡터 → float32 원시 바이트 (DB 저장용)"""
+    array = np.ascontiguousarray(encoding, dtype=ENCODING_DTYPE).reshape(-1)
+    if array.size != dim:
+        raise ValueError(f"인코딩 차원 오류: {array.size} (기대값 {dim})")
+    return array.tobytes()
+
+
+def decode_encodings(blobs, dim=ENCODING_DIM):
+    """float32 원시 바이트 목록 → (N, dim) 연속 행렬 (한 번에 변환)"""
+    buffer = b"".join(blobs)
+    return np.frombuffer(buffer, dtype=ENCODING_DTYPE).reshape(-1, dim)
+
+
+def template_matrix(encodings, dim=ENCODING_DIM):
+    """인코딩 하나 (dim,) 또는 여러 장 (k, dim) → (k, dim) float32 템플릿 행렬"""
+    templates = np.asarray(encodings, dtype=np.float32).reshape(-1, dim)
+    if len(templates) == 0:
+        raise ValueError("템플릿이 하나 이상 필요합니다")
+    return templates
+
+
+def template_centroid(templates, model=DEFAULT_EMBEDDING_MODEL):
+    """템플릿 행렬 → 중심 인코딩 (단위 벡터 모델은 평균을 다시 정규화)"""
+    centroid = templates.mean(axis=0)
+    if EMBEDDING_MODELS[model]["normalized"]:
+        norm = np.linalg.norm(centroid)
+        if norm > 0:
+            centroid = centroid / norm
+    return centroid.astype(np.float32)
+
+
+def _crop_rows(face_id, crops):
+    """등록 사진 목록 → face_crops INSERT 행"""
+    rows = []
+    for image, location, landmarks in crops or ():
+        top, right, bottom, left = (int(v) for v in location)
+        landmark_blob = None if landmarks is None else np.asarray(landmarks, dtype=ENCODING_DTYPE).tobytes()
+        rows.append((face_id, sqlite3.Binary(image), top, right, bottom, left, landmark_blob))
+    return rows
+
 
 class FaceDatabase:
-    def __init__(self, db_name="face_recognition.db"):
+    """
+    얼굴 DB (SQLite)
+    
+    연결 구성:
+        - 쓰기: 연결 하나(self.conn)를 락으로 직렬화 (SQLite는 쓰기 트랜잭션이 하나뿐)
+        - 읽기: 스레드마다 전용 연결 (WAL 모드라 쓰기 중에도 막히지 않음)
+    따라서 GUI 스레드의 조회/등록과 로깅 스레드의 기록이 커서를 공유하지 않고 동시에 진행됩니다.
+    """
+    def __init__(self, db_name="face_recognition.db", embedding_model=DEFAULT_EMBEDDING_MODEL):
+        """
+        Args:
+            db_name: DB 파일 경로
+            embedding_model: 인식/등록에 사용할 임베딩 모델 (EMBEDDING_MODELS)
+                             갤러리 조회는 이 모델로 태그된 행만 포함
+        """
         self.db_name = db_name
+        self.set_embedding_model(embedding_model)
         self.conn = None
-        self.cursor = None
+        self._write_lock = threading.RLock()
+        self._local = threading.local()
+        self._readers = {}
+        self._readers_lock = threading.Lock()
+        self._compaction_thread = None
+        self._compaction_stop = threading.Event()
         self.init_database()
     
     def init_database(self):
         """데이터베이스 초기화 및 테이블 생성"""
-        self.conn = sqlite3.connect(self.db_name, check_same_thread=False)
-        self.cursor = self.conn.cursor()
-        
-        # 등록된 얼굴 테이블 (이름, 학번, 학과, 학년 추가)
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS registered_faces (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                student_id TEXT UNIQUE NOT NULL,
-                department TEXT NOT NULL,
-                grade TEXT NOT NULL,
-                encoding BLOB NOT NULL,
-                registered_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # 인식 로그 테이블 (등록된 사람, 미등록 모두 기록)
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS recognition_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                student_id TEXT,
-                is_registered INTEGER NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        self.conn.commit()
-    
-    def add_face(self, name, student_id, department, grade, encoding):
-        """새로운 얼굴 등록 (이름, 학번, 학과, 학년)"""
-        try:
-            encoding_blob = pickle.dumps(encoding)
-            self.cursor.execute(
-                "INSERT INTO registered_faces (name, student_id, department, grade, encoding) VALUES (?, ?, ?, ?, ?)",
-                (name, student_id, department, grade, encoding_blob)
+        self.conn = self._connect()
+        
+        # WAL 모드: 로그 쓰기가 읽기를 막지 않고, 커밋 비용이 낮아짐 (DB 파일에 영구 저장)
+        self.conn.execute(f"PRAGMA journal_mode = {JOURNAL_MODE}")
+        
+        with self._write() as cursor:
+            # 등록된 얼굴 테이블 (이름, 학번, 학과, 학년 추가)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS registered_faces (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    student_id TEXT UNIQUE NOT NULL,
+                    department TEXT NOT NULL,
+                    grade TEXT NOT NULL,
+                    encoding BLOB NOT NULL,
+                    registered_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    match_threshold REAL,  -- 개인별 보정 임계값 (NULL이면 전역 설정 사용)
+                    embedding_model TEXT NOT NULL DEFAULT 'dlib'  -- encoding/템플릿을 만든 임베딩 모델
+                )
+            ''')
+        
+            # 인식 로그 테이블 (등록된 사람, 미등록 모두 기록)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS recognition_logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    student_id TEXT,
+                    is_registered INTEGER NOT NULL,
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+        
+            # 로그 조회용 인덱스 (최신순 페이지 조회, 학번별 조회)
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON recognition_logs (timestamp)"
             )
-            self.conn.commit()
-            return True
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_logs_student_timestamp ON recognition_logs (student_id, timestamp)"
+            )
+        
+            # 재실 구간 테이블 (같은 사람이 머무는 동안은 한 행)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS presence_intervals (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    student_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    first_seen TIMESTAMP NOT NULL,
+                    last_seen TIMESTAMP NOT NULL,
+                    frame_count INTEGER NOT NULL,
+                    best_distance REAL NOT NULL
+                )
+            ''')
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_presence_first_seen ON presence_intervals (first_seen)"
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_presence_student_first_seen ON presence_intervals (student_id, first_seen)"
+            )
+        
+            # 일별 요약 테이블 (보존 기간이 지난 원본 로그를 하루/사람 단위로 집계)
+            #   subject: 등록된 사람은 학번, 미등록은 이름("Unknown")
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS recognition_daily (
+                    day TEXT NOT NULL,
+                    is_registered INTEGER NOT NULL,
+                    subject TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    first_seen TIMESTAMP NOT NULL,
+                    last_seen TIMESTAMP NOT NULL,
+                    PRIMARY KEY (day, is_registered, subject)
+                )
+            ''')
+        
+            # 메타데이터 테이블 (갤러리 세대 번호 등)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS db_meta (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            ''')
+            cursor.execute("INSERT OR IGNORE INTO db_meta (key, value) VALUES ('gallery_generation', 0)")
+            
+            # 갤러리 변경 기록 (seq = 변경 후 갤러리 세대 번호, op = 'add' / 'delete')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS gallery_changes (
+                    seq INTEGER PRIMARY KEY,
+                    op TEXT NOT NULL,
+                    face_id INTEGER NOT NULL
+                )
+            ''')
+            
+            # 🔔 얼굴 템플릿 테이블 (촬영한 인코딩 각각, registered_faces.encoding은 이들의 평균)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS face_templates (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    face_id INTEGER NOT NULL,
+                    encoding BLOB NOT NULL,
+                    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_templates_face_id ON face_templates (face_id)"
+            )
+            
+            # 🔔 등록 사진 테이블 (얼굴 주변을 잘라 JPEG로 저장, 임베딩 모델을 바꿀 때 다시 계산하는 원본)
+            #   box_*: 잘라낸 이미지 안의 얼굴 위치, landmarks: 5점 랜드마크 float32 (없으면 NULL)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS face_crops (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    face_id INTEGER NOT NULL,
+                    image BLOB NOT NULL,
+                    box_top INTEGER NOT NULL,
+                    box_right INTEGER NOT NULL,
+                    box_bottom INTEGER NOT NULL,
+                    box_left INTEGER NOT NULL,
+                    landmarks BLOB,
+                    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_crops_face_id ON face_crops (face_id)"
+            )
+        
+        self._migrate()
+    
+    def _connect(self):
+        """새 SQLite 연결 (스레드 간 전달은 이 클래스가 직접 관리)"""
+        conn = sqlite3.connect(self.db_name, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        conn.execute(f"PRAGMA synchronous = {SYNCHRONOUS}")
+        return conn
+    
+    @contextmanager
+    def _write(self):
+        """쓰기 트랜잭션 커서 (쓰기 연결을 락으로 직렬화, 예외 시 롤백)"""
+        with self._write_lock:
+            cursor = self.conn.cursor()
+            try:
+                yield cursor
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+            finally:
+                cursor.close()
+    
+    def _read(self):
+        """현재 스레드 전용 읽기 연결의 커서 (처음 호출 시 연결 생성)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            conn.execute("PRAGMA query_only = ON")
+            self._local.conn = conn
+            with self._readers_lock:
+                self._prune_readers()
+                self._readers[threading.get_ident()] = conn
+        return conn.cursor()
+    
+    def _prune_readers(self):
+        """종료된 스레드의 읽기 연결 닫기"""
+        alive = {thread.ident for thread in threading.enumerate()}
+        for ident in [ident for ident in self._readers if ident not in alive]:
+            self._readers.pop(ident).close()
+    
+    def _migrate(self):
+        """스키마 버전에 따라 기존 데이터를 순차적으로 변환"""
+        with self._write() as cursor:
+            version = cursor.execute("PRAGMA user_version").fetchone()[0]
+            if version >= SCHEMA_VERSION:
+                return
+            
+            if version < 1:
+                self._migrate_v1_float32_encodings(cursor)
+            if version < 2:
+                self._migrate_v2_match_threshold(cursor)
+            if version < 3:
+                self._migrate_v3_templates(cursor)
+            if version < 4:
+                self._migrate_v4_embedding_model(cursor)
+            
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        print(f"[INFO] 데이터베이스 스키마 업그레이드: v{version} → v{SCHEMA_VERSION}")
+    
+    def _migrate_v1_float32_encodings(self, cursor):
+        """pickle BLOB 인코딩을 float32 원시 바이트로 변환 (최초 1회)"""
+        cursor.execute("SELECT id, encoding FROM registered_faces")
+        updates = []
+        for face_id, blob in cursor.fetchall():
+            if len(blob) == ENCODING_BYTES:
+                continue  # 이미 변환된 행
+            updates.append((encode_encoding(pickle.loads(blob)), face_id))
+        
+        if updates:
+            cursor.executemany("UPDATE registered_faces SET encoding = ? WHERE id = ?", updates)
+            print(f"[INFO] 인코딩 {len(updates)}개를 float32 형식으로 변환했습니다")
+    
+    def _migrate_v2_match_threshold(self, cursor):
+        """개인별 임계값 열 추가 (새 DB는 CREATE TABLE에 이미 있음)"""
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(registered_faces)")]
+        if "match_threshold" not in columns:
+            cursor.execute("ALTER TABLE registered_faces ADD COLUMN match_threshold REAL")
+    
+    def _migrate_v3_templates(self, cursor):
+        """기존 인코딩을 사람별 첫 템플릿으로 복사"""
+        self._copy_missing_templates(cursor)
+    
+    def _migrate_v4_embedding_model(self, cursor):
+        """임베딩 모델 열 추가 (기존 행은 모두 dlib 인코딩)"""
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(registered_faces)")]
+        if "embedding_model" not in columns:
+            cursor.execute(
+                "ALTER TABLE registered_faces ADD COLUMN embedding_model TEXT NOT NULL DEFAULT 'dlib'"
+            )
+    
+    def set_embedding_model(self, embedding_model):
+        """
+        사용할 임베딩 모델 변경 (갤러리 조회/등록 대상이 바뀜)
+        
+        모델마다 스냅샷/검색 인덱스 파일을 따로 둡니다 (dlib은 기존 경로 그대로, gallery_tag).
+        """
+        if embedding_model not in EMBEDDING_MODELS:
+            raise ValueError(f"알 수 없는 임베딩 모델: {embedding_model}")
+        self.embedding_model = embedding_model
+        self.embedding_dim = EMBEDDING_MODELS[embedding_model]["dim"]
+        self.duplicate_threshold = EMBEDDING_MODELS[embedding_model]["duplicate_threshold"]
+        # 스냅샷/검색 인덱스 파일 이름 태그 (dlib은 기존 경로 그대로 None)
+        self.gallery_tag = None if embedding_model == DEFAULT_EMBEDDING_MODEL else embedding_model
+        self.snapshot_path = snapshot_path(self.db_name, self.gallery_tag)
+    
+    def _decode(self, blobs):
+        """현재 임베딩 모델 차원으로 인코딩 BLOB 변환"""
+        return decode_encodings(blobs, self.embedding_dim)
+    
+    def _copy_missing_templates(self, cursor):
+        """템플릿이 없는 얼굴의 인코딩을 템플릿으로 복사 (마이그레이션/아카이브 가져오기 후)"""
+        cursor.execute(
+            "INSERT INTO face_templates (face_id, encoding) "
+            "SELECT id, encoding FROM registered_faces "
+            "WHERE id NOT IN (SELECT face_id FROM face_templates) ORDER BY id"
+        )
+    
+    def _insert_templates(self, cursor, face_id, templates):
+        """템플릿 행렬을 face_templates에 추가"""
+        dim = templates.shape[1]
+        cursor.executemany(
+            "INSERT INTO face_templates (face_id, encoding) VALUES (?, ?)",
+            [(face_id, encode_encoding(template, dim)) for template in templates]
+        )
+    
+    def _insert_crops(self, cursor, face_id, crops):
+        """등록 사진을 face_crops에 추가 (crops: (JPEG 바이트, 얼굴 위치, 랜드마크 또는 None) 목록)"""
+        cursor.executemany(
+            "INSERT INTO face_crops (face_id, image, box_top, box_right, box_bottom, box_left, landmarks) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            _crop_rows(face_id, crops)
+        )
+    
+    def _load_templates(self, cursor, face_ids=None):
+        """
+        템플릿이 2개 이상인 얼굴의 템플릿 조회 (하나뿐이면 중심과 같으므로 제외)
+        
+        Returns:
+            {registered_faces.id: (k, dim) float32 행렬} (현재 임베딩 모델의 얼굴만)
+        """
+        query = (
+            "SELECT face_id, encoding FROM face_templates WHERE face_id IN "
+            "(SELECT face_id FROM face_templates GROUP BY face_id HAVING COUNT(*) > 1) "
+            "AND face_id IN (SELECT id FROM registered_faces WHERE embedding_model = ?)"
+        )
+        params = (self.embedding_model,)
+        if face_ids is not None:
+            if not face_ids:
+                return {}
+            query += f" AND face_id IN ({','.join('?' * len(face_ids))})"
+            params += tuple(face_ids)
+        cursor.execute(query + " ORDER BY face_id, id", params)
+        
+        blobs_by_face = {}
+        for face_id, blob in cursor.fetchall():
+            blobs_by_face.setdefault(face_id, []).append(blob)
+        return {face_id: self._decode(blobs) for face_id, blobs in blobs_by_face.items()}
+    
+    def add_face(self, name, student_id, department, grade, encoding, crops=None):
+        """
+        새로운 얼굴 등록 (이름, 학번, 학과, 학년)
+        
+        Args:
+            encoding: 인코딩 하나 (dim,) 또는 여러 장 촬영한 템플릿 (k, dim)
+                      (중심 = 템플릿 평균을 registered_faces에, 각 템플릿은 face_templates에 저장)
+            crops: 등록 사진 (JPEG 바이트, 얼굴 위치, 랜드마크 또는 None) 목록
+                   (embedding_engine.make_crop, 임베딩 모델을 바꿀 때 다시 계산하는 원본)
+        """
+        templates = template_matrix(encoding, self.embedding_dim)
+        encoding_blob = encode_encoding(template_centroid(templates, self.embedding_model), self.embedding_dim)
+        try:
+            with self._write() as cursor:
+                cursor.execute(
+                    "INSERT INTO registered_faces (name, student_id, department, grade, encoding, embedding_model) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (name, student_id, department, grade, encoding_blob, self.embedding_model)
+                )
+                face_id = cursor.lastrowid
+                self._insert_templates(cursor, face_id, templates)
+                self._insert_crops(cursor, face_id, crops)
+                self._record_gallery_change(cursor, "add", face_id)
         except sqlite3.IntegrityError:
             return False  # 이미 존재하는 학번
+        
+        self.refresh_snapshot()
+        return True
+    
+    def add_faces(self, faces):
+        """
+        여러 얼굴을 한 트랜잭션으로 등록 (일괄 등록용)
+        
+        Args:
+            faces: (name, student_id, department, grade, encoding[, crops]) 목록
+                   (encoding/crops는 add_face()와 같음)
+        
+        Returns:
+            이미 등록되어 있어 건너뛴 학번 목록
+        """
+        rows = []
+        for face in faces:
+            name, student_id, department, grade, encoding = face[:5]
+            templates = template_matrix(encoding, self.embedding_dim)
+            centroid = encode_encoding(template_centroid(templates, self.embedding_model), self.embedding_dim)
+            crops = face[5] if len(face) > 5 else None
+            rows.append(((name, student_id, department, grade, centroid, self.embedding_model), templates, crops))
+        skipped = []
+        
+        with self._write() as cursor:
+            for row, templates, crops in rows:
+                cursor.execute(
+                    "INSERT OR IGNORE INTO registered_faces "
+                    "(name, student_id, department, grade, encoding, embedding_model) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    row
+                )
+                if cursor.rowcount == 0:
+                    skipped.append(row[1])
+                else:
+                    face_id = cursor.lastrowid
+                    self._insert_templates(cursor, face_id, templates)
+                    self._insert_crops(cursor, face_id, crops)
+                    self._record_gallery_change(cursor, "add", face_id)
+        
+        if len(skipped) < len(rows):
+            self.refresh_snapshot()
+        return skipped
+    
+    def add_templates(self, student_id, encodings, crops=None):
+        """
+        등록된 사람에게 템플릿 추가 (중심 인코딩은 전체 템플릿 평균으로 다시 계산)
+        
+        Returns:
+            추가 후 템플릿 수 (등록되지 않은 학번이면 None)
+        
+        Raises:
+            ValueError: 등록된 템플릿이 다른 임베딩 모델로 만들어진 경우
+        """
+        templates = template_matrix(encodings, self.embedding_dim)
+        with self._write() as cursor:
+            cursor.execute("SELECT id, embedding_model FROM registered_faces WHERE student_id = ?", (student_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            face_id, embedding_model = row
+            if embedding_model != self.embedding_model:
+                raise ValueError(
+                    f"학번 {student_id}의 템플릿은 {embedding_model} 모델입니다 "
+                    f"(현재 {self.embedding_model}, python embedding_engine.py reembed로 변환)"
+                )
+            
+            self._insert_templates(cursor, face_id, templates)
+            self._insert_crops(cursor, face_id, crops)
+            cursor.execute("SELECT encoding FROM face_templates WHERE face_id = ? ORDER BY id", (face_id,))
+            all_templates = self._decode(blob for blob, in cursor.fetchall())
+            cursor.execute(
+                "UPDATE registered_faces SET encoding = ? WHERE id = ?",
+                (encode_encoding(template_centroid(all_templates, self.embedding_model), self.embedding_dim), face_id)
+            )
+            
+            # 라이브 갤러리는 기존 행을 지우고 새 중심/템플릿으로 다시 추가
+            self._record_gallery_change(cursor, "delete", face_id)
+            self._record_gallery_change(cursor, "add", face_id)
+        
+        self.refresh_snapshot()
+        return len(all_templates)
+    
+    def get_template_count(self, student_id):
+        """학번의 등록 템플릿 수 (등록되지 않았으면 0)"""
+        cursor = self._read()
+        cursor.execute(
+            "SELECT COUNT(*) FROM face_templates t JOIN registered_faces f ON f.id = t.face_id "
+            "WHERE f.student_id = ?",
+            (student_id,)
+        )
+        return cursor.fetchone()[0]
+    
+    def get_template_rows(self):
+        """
+        현재 임베딩 모델의 등록 템플릿 전체 (갤러리 분석/임계값 보정용)
+        
+        Returns:
+            (face_ids (N,) int64 registered_faces.id, (N, dim) float32 템플릿 행렬) 얼굴 순서대로
+        """
+        cursor = self._read()
+        cursor.execute(
+            "SELECT t.face_id, t.encoding FROM face_templates t JOIN registered_faces f ON f.id = t.face_id "
+            "WHERE f.embedding_model = ? ORDER BY t.face_id, t.id",
+            (self.embedding_model,)
+        )
+        rows = cursor.fetchall()
+        face_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        return face_ids, self._decode(row[1] for row in rows)
+    
+    def iter_reembed_batches(self, embedding_model, batch_size=500):
+        """
+        다른 임베딩 모델로 태그된 얼굴의 등록 사진을 묶음 단위로 순회 (id 키셋 페이지네이션)
+        
+        Yields:
+            [(face_id, student_id, [(JPEG 바이트, (top, right, bottom, left), 랜드마크 (5, 2) 또는 None), ...]), ...]
+            (등록 사진이 없는 얼굴은 사진 목록이 비어 있음)
+        """
+        last_id = 0
+        while True:
+            cursor = self._read()
+            cursor.execute(
+                "SELECT id, student_id FROM registered_faces WHERE embedding_model != ? AND id > ? "
+                "ORDER BY id LIMIT ?",
+                (embedding_model, last_id, batch_size)
+            )
+            faces = cursor.fetchall()
+            if not faces:
+                return
+            last_id = faces[-1][0]
+            
+            face_ids = [face_id for face_id, _ in faces]
+            cursor.execute(
+                "SELECT face_id, image, box_top, box_right, box_bottom, box_left, landmarks FROM face_crops "
+                f"WHERE face_id IN ({','.join('?' * len(face_ids))}) ORDER BY face_id, id",
+                face_ids
+            )
+            crops = {}
+            for face_id, image, top, right, bottom, left, landmarks in cursor.fetchall():
+                if landmarks is not None:
+                    landmarks = np.frombuffer(landmarks, dtype=ENCODING_DTYPE).reshape(5, 2)
+                crops.setdefault(face_id, []).append((bytes(image), (top, right, bottom, left), landmarks))
+            yield [(face_id, student_id, crops.get(face_id, [])) for face_id, student_id in faces]
+    
+    def get_landmark_crops(self, limit=200):
+        """
+        🔔 랜드마크가 저장된 등록 사진 (최근 등록 순, 임베딩 모델과 무관)
+        
+        Returns:
+            [(JPEG 바이트, (top, right, bottom, left), 랜드마크 (5, 2)), ...]
+        """
+        cursor = self._read()
+        cursor.execute(
+            "SELECT image, box_top, box_right, box_bottom, box_left, landmarks FROM face_crops "
+            "WHERE landmarks IS NOT NULL ORDER BY id DESC LIMIT ?",
+            (limit,)
+        )
+        return [(bytes(image), (top, right, bottom, left), np.frombuffer(landmarks, dtype=ENCODING_DTYPE).reshape(5, 2))
+                for image, top, right, bottom, left, landmarks in cursor.fetchall()]
+    
+    def replace_embeddings(self, embedding_model, templates_by_face):
+        """
+        얼굴들의 템플릿/중심 인코딩을 다른 임베딩 모델로 교체 (한 트랜잭션)
+        
+        개인별 보정 임계값은 모델마다 거리 분포가 달라 지웁니다.
+        실행 중인 라이브 갤러리는 변경 기록 초기화로 전체를 다시 로드합니다.
+        
+        Args:
+            embedding_model: 새 임베딩 모델 (EMBEDDING_MODELS)
+            templates_by_face: {registered_faces.id: (k, dim) 템플릿 행렬}
+        """
+        dim = EMBEDDING_MODELS[embedding_model]["dim"]
+        with self._write() as cursor:
+            for face_id, templates in templates_by_face.items():
+                templates = template_matrix(templates, dim)
+                cursor.execute(
+                    "UPDATE registered_faces SET encoding = ?, embedding_model = ?, match_threshold = NULL "
+                    "WHERE id = ?",
+                    (encode_encoding(template_centroid(templates, embedding_model), dim), embedding_model, face_id)
+                )
+                cursor.execute("DELETE FROM face_templates WHERE face_id = ?", (face_id,))
+                self._insert_templates(cursor, face_id, templates)
+            self._reset_gallery_changes(cursor)
+        self.refresh_snapshot()
     
     def get_all_faces(self):
-        """모든 등록된 얼굴 정보 가져오기"""
-        self.cursor.execute("SELECT name, student_id, department, grade, encoding FROM registered_faces")
-        results = self.cursor.fetchall()
-        
-        names = []
-        student_ids = []
-        departments = []
-        grades = []
-        encodings = []
-        
-        for name, student_id, department, grade, encoding_blob in results:
-            names.append(name)
-            student_ids.append(student_id)
-            departments.append(department)
-            grades.append(grade)
-            encodings.append(pickle.loads(encoding_blob))
+        """현재 임베딩 모델로 등록된 얼굴 정보 가져오기 (encodings는 (N, dim) float32 행렬)"""
+        cursor = self._read()
+        cursor.execute(
+            "SELECT name, student_id, department, grade, encoding FROM registered_faces "
+            "WHERE embedding_model = ? ORDER BY id",
+            (self.embedding_model,)
+        )
+        results = cursor.fetchall()
+        
+        if results:
+            names, student_ids, departments, grades, blobs = map(list, zip(*results))
+        else:
+            names, student_ids, departments, grades, blobs = [], [], [], [], []
         
         return {
             "names": names,
             "student_ids": student_ids,
             "departments": departments,
             "grades": grades,
-            "encodings": encodings
+            "encodings": self._decode(blobs)
         }
     
+    def get_encoding_matrix(self):
+        """현재 임베딩 모델의 인코딩 전체를 (N, dim) float32 행렬로 한 번에 로드 (id 순서)"""
+        cursor = self._read()
+        cursor.execute(
+            "SELECT encoding FROM registered_faces WHERE embedding_model = ? ORDER BY id",
+            (self.embedding_model,)
+        )
+        return self._decode(row[0] for row in cursor)
+    
+    def get_embedding_model_counts(self):
+        """임베딩 모델별 등록 수 {모델: 인원}"""
+        cursor = self._read()
+        cursor.execute("SELECT embedding_model, COUNT(*) FROM registered_faces GROUP BY embedding_model")
+        return dict(cursor.fetchall())
+    
+    def _record_gallery_change(self, cursor, op, face_id):
+        """갤러리 세대 번호 증가 + 변경 기록 추가 (등록/삭제와 같은 트랜잭션에서 호출)"""
+        cursor.execute("UPDATE db_meta SET value = value + 1 WHERE key = 'gallery_generation'")
+        cursor.execute("SELECT value FROM db_meta WHERE key = 'gallery_generation'")
+        generation = cursor.fetchone()[0]
+        cursor.execute(
+            "INSERT INTO gallery_changes (seq, op, face_id) VALUES (?, ?, ?)",
+            (generation, op, face_id)
+        )
+        cursor.execute("DELETE FROM gallery_changes WHERE seq <= ?", (generation - GALLERY_CHANGES_KEEP,))
+    
+    def gallery_generation(self):
+        """현재 갤러리 세대 번호 (등록/삭제마다 1씩 증가)"""
+        cursor = self._read()
+        cursor.execute("SELECT value FROM db_meta WHERE key = 'gallery_generation'")
+        return cursor.fetchone()[0]
+    
+    def _reset_gallery_changes(self, cursor):
+        """
+        대량 변경 후 변경 기록 초기화 (세대 번호만 증가)
+        
+        기록이 비어 있으므로 실행 중인 라이브 갤러리는 전체를 다시 로드합니다.
+        """
+        cursor.execute("UPDATE db_meta SET value = value + 1 WHERE key = 'gallery_generation'")
+        cursor.execute("DELETE FROM gallery_changes")
+    
+    def get_gallery_changes(self, since_generation):
+        """
+        since_generation 이후의 갤러리 변경 내용 조회 (라이브 갤러리 갱신용)
+        
+        Returns:
+            변경 기록이 이미 정리되어 이어 받을 수 없으면 None, 아니면
+            {
+                "generation": 최신 세대 번호,
+                "deleted_ids": 삭제된 registered_faces.id 목록,
+                "added": get_all_faces() 형식 + "ids", "thresholds", "templates"
+                         (현재도 존재하고 현재 임베딩 모델인 추가 행만)
+            }
+        """
+        cursor = self._read()
+        cursor.execute("SELECT value FROM db_meta WHERE key = 'gallery_generation'")
+        generation = cursor.fetchone()[0]
+        
+        cursor.execute(
+            "SELECT seq, op, face_id FROM gallery_changes WHERE seq > ? ORDER BY seq",
+            (since_generation,)
+        )
+        changes = cursor.fetchall()
+        if generation < since_generation:
+            return None  # DB가 교체됨 (백업 복원 등)
+        if generation > since_generation and (not changes or changes[0][0] != since_generation + 1):
+            return None  # 중간 기록이 없음
+        
+        deleted_ids = [face_id for _, op, face_id in changes if op == "delete"]
+        added_ids = [face_id for _, op, face_id in changes if op == "add"]
+        
+        rows = []
+        if added_ids:
+            placeholders = ",".join("?" * len(added_ids))
+            cursor.execute(
+                "SELECT id, name, student_id, department, grade, match_threshold, encoding FROM registered_faces "
+                f"WHERE id IN ({placeholders}) AND embedding_model = ? ORDER BY id",
+                added_ids + [self.embedding_model]
+            )
+            rows = cursor.fetchall()
+        
+        if rows:
+            ids, names, student_ids, departments, grades, thresholds, blobs = map(list, zip(*rows))
+        else:
+            ids, names, student_ids, departments, grades, thresholds, blobs = [], [], [], [], [], [], []
+        templates = self._load_templates(cursor, ids)
+        
+        return {
+            "generation": max(generation, changes[-1][0]) if changes else generation,
+            "deleted_ids": deleted_ids,
+            "added": {
+                "ids": ids,
+                "names": names,
+                "student_ids": student_ids,
+                "departments": departments,
+                "grades": grades,
+                "thresholds": thresholds,
+                "templates": templates,
+                "encodings": self._decode(blobs)
+            }
+        }
+    
+    def refresh_snapshot(self):
+        """현재 임베딩 모델의 갤러리 스냅샷 파일을 DB 내용으로 다시 쓰기"""
+        # 쓰기 락 안에서 읽어 세대 번호와 내용이 어긋나지 않게 함
+        with self._write() as cursor:
+            cursor.execute("SELECT value FROM db_meta WHERE key = 'gallery_generation'")
+            generation = cursor.fetchone()[0]
+            cursor.execute(
+                "SELECT id, encoding FROM registered_faces WHERE embedding_model = ? ORDER BY id",
+                (self.embedding_model,)
+            )
+            rows = cursor.fetchall()
+            ids = np.array([row[0] for row in rows], dtype=np.int64)
+            encodings = self._decode(row[1] for row in rows)
+            
+            try:
+                write_snapshot(self.snapshot_path, ids, encodings, generation)
+            except OSError as e:
+                print(f"[WARN] 갤러리 스냅샷 저장 실패: {e}")
+    
+    def load_gallery(self):
+        """
+        인식용 갤러리 로드 (메모리 맵 스냅샷 사용)
+        
+        스냅샷이 없거나 DB보다 오래되었으면 다시 만든 뒤 엽니다.
+        encodings는 읽기 전용 np.memmap이므로 같은 머신의 여러 프로세스가
+        페이지 캐시를 공유합니다.
+        
+        Returns:
+            get_all_faces()와 같은 형식의 딕셔너리 (+ "ids", "generation", "thresholds", "templates")
+            thresholds는 개인별 보정 임계값 목록 (보정되지 않은 사람은 None)
+            templates는 템플릿이 2개 이상인 사람의 {id: (k, dim) 행렬} (encodings는 템플릿 평균)
+            현재 임베딩 모델로 태그된 행만 포함합니다 (다른 모델의 인코딩과는 비교하지 않음)
+        """
+        for _ in range(2):
+            snapshot = open_snapshot(self.snapshot_path)
+            if (snapshot is None or snapshot.generation != self.gallery_generation()
+                    or snapshot.dim != self.embedding_dim):
+                self.refresh_snapshot()
+                snapshot = open_snapshot(self.snapshot_path)
+                if snapshot is None:
+                    break
+            
+            cursor = self._read()
+            cursor.execute(
+                "SELECT id, name, student_id, department, grade, match_threshold FROM registered_faces "
+                "WHERE embedding_model = ? ORDER BY id",
+                (self.embedding_model,)
+            )
+            rows = cursor.fetchall()
+            ids = [row[0] for row in rows]
+            
+            # 스냅샷과 메타데이터 사이에 다른 프로세스가 DB를 바꿨으면 다시 시도
+            if not np.array_equal(snapshot.ids, ids):
+                continue
+            
+            if rows:
+                _, names, student_ids, departments, grades, thresholds = map(list, zip(*rows))
+            else:
+                names, student_ids, departments, grades, thresholds = [], [], [], [], []
+            
+            return {
+                "generation": snapshot.generation,
+                "ids": ids,
+                "names": names,
+                "student_ids": student_ids,
+                "departments": departments,
+                "grades": grades,
+                "thresholds": thresholds,
+                "templates": self._load_templates(cursor),
+                "encodings": snapshot.encodings
+            }
+        
+        # 스냅샷을 사용할 수 없으면 DB에서 직접 로드
+        generation = self.gallery_generation()
+        known_faces = self.get_all_faces()
+        known_faces["generation"] = generation
+        cursor = self._read()
+        cursor.execute(
+            "SELECT id, match_threshold FROM registered_faces WHERE embedding_model = ? ORDER BY id",
+            (self.embedding_model,)
+        )
+        rows = cursor.fetchall()
+        known_faces["ids"] = [row[0] for row in rows]
+        known_faces["thresholds"] = [row[1] for row in rows]
+        known_faces["templates"] = self._load_templates(cursor)
+        return known_faces
+    
+    def export_gallery(self, path):
+        """
+        등록된 얼굴 전체를 압축 아카이브로 내보내기 (gallery_archive 형식)
+        
+        인코딩은 메모리 맵 스냅샷의 float32 블록을 그대로 기록합니다.
+        (현재 임베딩 모델의 사람별 중심 인코딩만 내보내며, 가져온 쪽에서는 이것이 첫 템플릿이 됩니다)
+        
+        Returns:
+            내보낸 얼굴 수
+        """
+        gallery = self.load_gallery()
+        cursor = self._read()
+        cursor.execute("SELECT id, registered_date FROM registered_faces ORDER BY id")
+        registered_dates = dict(cursor.fetchall())
+        
+        columns = {
+            "name": gallery["names"],
+            "student_id": gallery["student_ids"],
+            "department": gallery["departments"],
+            "grade": gallery["grades"],
+            "registered_date": [str(registered_dates.get(face_id, "")) for face_id in gallery["ids"]]
+        }
+        gallery_archive.write_archive(path, columns, gallery["encodings"],
+                                      metadata={"embedding_model": self.embedding_model})
+        return len(gallery["ids"])
+    
+    def import_gallery(self, path, replace=False):
+        """
+        아카이브에서 등록된 얼굴 가져오기 (한 트랜잭션)
+        
+        Args:
+            path: export_gallery()로 만든 아카이브
+            replace: True면 현재 임베딩 모델의 등록 얼굴(템플릿/등록 사진 포함)을 지우고 가져옴
+                     (다른 모델의 갤러리와 다시 임베딩에 필요한 등록 사진은 그대로 둠)
+        
+        Returns:
+            (가져온 수, 이미 등록된 학번이라 건너뛴 수)
+        
+        Raises:
+            gallery_archive.ArchiveError: 형식/체크섬/차원/임베딩 모델 오류
+        """
+        manifest, columns, encodings = gallery_archive.read_archive(path)
+        # 모델 태그가 없는 아카이브는 이전 버전(dlib)에서 내보낸 것
+        embedding_model = manifest.get("embedding_model", DEFAULT_EMBEDDING_MODEL)
+        if embedding_model != self.embedding_model:
+            raise gallery_archive.ArchiveError(
+                f"임베딩 모델이 다릅니다: {embedding_model} (현재 {self.embedding_model})"
+            )
+        if manifest["dim"] != self.embedding_dim:
+            raise gallery_archive.ArchiveError(
+                f"인코딩 차원이 다릅니다: {manifest['dim']} (기대값 {self.embedding_dim})"
+            )
+        
+        # float32 블록 하나를 행 크기로 잘라 그대로 BLOB으로 저장
+        block = encodings.astype(ENCODING_DTYPE, copy=False).tobytes()
+        row_bytes = self.embedding_dim * ENCODING_DTYPE.itemsize
+        blobs = (block[i:i + row_bytes] for i in range(0, len(block), row_bytes))
+        rows = zip(
+            columns["name"].tolist(),
+            columns["student_id"].tolist(),
+            columns["department"].tolist(),
+            columns["grade"].tolist(),
+            blobs,
+            [date or None for date in columns["registered_date"].tolist()],
+            itertools.repeat(self.embedding_model)
+        )
+        
+        with self._write() as cursor:
+            if replace:
+                # 아카이브에는 현재 모델의 행만 있으므로 그 모델의 얼굴만 교체
+                replaced = "(SELECT id FROM registered_faces WHERE embedding_model = ?)"
+                cursor.execute(f"DELETE FROM face_templates WHERE face_id IN {replaced}", (self.embedding_model,))
+                cursor.execute(f"DELETE FROM face_crops WHERE face_id IN {replaced}", (self.embedding_model,))
+                cursor.execute("DELETE FROM registered_faces WHERE embedding_model = ?", (self.embedding_model,))
+            before = self.conn.total_changes
+            cursor.executemany(
+                "INSERT OR IGNORE INTO registered_faces "
+                "(name, student_id, department, grade, encoding, registered_date, embedding_model) "
+                "VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?)",
+                rows
+            )
+            imported = self.conn.total_changes - before
+            self._copy_missing_templates(cursor)
+            self._reset_gallery_changes(cursor)
+        
+        self.refresh_snapshot()
+        return imported, manifest["count"] - imported
+    
+    def find_similar_faces(self, encoding, threshold=None):
+        """
+        등록 전 중복 검사: 새 인코딩과 threshold 미만으로 가까운 등록 얼굴 찾기
+        
+        Args:
+            threshold: 중복으로 볼 거리 (None이면 현재 임베딩 모델의 기본값)
+        
+        Returns:
+            [{"student_id", "name", "distance"}, ...] 가까운 순
+        """
+        if threshold is None:
+            threshold = self.duplicate_threshold
+        gallery = self.load_gallery()
+        if len(gallery["ids"]) == 0:
+            return []
+        _, cols, distances = gallery_analysis.find_close_pairs(
+            gallery["encodings"], threshold, queries=[encoding]
+        )
+        return [
+            {"student_id": gallery["student_ids"][col], "name": gallery["names"][col], "distance": float(distance)}
+            for col, distance in zip(cols, distances)
+        ]
+    
+    def set_match_thresholds(self, thresholds):
+        """
+        개인별 보정 임계값 저장 (한 트랜잭션)
+        
+        Args:
+            thresholds: [(registered_faces.id, 임계값 또는 None), ...] (None이면 전역 설정으로 되돌림)
+        
+        실행 중인 라이브 갤러리는 변경 기록 초기화로 전체를 다시 로드합니다.
+        """
+        with self._write() as cursor:
+            cursor.executemany(
+                "UPDATE registered_faces SET match_threshold = ? WHERE id = ?",
+                [(None if threshold is None else float(threshold), face_id) for face_id, threshold in thresholds]
+            )
+            self._reset_gallery_changes(cursor)
+        self.refresh_snapshot()
+    
+    def clear_match_thresholds(self):
+        """개인별 보정 임계값을 모두 지우고 전역 설정 사용"""
+        with self._write() as cursor:
+            cursor.execute("UPDATE registered_faces SET match_threshold = NULL")
+            self._reset_gallery_changes(cursor)
+        self.refresh_snapshot()
+    
+    def get_roster(self):
+        """등록된 사람 목록 (이름, 학번, 학과, 학년만 조회 - 인코딩은 읽지 않음)"""
+        cursor = self._read()
+        cursor.execute("SELECT name, student_id, department, grade FROM registered_faces ORDER BY id")
+        results = cursor.fetchall()
+        
+        if results:
+            names, student_ids, departments, grades = map(list, zip(*results))
+        else:
+            names, student_ids, departments, grades = [], [], [], []
+        
+        return {
+            "names": names,
+            "student_ids": student_ids,
+            "departments": departments,
+            "grades": grades
+        }
+    
+    def get_roster_groups(self):
+        """등록된 학과/학년 목록 (인식 범위 선택용)"""
+        cursor = self._read()
+        cursor.execute("SELECT DISTINCT department FROM registered_faces ORDER BY department")
+        departments = [row[0] for row in cursor.fetchall() if row[0]]
+        cursor.execute("SELECT DISTINCT grade FROM registered_faces ORDER BY grade")
+        grades = [row[0] for row in cursor.fetchall() if row[0]]
+        return {"departments": departments, "grades": grades}
+    
+    def iter_roster(self, batch_size=1000):
+        """
+        등록된 사람 목록을 묶음 단위로 순회 (id 키셋 페이지네이션)
+        
+        묶음 사이에 조회를 열어 두지 않으므로 GUI에서 나눠 그리는 동안에도
+        WAL 체크포인트를 막지 않습니다.
+        
+        Yields:
+            [(name, student_id, department, grade), ...] (최대 batch_size개)
+        """
+        last_id = 0
+        while True:
+            cursor = self._read()
+            cursor.execute(
+                "SELECT id, name, student_id, department, grade FROM registered_faces "
+                "WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, batch_size)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [row[1:] for row in rows]
+    
+    def exists(self, student_id):
+        """학번 등록 여부 (UNIQUE 인덱스 조회)"""
+        cursor = self._read()
+        cursor.execute("SELECT 1 FROM registered_faces WHERE student_id = ? LIMIT 1", (student_id,))
+        return cursor.fetchone() is not None
+    
     def get_person_info(self, student_id):
         """학번으로 개인 정보 조회"""
-        self.cursor.execute(
+        cursor = self._read()
+        cursor.execute(
             "SELECT name, student_id, department, grade FROM registered_faces WHERE student_id = ?",
             (student_id,)
         )
-        result = self.cursor.fetchone()
+        result = cursor.fetchone()
         if result:
             return {
                 "name": result[0],
@@ -97,32 +1044,263 @@ class FaceDatabase:
     
     def delete_face(self, student_id):
         """등록된 얼굴 삭제 (학번으로)"""
-        self.cursor.execute("DELETE FROM registered_faces WHERE student_id = ?", (student_id,))
-        self.conn.commit()
-        return self.cursor.rowcount > 0
+        with self._write() as cursor:
+            cursor.execute("SELECT id FROM registered_faces WHERE student_id = ?", (student_id,))
+            row = cursor.fetchone()
+            deleted = row is not None
+            if deleted:
+                cursor.execute("DELETE FROM registered_faces WHERE id = ?", (row[0],))
+                cursor.execute("DELETE FROM face_templates WHERE face_id = ?", (row[0],))
+                cursor.execute("DELETE FROM face_crops WHERE face_id = ?", (row[0],))
+                self._record_gallery_change(cursor, "delete", row[0])
+        
+        if deleted:
+            self.refresh_snapshot()
+        return deleted
     
-    def log_recognition(self, name, student_id, is_registered):
+    def log_recognition(self, name, student_id, is_registered, timestamp=None):
         """얼굴 인식 로그 저장"""
-        self.cursor.execute(
-            "INSERT INTO recognition_logs (name, student_id, is_registered) VALUES (?, ?, ?)",
-            (name, student_id if is_registered else None, 1 if is_registered else 0)
-        )
-        self.conn.commit()
+        self.log_recognitions([(name, student_id, is_registered, timestamp)])
+    
+    def log_recognitions(self, entries):
+        """
+        얼굴 인식 로그 일괄 저장 (하나의 트랜잭션, executemany)
+        
+        Args:
+            entries: (name, student_id, is_registered, timestamp) 목록
+                     timestamp는 epoch 초 (None이면 현재 시각)
+        """
+        now = time.time()
+        rows = [
+            (
+                name,
+                student_id if is_registered else None,
+                1 if is_registered else 0,
+                format_timestamp(timestamp if timestamp is not None else now)
+            )
+            for name, student_id, is_registered, timestamp in entries
+        ]
+        if not rows:
+            return
+        
+        with self._write() as cursor:
+            cursor.executemany(
+                "INSERT INTO recognition_logs (name, student_id, is_registered, timestamp) VALUES (?, ?, ?, ?)",
+                rows
+            )
     
     def get_recognition_logs(self, limit=100):
         """최근 인식 로그 가져오기"""
-        self.cursor.execute(
-            "SELECT id, name, student_id, is_registered, timestamp FROM recognition_logs ORDER BY timestamp DESC LIMIT ?",
-            (limit,)
+        logs, _ = self.get_recognition_logs_page(limit=limit)
+        return logs
+    
+    def get_recognition_logs_page(self, cursor=None, limit=100, student_id=None,
+                                  is_registered=None, since=None, until=None):
+        """
+        인식 로그 페이지 조회 (최신순, 키셋 페이지네이션)
+        
+        OFFSET 대신 마지막 행의 (timestamp, id)를 커서로 사용하므로
+        로그가 많아져도 페이지마다 인덱스 범위만 읽습니다.
+        
+        Args:
+            cursor: 이전 페이지가 돌려준 커서 (None이면 첫 페이지)
+            limit: 페이지 크기
+            student_id: 특정 학번만 조회
+            is_registered: True/False면 등록/미등록만 조회
+            since, until: 조회 기간 (epoch 초, until은 미포함)
+        
+        Returns:
+            (logs, next_cursor): logs는 (id, name, student_id, is_registered, timestamp)
+                                 목록, 다음 페이지가 없으면 next_cursor는 None
+        """
+        conditions = []
+        params = []
+        
+        if student_id is not None:
+            conditions.append("student_id = ?")
+            params.append(student_id)
+        if is_registered is not None:
+            conditions.append("is_registered = ?")
+            params.append(1 if is_registered else 0)
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            params.append(format_timestamp(since))
+        if until is not None:
+            conditions.append("timestamp < ?")
+            params.append(format_timestamp(until))
+        if cursor is not None:
+            cursor_timestamp, cursor_id = cursor
+            conditions.append("timestamp <= ? AND (timestamp < ? OR id < ?)")
+            params.extend([cursor_timestamp, cursor_timestamp, cursor_id])
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        reader = self._read()
+        reader.execute(
+            f"SELECT id, name, student_id, is_registered, timestamp FROM recognition_logs {where} "
+            "ORDER BY timestamp DESC, id DESC LIMIT ?",
+            params + [limit]
+        )
+        logs = reader.fetchall()
+        
+        next_cursor = (logs[-1][4], logs[-1][0]) if len(logs) == limit else None
+        return logs, next_cursor
+    
+    def save_presence_intervals(self, intervals):
+        """
+        닫힌 재실 구간 일괄 저장
+        
+        Args:
+            intervals: (student_id, name, first_seen, last_seen, frame_count, best_distance)
+                       목록 (first_seen/last_seen은 epoch 초)
+        """
+        rows = [
+            (student_id, name, format_timestamp(first_seen), format_timestamp(last_seen),
+             frame_count, float(best_distance))
+            for student_id, name, first_seen, last_seen, frame_count, best_distance in intervals
+        ]
+        if not rows:
+            return
+        
+        with self._write() as cursor:
+            cursor.executemany(
+                "INSERT INTO presence_intervals (student_id, name, first_seen, last_seen, frame_count, best_distance) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+    
+    def get_presence_intervals(self, since, until, student_id=None):
+        """
+        기간과 겹치는 재실 구간 조회 (출석 확인용)
+        
+        Args:
+            since, until: 조회 기간 (epoch 초, until은 미포함)
+            student_id: 특정 학번만 조회
+        
+        Returns:
+            (student_id, name, first_seen, last_seen, frame_count, best_distance) 목록
+        """
+        conditions = ["first_seen < ?", "last_seen >= ?"]
+        params = [format_timestamp(until), format_timestamp(since)]
+        if student_id is not None:
+            conditions.append("student_id = ?")
+            params.append(student_id)
+        
+        cursor = self._read()
+        cursor.execute(
+            "SELECT student_id, name, first_seen, last_seen, frame_count, best_distance "
+            f"FROM presence_intervals WHERE {' AND '.join(conditions)} ORDER BY first_seen",
+            params
+        )
+        return cursor.fetchall()
+    
+    def compact_logs(self, retention_days=LOG_RETENTION_DAYS, batch_size=COMPACTION_BATCH_SIZE, pause=0.05):
+        """
+        보존 기간이 지난 원본 로그를 일별 요약으로 합치고 삭제
+        
+        작은 트랜잭션 단위로 나눠 처리하고 사이마다 잠시 쉬므로
+        인식 로그 기록을 오래 막지 않습니다.
+        
+        Returns:
+            요약 후 삭제한 원본 로그 수
+        """
+        cutoff = format_timestamp(time.time() - retention_days * 86400)
+        total = 0
+        
+        while not self._compaction_stop.is_set():
+            with self._write() as cursor:
+                cursor.execute(
+                    "SELECT id FROM recognition_logs WHERE timestamp < ? ORDER BY timestamp LIMIT ?",
+                    (cutoff, batch_size)
+                )
+                ids = [row[0] for row in cursor.fetchall()]
+                if not ids:
+                    break
+                
+                placeholders = ",".join("?" * len(ids))
+                cursor.execute(f'''
+                    INSERT INTO recognition_daily (day, is_registered, subject, name, count, first_seen, last_seen)
+                    SELECT date(timestamp), is_registered, COALESCE(student_id, name), MAX(name),
+                           COUNT(*), MIN(timestamp), MAX(timestamp)
+                    FROM recognition_logs WHERE id IN ({placeholders})
+                    GROUP BY date(timestamp), is_registered, COALESCE(student_id, name)
+                    ON CONFLICT (day, is_registered, subject) DO UPDATE SET
+                        name = excluded.name,
+                        count = count + excluded.count,
+                        first_seen = MIN(first_seen, excluded.first_seen),
+                        last_seen = MAX(last_seen, excluded.last_seen)
+                ''', ids)
+                cursor.execute(f"DELETE FROM recognition_logs WHERE id IN ({placeholders})", ids)
+            
+            # 배치 사이에 쓰기 락을 놓아 로그 기록이 끼어들 수 있게 함
+            total += len(ids)
+            time.sleep(pause)
+        
+        if total:
+            print(f"[INFO] 로그 압축: 원본 로그 {total}건을 일별 요약으로 이동")
+        return total
+    
+    def start_log_compaction(self, retention_days=LOG_RETENTION_DAYS, interval=COMPACTION_INTERVAL):
+        """백그라운드 로그 압축 스레드 시작 (interval초마다 compact_logs 실행)"""
+        if self._compaction_thread and self._compaction_thread.is_alive():
+            return
+        
+        def run():
+            while not self._compaction_stop.is_set():
+                try:
+                    self.compact_logs(retention_days=retention_days)
+                except Exception as e:
+                    print(f"[ERROR] 로그 압축 실패: {e}")
+                self._compaction_stop.wait(interval)
+        
+        self._compaction_stop.clear()
+        self._compaction_thread = threading.Thread(target=run, daemon=True)
+        self._compaction_thread.start()
+    
+    def stop_log_compaction(self):
+        """백그라운드 로그 압축 스레드 정지"""
+        self._compaction_stop.set()
+        if self._compaction_thread:
+            self._compaction_thread.join(timeout=5.0)
+            self._compaction_thread = None
+    
+    def get_daily_summary(self, since_day, until_day, student_id=None):
+        """
+        일별 요약 조회
+        
+        Args:
+            since_day, until_day: 'YYYY-MM-DD' (until_day 미포함)
+            student_id: 특정 학번만 조회
+        
+        Returns:
+            (day, is_registered, subject, name, count, first_seen, last_seen) 목록
+        """
+        conditions = ["day >= ?", "day < ?"]
+        params = [since_day, until_day]
+        if student_id is not None:
+            conditions.append("is_registered = 1 AND subject = ?")
+            params.append(student_id)
+        
+        cursor = self._read()
+        cursor.execute(
+            "SELECT day, is_registered, subject, name, count, first_seen, last_seen "
+            f"FROM recognition_daily WHERE {' AND '.join(conditions)} ORDER BY day, subject",
+            params
         )
-        return self.cursor.fetchall()
+        return cursor.fetchall()
     
     def get_registered_count(self):
         """등록된 얼굴 수"""
-        self.cursor.execute("SELECT COUNT(*) FROM registered_faces")
-        return self.cursor.fetchone()[0]
+        cursor = self._read()
+        cursor.execute("SELECT COUNT(*) FROM registered_faces")
+        return cursor.fetchone()[0]
     
     def close(self):
         """데이터베이스 연결 종료"""
+        self.stop_log_compaction()
+        with self._readers_lock:
+            for conn in self._readers.values():
+                conn.close()
+            self._readers.clear()
+        self._local = threading.local()
         if self.conn:
             self.conn.close()
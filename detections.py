@@ -0,0 +1,139 @@
+"""
+얼굴 감지 결과 모듈
+감지기(RetinaFace/YOLO/HOG)마다 다른 출력을 struct-of-arrays 하나로 통일 (얼굴 순서는 모든 배열에서 같음)
+
+    boxes: (N, 4) int32 (top, right, bottom, left) - face_recognition과 같은 순서, 이미지 범위로 자름
+    scores: (N,) float32 감지 신뢰도 (HOG처럼 점수가 없는 감지기는 1)
+    landmarks: (N, 5, 2) float32 5점 랜드마크 (왼눈, 오른눈, 코, 입 왼쪽, 입 오른쪽) 또는 None
+
+기존 코드와 호환: len(), 반복, 정수 인덱스는 (top, right, bottom, left) 튜플을 돌려주므로
+face_locations 목록 자리에 그대로 넘길 수 있고, to_legacy()는 튜플 목록으로 변환
+임베딩 엔진은 landmarks로 얼굴을 정렬 (dlib은 use_landmarks를 켰을 때만, 기본은 dlib 예측기)
+"""
+import numpy as np
+
+NUM_LANDMARKS = 5
+
+# to_records() 레코드 형식 (랜드마크가 없으면 NaN)
+RECORD_DTYPE = np.dtype([
+    ("top", "<i4"),
+    ("right", "<i4"),
+    ("bottom", "<i4"),
+    ("left", "<i4"),
+    ("score", "<f4"),
+    ("landmarks", "<f4", (NUM_LANDMARKS, 2)),
+])
+
+
+def clip_boxes(boxes, height, width):
+    """
+    (x1, y1, x2, y2) 실수 박스 → 반올림 + 이미지 범위로 자른 (top, right, bottom, left)
+
+    Returns:
+        ((M, 4) int32 남긴 박스, (N,) 남긴 박스 마스크 - 빈 박스는 제외)
+    """
+    boxes = np.rint(np.asarray(boxes, dtype=np.float32).reshape(-1, 4))
+    np.clip(boxes[:, 0::2], 0, width, out=boxes[:, 0::2])
+    np.clip(boxes[:, 1::2], 0, height, out=boxes[:, 1::2])
+    valid = (boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])
+
+    # (x1, y1, x2, y2) → (top, right, bottom, left) = (y1, x2, y2, x1)
+    return boxes[valid][:, [1, 2, 3, 0]].astype(np.int32), valid
+
+
+class Detections:
+    """한 이미지의 얼굴 감지 결과 (struct-of-arrays)"""
+    __slots__ = ("boxes", "scores", "landmarks")
+
+    def __init__(self, boxes, scores=None, landmarks=None):
+        self.boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        if scores is None:
+            self.scores = np.ones(len(self.boxes), dtype=np.float32)
+        else:
+            self.scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+        if landmarks is not None:
+            landmarks = np.asarray(landmarks, dtype=np.float32).reshape(-1, NUM_LANDMARKS, 2)
+        self.landmarks = landmarks
+
+    @classmethod
+    def empty(cls, with_landmarks=False):
+        """감지된 얼굴이 없는 결과"""
+        landmarks = np.zeros((0, NUM_LANDMARKS, 2), dtype=np.float32) if with_landmarks else None
+        return cls(np.zeros((0, 4), dtype=np.int32), np.zeros(0, dtype=np.float32), landmarks)
+
+    @classmethod
+    def from_xyxy(cls, boxes, scores, landmarks, height, width):
+        """
+        (x1, y1, x2, y2) 실수 박스 → 반올림 + 이미지 범위로 자르고 빈 박스 제외 (한 번에 처리)
+
+        Args:
+            boxes: (N, 4) 원본 좌표 박스
+            scores: (N,) 감지 신뢰도
+            landmarks: (N, 5, 2) 또는 None (자르지 않음, 이미지 밖 좌표도 정렬에 그대로 사용)
+            height, width: 이미지 크기
+        """
+        locations, valid = clip_boxes(boxes, height, width)
+        scores = np.asarray(scores, dtype=np.float32).reshape(-1)[valid]
+        if landmarks is not None:
+            landmarks = np.asarray(landmarks, dtype=np.float32).reshape(-1, NUM_LANDMARKS, 2)[valid]
+        return cls(locations, scores, landmarks)
+
+    @classmethod
+    def from_locations(cls, locations, scores=None, landmarks=None):
+        """face_recognition 형식 [(top, right, bottom, left), ...] → Detections"""
+        return cls(np.array(locations, dtype=np.int32).reshape(-1, 4), scores, landmarks)
+
+    @classmethod
+    def from_records(cls, records):
+        """to_records() 결과 → Detections (랜드마크가 모두 NaN이면 None)"""
+        boxes = np.stack((records["top"], records["right"], records["bottom"], records["left"]), axis=1)
+        landmarks = records["landmarks"]
+        if len(landmarks) and np.isnan(landmarks).all():
+            landmarks = None
+        return cls(boxes, records["score"], landmarks)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __iter__(self):
+        return iter(self.to_legacy())
+
+    def __getitem__(self, index):
+        """정수 인덱스 → (top, right, bottom, left) 튜플 (기존 face_locations[i]와 같음)"""
+        top, right, bottom, left = self.boxes[index].tolist()
+        return top, right, bottom, left
+
+    def __repr__(self):
+        return f"Detections({len(self)}개, 랜드마크 {'있음' if self.landmarks is not None else '없음'})"
+
+    def select(self, indices):
+        """일부 얼굴만 고른 Detections (번호 목록 또는 불리언 마스크)"""
+        indices = np.asarray(indices)
+        if indices.dtype != bool:
+            indices = indices.astype(np.intp).reshape(-1)
+        landmarks = None if self.landmarks is None else self.landmarks[indices]
+        return Detections(self.boxes[indices], self.scores[indices], landmarks)
+
+    def scaled(self, factor):
+        """좌표를 factor배 한 Detections (축소 프레임 → 원본 프레임 표시용)"""
+        landmarks = None if self.landmarks is None else self.landmarks * factor
+        return Detections(np.rint(self.boxes * factor), self.scores, landmarks)
+
+    def to_legacy(self):
+        """기존 형식 [(top, right, bottom, left), ...] (int 튜플 목록)"""
+        return [tuple(box) for box in self.boxes.tolist()]
+
+    def to_records(self):
+        """필드 이름으로 접근하는 NumPy 레코드 배열 (RECORD_DTYPE, 복사본)"""
+        records = np.empty(len(self), dtype=RECORD_DTYPE)
+        records["top"], records["right"], records["bottom"], records["left"] = self.boxes.T
+        records["score"] = self.scores
+        records["landmarks"] = np.nan if self.landmarks is None else self.landmarks
+        return records.view(np.recarray)
+
+
+def as_detections(faces):
+    """Detections 또는 기존 face_locations 목록 → Detections"""
+    if isinstance(faces, Detections):
+        return faces
+    return Detections.from_locations(faces)
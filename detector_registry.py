@@ -0,0 +1,239 @@
+"""
+얼굴 감지기 레지스트리 모듈
+ScreenManager가 하나를 소유하고 모든 화면(등록/인식)과 단일 화면 버전이 함께 사용
+
+    - 감지기마다 모델을 한 번만 로드 (화면마다 따로 로드하지 않음)
+    - 첫 사용 전에 백그라운드 스레드에서 미리 로드 (preload)
+    - 'auto' / 'retinaface' / 'yolo' / 'hog' 선택과 대체(fallback) 순서를 한 곳에서 처리
+
+모든 감지기는 같은 인터페이스를 제공:
+    detect(image, upsample_times=None) → Detections (박스, 신뢰도, 5점 랜드마크)
+        (upsample_times는 HOG만 사용, None이면 레지스트리 기본값)
+        Detections는 (top, right, bottom, left) 튜플 목록처럼 반복/인덱싱 가능
+    detect_batch(images) → 이미지별 detect() 결과 목록
+    warmup() → 첫 추론 지연을 미리 치름
+    info() → 화면 표시용 이름/디바이스 문자열
+"""
+import threading
+from pathlib import Path
+import numpy as np
+import face_recognition
+from detections import Detections
+
+MODEL_DIR = Path("models")
+MIN_MODEL_BYTES = 1000000  # 이보다 작은 파일은 다운로드 실패로 간주
+YOLO_MODEL_NAMES = (
+    "yolov8n-face.pt",
+    "yolov8s-face.pt",
+    "yolov8m-face.pt",
+    "yolov5n-face.pt",
+    "yolov5s-face.pt",
+)
+
+# 자동 선택 순서 (정확도 우선, HOG는 항상 사용 가능)
+AUTO_ORDER = ("retinaface", "yolo", "hog")
+DETECTOR_NAMES = {"retinaface": "RetinaFace", "yolo": "YOLO-Face", "hog": "HOG"}
+DETECTOR_EMOJI = {"RetinaFace": "🏆", "YOLO-Face": "⚡", "HOG": "🔧"}
+WARMUP_SHAPE = (240, 320, 3)
+
+
+def _model_exists(path):
+    return path.exists() and path.stat().st_size > MIN_MODEL_BYTES
+
+
+def available_detectors(model_dir=MODEL_DIR):
+    """모델 파일이 있는 감지기 목록 (로드하지 않고 파일만 확인)"""
+    model_dir = Path(model_dir)
+    available = []
+    if _model_exists(model_dir / "retinaface.onnx"):
+        available.append("retinaface")
+    if any(_model_exists(model_dir / name) for name in YOLO_MODEL_NAMES):
+        available.append("yolo")
+    available.append("hog")
+    return available
+
+
+class HOGDetector:
+    """dlib HOG 감지기 (face_recognition 내장, 로드 비용 없음)"""
+    name = "HOG"
+
+    def __init__(self, upsample_times=1):
+        self.upsample_times = upsample_times
+
+    def detect(self, image, upsample_times=None):
+        if upsample_times is None:
+            upsample_times = self.upsample_times
+        # HOG는 신뢰도/랜드마크가 없음 (신뢰도 1, 임베딩 엔진이 랜드마크를 직접 예측)
+        locations = face_recognition.face_locations(image, model="hog", number_of_times_to_upsample=upsample_times)
+        return Detections.from_locations(locations)
+
+    def detect_batch(self, images):
+        return [self.detect(image) for image in images]
+
+    def warmup(self):
+        pass
+
+    def info(self):
+        return f"{self.name} (CPU)"
+
+
+class ModelDetector:
+    """RetinaFaceDetector / YOLOFaceDetector를 공통 인터페이스로 감싼 감지기"""
+
+    def __init__(self, name, detector):
+        self.name = name
+        self.detector = detector
+        self._lock = threading.Lock()  # 추론 세션을 여러 스레드가 동시에 쓰지 않도록
+
+    def detect(self, image, upsample_times=None):
+        # upsample_times는 무시 (입력 크기에 맞춰 모델이 처리)
+        with self._lock:
+            return self.detector.detect(image)
+
+    def detect_batch(self, images):
+        return [self.detect(image) for image in images]
+
+    def warmup(self):
+        self.detect(np.zeros(WARMUP_SHAPE, dtype=np.uint8))
+
+    def set_det_size(self, det_size):
+        with self._lock:
+            self.detector.set_det_size(det_size)
+
+    def info(self):
+        return f"{self.name} ({self.detector.get_device_info()})"
+
+
+def _load_retinaface(registry):
+    from retinaface_detector import RetinaFaceDetector
+    return ModelDetector("RetinaFace", RetinaFaceDetector(conf_threshold=0.5, det_size=registry.det_size))
+
+
+def _load_yolo(registry):
+    from yolo_face_detector import YOLOFaceDetector
+    return ModelDetector("YOLO-Face", YOLOFaceDetector(conf_threshold=0.3))
+
+
+class DetectorRegistry:
+    """
+    감지기 레지스트리 (감지기 종류마다 한 번만 로드, 스레드 안전)
+
+    get()은 로드가 끝날 때까지 기다리므로 GUI 스레드에서는 preload()/loaded()를 사용하고,
+    인식 스레드 등 작업 스레드에서 get()을 호출
+    """
+    LOADERS = {"retinaface": _load_retinaface, "yolo": _load_yolo}
+
+    def __init__(self, upsample_times=1, det_size=640):
+        """
+        Args:
+            upsample_times: HOG 업샘플 횟수
+            det_size: RetinaFace 입력 크기 (로드 시 적용)
+        """
+        self.hog = HOGDetector(upsample_times)
+        self.det_size = det_size
+        self._detectors = {"hog": self.hog}  # 종류 → 감지기 (로드 실패는 None)
+        self._loading = {}  # 종류 → 로드 완료 Event
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def candidates(choice):
+        """선택값 → 시도할 감지기 순서 (선택한 감지기를 쓸 수 없으면 자동 선택 순서로 대체)"""
+        if choice in DETECTOR_NAMES and choice != "hog":
+            return (choice,) + tuple(key for key in AUTO_ORDER if key != choice)
+        if choice == "hog":
+            return ("hog",)
+        return AUTO_ORDER
+
+    def _start(self, key):
+        """감지기 로드를 백그라운드 스레드에서 시작 (이미 시작했으면 그 Event 반환)"""
+        with self._lock:
+            if key in self._detectors:
+                done = threading.Event()
+                done.set()
+                return done
+            if key in self._loading:
+                return self._loading[key]
+            done = self._loading[key] = threading.Event()
+
+        def run():
+            detector = None
+            try:
+                detector = self.LOADERS[key](self)
+                detector.warmup()
+                print(f"[INFO] ✅ {detector.info()} 감지기 준비 완료")
+            except Exception as e:
+                print(f"[WARN] {DETECTOR_NAMES[key]} 초기화 실패: {e}")
+            with self._lock:
+                self._detectors[key] = detector
+                del self._loading[key]
+            done.set()
+
+        threading.Thread(target=run, name=f"detector-{key}", daemon=True).start()
+        return done
+
+    def set_det_size(self, det_size):
+        """RetinaFace 입력 크기 변경 (이미 로드된 감지기에도 적용)"""
+        self.det_size = det_size
+        with self._lock:
+            detector = self._detectors.get("retinaface")
+        if detector is not None:
+            detector.set_det_size(det_size)
+
+    def preload(self, choice="auto"):
+        """선택에 해당하는 감지기를 백그라운드에서 미리 로드 (기다리지 않음)"""
+        for key in self.candidates(choice):
+            if key == "hog" or key not in available_detectors():
+                continue
+            self._start(key)
+            return
+
+    def get(self, choice="auto"):
+        """
+        선택에 맞는 감지기 (필요하면 로드가 끝날 때까지 대기)
+
+        모델 파일이 없거나 로드에 실패한 감지기는 건너뛰고 다음 후보를 사용하며,
+        마지막에는 항상 HOG를 반환
+        """
+        available = available_detectors()
+        for key in self.candidates(choice):
+            if key == "hog":
+                return self.hog
+            if key not in available:
+                continue
+            self._start(key).wait()
+            detector = self._detectors.get(key)
+            if detector is not None:
+                return detector
+            print(f"[WARN] {DETECTOR_NAMES[key]}를 사용할 수 없습니다. 다른 감지기로 전환합니다.")
+        return self.hog
+
+    def loaded(self, choice="auto"):
+        """
+        기다리지 않고 현재 사용할 수 있는 감지기 (GUI 표시용)
+
+        Returns:
+            (감지기 또는 None, 로드 중이면 True)
+        """
+        available = available_detectors()
+        for key in self.candidates(choice):
+            if key == "hog":
+                return self.hog, False
+            if key not in available:
+                continue
+            with self._lock:
+                if key in self._loading:
+                    return None, True
+                if key not in self._detectors:
+                    return None, False
+                if self._detectors[key] is not None:
+                    return self._detectors[key], False
+        return self.hog, False
+
+    def describe(self, choice="auto"):
+        """화면 표시용 감지기 설명 (이모지 포함)"""
+        detector, loading = self.loaded(choice)
+        if loading:
+            return "⏳ 감지 모델 로딩 중..."
+        if detector is None:
+            return "🔍 첫 사용 시 로드"
+        return f"{DETECTOR_EMOJI.get(detector.name, '🔍')} {detector.info()}"
@@ -66,6 +66,12 @@ def download_retinaface():
                 print(f"   크기: {size_mb:.1f}MB")
                 print(f"   원본: {source}")
                 
+                # 🔔 같은 팩의 ArcFace 인식 모델 (얼굴 인코딩 엔진으로 선택 가능)
+                recognition = source.parent / "w600k_r50.onnx"
+                if recognition.exists():
+                    shutil.copy2(recognition, model_dir / "arcface.onnx")
+                    print(f"✅ 복사 완료: {model_dir / 'arcface.onnx'} (ArcFace 인코딩 모델)")
+                
                 print("""
 ╔════════════════════════════════════════════════════════════════╗
 ║                    🎉 설치 완료!                               ║
@@ -124,6 +130,7 @@ def download_retinaface():
 3. 모델 파일 복사:
    
    cp ~/.insightface/models/buffalo_l/det_10g.onnx models/retinaface.onnx
+   cp ~/.insightface/models/buffalo_l/w600k_r50.onnx models/arcface.onnx   (선택: ArcFace 인코딩)
 
 4. 확인:
    
@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+"""
+얼굴 임베딩 엔진 모듈
+감지된 얼굴 위치에서 인식용 임베딩 벡터를 계산하는 엔진을 같은 인터페이스로 제공
+
+    - dlib: face_recognition의 dlib ResNet (128차원, CPU)
+            기본은 dlib 5점 예측기로 정렬 (등록/인식 모두 같은 정렬)
+            use_landmarks를 켜면 감지기 5점으로 dlib 형상을 만들어 정렬 (랜드마크 예측 생략,
+            check-alignment로 두 정렬의 인코딩 차이를 확인한 뒤에만 켤 것)
+    - arcface: models/arcface.onnx (insightface w600k_r50, 512차원 단위 벡터)
+               프레임의 모든 얼굴을 112×112로 정렬한 뒤 onnxruntime 배치 추론 한 번으로 계산
+
+모든 엔진은 같은 인터페이스를 제공:
+    embed(image, faces) → (N, dim) float32
+        (faces는 detections.Detections 또는 (top, right, bottom, left) 목록,
+         Detections.landmarks가 있으면 그 5점으로 얼굴을 정렬)
+    embed_crops(crops) → 등록 사진 (RGB 이미지, 위치, 랜드마크) 목록의 (N, dim) 임베딩
+    confidence(distance) → 화면 표시용 신뢰도 (0~1)
+    info() → 화면 표시용 이름/디바이스 문자열
+
+모델마다 임베딩 공간이 다르므로 DB 행은 임베딩 모델로 태그되고 (database.EMBEDDING_MODELS)
+같은 모델의 행끼리만 비교. 엔진을 바꾸면 저장된 등록 사진(face_crops)에서 다시 계산:
+
+    python embedding_engine.py reembed --model arcface --workers 4
+    python embedding_engine.py status
+    python embedding_engine.py check-alignment --sample 200
+"""
+import os
+import sys
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import cv2
+import numpy as np
+from database import EMBEDDING_MODELS, DEFAULT_EMBEDDING_MODEL
+from detections import Detections, as_detections
+
+MODEL_DIR = Path("models")
+ARCFACE_MODEL_PATH = MODEL_DIR / "arcface.onnx"
+ENGINE_NAMES = {"dlib": "dlib ResNet", "arcface": "ArcFace"}
+
+# ArcFace 입력 (112×112, 5점 기준 위치: 왼눈, 오른눈, 코, 입 왼쪽, 입 오른쪽)
+ARCFACE_SIZE = 112
+ARCFACE_TEMPLATE = np.array([
+    [38.2946, 51.6963],
+    [73.5318, 51.5014],
+    [56.0252, 71.7366],
+    [41.5493, 92.3655],
+    [70.7299, 92.2041],
+], dtype=np.float32)
+ARCFACE_MAX_BATCH = 32  # 배치 추론 최대 크기 (모델 입력 배치가 고정이면 그 크기)
+
+# 랜드마크가 없는 감지기(HOG/YOLO)의 박스 안 대략적인 5점 위치 (박스 너비/높이 비율)
+BOX_LANDMARKS = np.array([
+    [0.31, 0.38],
+    [0.69, 0.38],
+    [0.50, 0.58],
+    [0.35, 0.78],
+    [0.65, 0.78],
+], dtype=np.float32)
+
+# 감지기 5점 → dlib 5점 형상 (shape_predictor_5_face_landmarks 순서:
+# 이미지 오른쪽 눈 바깥/안쪽 꼬리, 왼쪽 눈 바깥/안쪽 꼬리, 코 밑)
+EYE_CORNER_RATIO = 0.2  # 눈 중심 → 눈꼬리 거리 (두 눈 중심 사이 거리 대비)
+NOSE_BASE_RATIO = 0.25  # 코끝 → 코 밑 거리 (코끝에서 입 중심까지 거리 대비)
+DLIB_DETECTOR_LANDMARKS = False  # 감지기 랜드마크로 dlib 정렬 (check-alignment 통과 후에만 켤 것)
+ALIGNMENT_SAMPLE = 200  # check-alignment에서 비교할 등록 사진 수
+ALIGNMENT_TOLERANCE = 0.06  # 같은 사진의 두 정렬 인코딩 거리 허용치 (95백분위, dlib 매칭 임계값 0.45 대비 작게)
+
+# 등록 사진 저장 형식 (얼굴 주변 여백 포함, 긴 변 기준 축소 후 JPEG)
+CROP_MARGIN = 0.5  # 박스 크기 대비 사방 여백
+CROP_MAX_SIZE = 256
+CROP_JPEG_QUALITY = 90
+COMMIT_SIZE = 500  # 재계산 트랜잭션당 인원
+
+
+def available_engines(model_dir=MODEL_DIR):
+    """모델 파일이 있는 임베딩 엔진 목록 (로드하지 않고 파일만 확인)"""
+    available = ["dlib"]
+    if (Path(model_dir) / ARCFACE_MODEL_PATH.name).exists():
+        available.append("arcface")
+    return available
+
+
+def make_crop(image, location, landmarks=None, margin=CROP_MARGIN, max_size=CROP_MAX_SIZE):
+    """
+    등록 사진 만들기 (얼굴 주변을 잘라 축소한 뒤 JPEG로 압축)
+
+    Args:
+        image: RGB 이미지 (H, W, 3) uint8
+        location: (top, right, bottom, left)
+        landmarks: 5점 랜드마크 (5, 2) 또는 None
+
+    Returns:
+        (JPEG 바이트, 잘라낸 이미지 안의 얼굴 위치, 잘라낸 이미지 기준 랜드마크 또는 None)
+        (FaceDatabase.add_face()의 crops 항목)
+    """
+    top, right, bottom, left = location
+    pad_y = int((bottom - top) * margin)
+    pad_x = int((right - left) * margin)
+    y1, x1 = max(0, top - pad_y), max(0, left - pad_x)
+    y2, x2 = min(image.shape[0], bottom + pad_y), min(image.shape[1], right + pad_x)
+    crop = image[y1:y2, x1:x2]
+
+    scale = min(1.0, max_size / max(crop.shape[:2]))
+    if scale < 1.0:
+        crop = cv2.resize(crop, (max(1, round(crop.shape[1] * scale)), max(1, round(crop.shape[0] * scale))),
+                          interpolation=cv2.INTER_AREA)
+
+    box = tuple(int(round(v * scale)) for v in (top - y1, right - x1, bottom - y1, left - x1))
+    if landmarks is not None:
+        landmarks = ((np.asarray(landmarks, dtype=np.float32) - (x1, y1)) * scale).astype(np.float32)
+
+    ok, jpeg = cv2.imencode(".jpg", cv2.cvtColor(crop, cv2.COLOR_RGB2BGR),
+                            [cv2.IMWRITE_JPEG_QUALITY, CROP_JPEG_QUALITY])
+    if not ok:
+        raise ValueError("등록 사진 JPEG 압축 실패")
+    return jpeg.tobytes(), box, landmarks
+
+
+def decode_crop(crop):
+    """make_crop() 결과 (JPEG 바이트, 위치, 랜드마크) → (RGB 이미지, 위치, 랜드마크)"""
+    jpeg, location, landmarks = crop
+    image = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("등록 사진을 읽을 수 없습니다")
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB), location, landmarks
+
+
+def similarity_transform(src, dst):
+    """
+    src 점들을 dst 점들로 옮기는 닮음 변환 (회전 + 균등 배율 + 이동, Umeyama 방법)
+
+    Returns:
+        cv2.warpAffine용 2×3 float32 행렬
+    """
+    src = np.asarray(src, dtype=np.float64)
+    dst = np.asarray(dst, dtype=np.float64)
+    src_mean, dst_mean = src.mean(axis=0), dst.mean(axis=0)
+    src_centered, dst_centered = src - src_mean, dst - dst_mean
+
+    u, s, vt = np.linalg.svd(dst_centered.T @ src_centered / len(src))
+    d = np.ones(2)
+    if np.linalg.det(u) * np.linalg.det(vt) < 0:
+        d[1] = -1.0  # 반사 대신 회전만 허용
+    rotation = u @ np.diag(d) @ vt
+    scale = (s * d).sum() / (src_centered ** 2).sum(axis=1).mean()
+    translation = dst_mean - scale * rotation @ src_mean
+    return np.hstack((scale * rotation, translation[:, None])).astype(np.float32)
+
+
+def box_landmarks(location):
+    """랜드마크가 없을 때 박스에서 추정한 대략적인 5점 위치 (5, 2)"""
+    top, right, bottom, left = location
+    return BOX_LANDMARKS * (right - left, bottom - top) + (left, top)
+
+
+def dlib_shape_points(landmarks):
+    """감지기 5점 랜드마크 (N, 5, 2) (눈 중심 2, 코끝, 입꼬리 2) → dlib 5점 형상 좌표 (N, 5, 2)"""
+    landmarks = np.asarray(landmarks, dtype=np.float32).reshape(-1, 5, 2)
+    left_eye, right_eye, nose = landmarks[:, 0], landmarks[:, 1], landmarks[:, 2]
+    mouth_center = (landmarks[:, 3] + landmarks[:, 4]) / 2
+    eye_axis = (right_eye - left_eye) * EYE_CORNER_RATIO
+    nose_base = nose + (mouth_center - nose) * NOSE_BASE_RATIO
+    return np.stack((right_eye + eye_axis, right_eye - eye_axis,
+                     left_eye - eye_axis, left_eye + eye_axis, nose_base), axis=1)
+
+
+class DlibEmbedder:
+    """face_recognition(dlib ResNet) 128차원 인코딩"""
+    name = "dlib"
+
+    def __init__(self, num_jitters=1, use_landmarks=DLIB_DETECTOR_LANDMARKS):
+        """
+        Args:
+            num_jitters: 인코딩 지터 횟수
+            use_landmarks: 감지기 랜드마크로 정렬 (False면 항상 dlib 5점 예측기로 정렬)
+        """
+        import dlib
+        import face_recognition
+        self._dlib = dlib
+        self._face_recognition = face_recognition
+        self.num_jitters = num_jitters
+        self.use_landmarks = use_landmarks
+        self.dim = EMBEDDING_MODELS[self.name]["dim"]
+
+    def _shapes(self, faces):
+        """감지기 랜드마크 → dlib full_object_detections (얼굴 순서 유지)"""
+        shapes = self._dlib.full_object_detections()
+        for (top, right, bottom, left), points in zip(faces.boxes.tolist(),
+                                                      np.rint(dlib_shape_points(faces.landmarks)).astype(int).tolist()):
+            rect = self._dlib.rectangle(left, top, right, bottom)
+            shapes.append(self._dlib.full_object_detection(rect, [self._dlib.point(x, y) for x, y in points]))
+        return shapes
+
+    def _encode(self, image, faces, use_landmarks):
+        if use_landmarks and faces.landmarks is not None:
+            encoder = self._face_recognition.api.face_encoder
+            encodings = encoder.compute_face_descriptor(image, self._shapes(faces), self.num_jitters)
+        else:
+            # 랜드마크가 없거나 (HOG) 감지기 랜드마크를 쓰지 않으면 dlib 5점 예측기로 찾아 정렬
+            encodings = self._face_recognition.face_encodings(image, faces.to_legacy(), self.num_jitters)
+        return np.asarray([np.asarray(encoding) for encoding in encodings], dtype=np.float32).reshape(-1, self.dim)
+
+    def embed(self, image, faces):
+        faces = as_detections(faces)
+        if len(faces) == 0:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return self._encode(image, faces, self.use_landmarks)
+
+    def embed_crops(self, crops):
+        rows = [self.embed(image, Detections.from_locations([location], landmarks=landmarks))
+                for image, location, landmarks in crops]
+        return np.vstack(rows) if rows else np.zeros((0, self.dim), dtype=np.float32)
+
+    def alignment_distances(self, crops):
+        """
+        랜드마크가 있는 등록 사진마다 dlib 예측기 정렬과 감지기 랜드마크 정렬 인코딩 사이 거리
+
+        두 정렬이 같은 갤러리에 섞이므로 (예측기: HOG 감지, 감지기 랜드마크: RetinaFace 등)
+        이 거리가 매칭 임계값에 비해 충분히 작을 때만 use_landmarks를 켜야 함
+
+        Args:
+            crops: [(RGB 이미지, 위치, 랜드마크), ...] (랜드마크가 없는 사진은 건너뜀)
+
+        Returns:
+            (M,) float32 거리
+        """
+        distances = []
+        for image, location, landmarks in crops:
+            if landmarks is None:
+                continue
+            faces = Detections.from_locations([location], landmarks=landmarks)
+            predicted = self._encode(image, faces, use_landmarks=False)
+            synthetic = self._encode(image, faces, use_landmarks=True)
+            distances.append(float(np.linalg.norm(predicted[0] - synthetic[0])))
+        return np.asarray(distances, dtype=np.float32)
+
+    @staticmethod
+    def confidence(distance):
+        return max(0.0, 1.0 - distance)
+
+    def info(self):
+        return f"{ENGINE_NAMES[self.name]} (CPU)"
+
+
+class ArcFaceEmbedder:
+    """onnxruntime으로 실행하는 ArcFace 512차원 임베딩 (L2 정규화 단위 벡터)"""
+    name = "arcface"
+
+    def __init__(self, model_path=ARCFACE_MODEL_PATH, providers=None, max_batch=ARCFACE_MAX_BATCH):
+        """
+        Args:
+            model_path: ONNX 모델 경로 (기본 models/arcface.onnx)
+            providers: onnxruntime 실행 프로바이더 (None이면 사용 가능한 GPU 우선)
+            max_batch: 한 번에 추론할 최대 얼굴 수
+        """
+        import onnxruntime
+
+        model_path = Path(model_path)
+        if not model_path.exists():
+            raise FileNotFoundError(f"ArcFace 모델이 없습니다: {model_path} (python download_retinaface.py)")
+
+        if providers is None:
+            available = onnxruntime.get_available_providers()
+            providers = [p for p in ("CUDAExecutionProvider", "CPUExecutionProvider") if p in available]
+
+        self.session = onnxruntime.InferenceSession(str(model_path), providers=providers)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # 배치 차원이 고정된 모델이면 그 크기로 나눠 추론
+        batch_dim = model_input.shape[0]
+        self.max_batch = batch_dim if isinstance(batch_dim, int) and batch_dim > 0 else max_batch
+        self.device = self.session.get_providers()[0].replace("ExecutionProvider", "")
+        self.dim = EMBEDDING_MODELS[self.name]["dim"]
+        self._lock = threading.Lock()  # 추론 세션을 여러 스레드가 동시에 쓰지 않도록
+
+    @staticmethod
+    def align(image, location, landmarks=None):
+        """얼굴 하나를 ArcFace 기준 위치에 맞춰 112×112로 정렬 (랜드마크가 없으면 박스로 추정)"""
+        if landmarks is None:
+            landmarks = box_landmarks(location)
+        matrix = similarity_transform(landmarks, ARCFACE_TEMPLATE)
+        return cv2.warpAffine(image, matrix, (ARCFACE_SIZE, ARCFACE_SIZE), borderValue=0.0)
+
+    def embed_aligned(self, faces):
+        """정렬된 얼굴 (N, 112, 112, 3) RGB → (N, 512) 단위 벡터 (max_batch씩 배치 추론)"""
+        if len(faces) == 0:
+            return np.zeros((0, self.dim), dtype=np.float32)
+
+        blob = np.ascontiguousarray(np.asarray(faces, dtype=np.float32).transpose(0, 3, 1, 2))
+        blob -= 127.5
+        blob *= 1.0 / 127.5
+
+        with self._lock:
+            outputs = [self.session.run(None, {self.input_name: blob[i:i + self.max_batch]})[0]
+                       for i in range(0, len(blob), self.max_batch)]
+        embeddings = np.concatenate(outputs).astype(np.float32, copy=False)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
+    def embed(self, image, faces):
+        faces = as_detections(faces)
+        landmarks = faces.landmarks
+        return self.embed_aligned([self.align(image, location, None if landmarks is None else landmarks[i])
+                                   for i, location in enumerate(faces.to_legacy())])
+
+    def embed_crops(self, crops):
+        # 사진마다 정렬만 따로 하고 추론은 한 번에
+        return self.embed_aligned([self.align(image, location, landmarks) for image, location, landmarks in crops])
+
+    @staticmethod
+    def confidence(distance):
+        # 단위 벡터 사이 거리 → 코사인 유사도
+        return max(0.0, 1.0 - distance * distance / 2.0)
+
+    def info(self):
+        return f"{ENGINE_NAMES[self.name]} ({self.device})"
+
+
+ENGINES = {"dlib": DlibEmbedder, "arcface": ArcFaceEmbedder}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(name=DEFAULT_EMBEDDING_MODEL):
+    """
+    임베딩 엔진 (프로세스마다 종류별로 한 번만 로드, 스레드 안전)
+
+    Raises:
+        ValueError: 알 수 없는 엔진
+        FileNotFoundError / ImportError: 모델 파일이나 onnxruntime이 없을 때
+    """
+    if name not in ENGINES:
+        raise ValueError(f"알 수 없는 임베딩 엔진: {name}")
+    with _engines_lock:
+        engine = _engines.get(name)
+        if engine is None:
+            engine = _engines[name] = ENGINES[name]()
+            print(f"[INFO] ✅ {engine.info()} 임베딩 엔진 준비 완료")
+    return engine
+
+
+def _reembed_face(task):
+    """
+    프로세스 풀 작업: 한 사람의 등록 사진을 새 엔진으로 다시 임베딩
+
+    Returns:
+        (face_id, 템플릿 행렬 또는 None, 실패 사유 또는 None)
+    """
+    face_id, embedding_model, crops = task
+    try:
+        templates = get_engine(embedding_model).embed_crops([decode_crop(crop) for crop in crops])
+    except Exception as e:
+        return face_id, None, str(e)
+    return face_id, templates, None
+
+
+def reembed(db, embedding_model, workers=None, commit_size=COMMIT_SIZE, progress=None):
+    """
+    다른 모델로 태그된 등록 얼굴을 저장된 등록 사진에서 다시 임베딩해 embedding_model로 교체
+
+    사진 디코딩/정렬/추론은 프로세스 풀에서 병렬로 하고, commit_size명마다 한 트랜잭션으로 저장
+
+    Args:
+        db: FaceDatabase
+        embedding_model: 새 임베딩 모델
+        workers: 프로세스 수 (None이면 CPU 수)
+        commit_size: 트랜잭션당 인원
+        progress: progress(처리한 인원) 콜백
+
+    Returns:
+        (교체한 인원, [(학번, 실패 사유), ...])
+        등록 사진이 없는 얼굴(이전 버전에서 등록)은 다시 등록해야 하므로 실패로 보고
+    """
+    converted = 0
+    done = 0
+    failures = []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for batch in db.iter_reembed_batches(embedding_model, commit_size):
+            student_ids = {face_id: student_id for face_id, student_id, _ in batch}
+            tasks = []
+            for face_id, student_id, crops in batch:
+                if crops:
+                    tasks.append((face_id, embedding_model, crops))
+                else:
+                    failures.append((student_id, "no_crops"))
+
+            results = {}
+            for face_id, templates, error in executor.map(_reembed_face, tasks, chunksize=8):
+                if error is None and len(templates):
+                    results[face_id] = templates
+                else:
+                    failures.append((student_ids[face_id], error or "no_face"))
+
+            if results:
+                db.replace_embeddings(embedding_model, results)
+                converted += len(results)
+            done += len(batch)
+            if progress:
+                progress(done)
+
+    return converted, failures
+
+
+def run_status(db, args):
+    """status 명령: 임베딩 모델별 등록 수"""
+    counts = db.get_embedding_model_counts()
+    total = sum(counts.values())
+    print(f"[INFO] 등록 얼굴 {total}명")
+    for name in EMBEDDING_MODELS:
+        print(f"  - {name}: {counts.get(name, 0)}명")
+    print(f"[INFO] 사용 가능한 엔진: {', '.join(available_engines())}")
+    return 0
+
+
+def run_reembed(db, args):
+    """reembed 명령: 등록 사진에서 다시 임베딩"""
+    if args.model not in available_engines():
+        print(f"[ERROR] {args.model} 모델 파일이 없습니다: {ARCFACE_MODEL_PATH}")
+        return 1
+
+    pending = sum(count for name, count in db.get_embedding_model_counts().items() if name != args.model)
+    if pending == 0:
+        print(f"[INFO] 모든 얼굴이 이미 {args.model} 모델입니다")
+        return 0
+
+    print(f"[INFO] {pending}명을 {args.model} 모델로 다시 임베딩합니다...")
+    start_time = time.time()
+
+    def progress(done):
+        print(f"\r[INFO] 진행: {done}/{pending}", end="", flush=True)
+
+    converted, failures = reembed(db, args.model, workers=args.workers, progress=progress)
+    print()
+    print(f"[INFO] ✅ 교체 완료: {converted}명 ({time.time() - start_time:.1f}초)")
+    if failures:
+        print(f"[WARN] 실패: {len(failures)}명 (no_crops: 등록 사진이 없어 다시 등록해야 함)")
+        for student_id, reason in failures[:args.show]:
+            print(f"  - {student_id}: {reason}")
+    return 0 if not failures else 1
+
+
+def run_check_alignment(db, args):
+    """check-alignment 명령: dlib 예측기 정렬과 감지기 랜드마크 정렬의 인코딩 차이"""
+    crops = [decode_crop(crop) for crop in db.get_landmark_crops(args.sample)]
+    if not crops:
+        print("[WARN] 랜드마크가 저장된 등록 사진이 없습니다 (RetinaFace로 등록한 사진이 필요)")
+        return 1
+
+    distances = get_engine("dlib").alignment_distances(crops)
+    p95 = float(np.percentile(distances, 95))
+    print(f"[INFO] 등록 사진 {len(distances)}장: 중앙값 {np.median(distances):.3f}, "
+          f"95백분위 {p95:.3f}, 최대 {distances.max():.3f} (허용치 {args.tolerance:.3f})")
+    if p95 > args.tolerance:
+        print("[WARN] 두 정렬의 인코딩 차이가 큽니다. dlib 감지기 랜드마크 정렬을 켜지 마세요.")
+        return 1
+    print("[INFO] ✅ 두 정렬이 일치합니다. 설정 'dlib_detector_landmarks'를 켜도 됩니다.")
+    return 0
+
+
+def main():
+    import argparse
+    from database import FaceDatabase
+
+    parser = argparse.ArgumentParser(description="얼굴 임베딩 모델 관리")
+    parser.add_argument("--db", default="face_recognition.db", help="DB 파일 경로")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("status", help="임베딩 모델별 등록 수")
+
+    reembed_parser = commands.add_parser("reembed", help="저장된 등록 사진에서 다른 모델로 다시 임베딩")
+    reembed_parser.add_argument("--model", choices=sorted(ENGINES), required=True, help="새 임베딩 모델")
+    reembed_parser.add_argument("--workers", type=int, default=None, help="프로세스 수 (기본: CPU 수)")
+    reembed_parser.add_argument("--show", type=int, default=20, help="화면에 출력할 최대 실패 수")
+
+    check_parser = commands.add_parser("check-alignment", help="dlib 예측기 정렬과 감지기 랜드마크 정렬 비교")
+    check_parser.add_argument("--sample", type=int, default=ALIGNMENT_SAMPLE, help="비교할 등록 사진 수")
+    check_parser.add_argument("--tolerance", type=float, default=ALIGNMENT_TOLERANCE,
+                              help="허용할 인코딩 거리 (95백분위)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"[ERROR] DB 파일이 없습니다: {args.db}")
+        return 1
+
+    model = args.model if args.command == "reembed" else DEFAULT_EMBEDDING_MODEL
+    db = FaceDatabase(args.db, embedding_model=model)
+    try:
+        if args.command == "status":
+            return run_status(db, args)
+        if args.command == "check-alignment":
+            return run_check_alignment(db, args)
+        return run_reembed(db, args)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""
+얼굴 검색 인덱스 모듈
+프레임에서 찾은 얼굴 인코딩 전체를 갤러리와 행렬 곱 한 번으로 비교
+
+유클리드 거리 제곱을 ‖q‖² + ‖g‖² − 2·q·g 로 전개하여
+(M, 128) × (128, N) GEMM 한 번과 캐시된 갤러리 노름으로 (M, N) 거리 행렬을 구함
+(face_recognition의 거리 기준과 같도록 인코딩은 정규화하지 않음)
+
+사람마다 템플릿이 여러 장이면 갤러리 행은 템플릿 평균(중심)이고,
+TemplateMatcher가 중심 검색 상위 몇 명에 대해서만 개별 템플릿과 다시 비교
+"""
+import numpy as np
+
+
+def squared_norms(encodings):
+    """행별 노름 제곱 (N,) float32"""
+    encodings = np.asarray(encodings, dtype=np.float32)
+    return np.einsum("ij,ij->i", encodings, encodings)
+
+
+def empty_topk(count, k):
+    """검색할 행이 없을 때의 search_topk() 결과"""
+    return np.zeros((count, k), dtype=np.intp), np.full((count, k), np.inf, dtype=np.float32)
+
+
+def top_k(sq_distances, k):
+    """
+    거리 제곱 행렬에서 행마다 가까운 k개 열 고르기 (부분 정렬)
+
+    Args:
+        sq_distances: (M, C) 거리 제곱
+
+    Returns:
+        (columns (M, k), distances (M, k)) 가까운 순, 열이 k개보다 적으면 거리 inf로 채움
+    """
+    count, columns = sq_distances.shape
+    kept = min(k, columns)
+    if kept < columns:
+        picked = np.argpartition(sq_distances, kept - 1, axis=1)[:, :kept]
+    else:
+        picked = np.broadcast_to(np.arange(columns), (count, columns))
+    values = np.take_along_axis(sq_distances, picked, axis=1)
+    order = np.argsort(values, axis=1)
+    picked = np.take_along_axis(picked, order, axis=1)
+    values = np.sqrt(np.take_along_axis(values, order, axis=1)).astype(np.float32, copy=False)
+
+    if kept < k:
+        indices, distances = empty_topk(count, k)
+        indices[:, :kept] = picked
+        distances[:, :kept] = values
+        return indices, distances
+    return picked, values
+
+
+def best_of(indices, distances):
+    """
+    search_topk() 결과 → search() 결과
+
+    Returns:
+        (best_indices, best_distances, margins) margin은 두 번째 후보와의 거리 차이
+    """
+    best = distances[:, 0]
+    with np.errstate(invalid="ignore"):
+        margins = np.where(np.isinf(best), np.float32(np.inf), distances[:, 1] - best)
+    return indices[:, 0], best, margins
+
+
+def match_thresholds(view, indices, default):
+    """
+    최근접 행별 매칭 임계값 (개인별 보정값이 없으면 전역 임계값)
+
+    Args:
+        view: GalleryView (thresholds: 보정 안 된 행은 NaN)
+        indices: search()가 반환한 최근접 행 번호
+        default: 전역 임계값
+    """
+    if len(view.thresholds) == 0:
+        return np.full(len(indices), default, dtype=np.float32)
+    thresholds = view.thresholds[indices]
+    return np.where(np.isnan(thresholds), np.float32(default), thresholds)
+
+
+class FaceIndex:
+    """
+    정확(exact) 최근접 검색 인덱스
+
+    갤러리 행렬과 노름 제곱은 생성 시 한 번만 준비하고,
+    search()는 한 프레임의 모든 쿼리를 한 번에 처리
+    """
+
+    def __init__(self, encodings, sq_norms=None, alive=None):
+        """
+        Args:
+            encodings: (N, dim) float32 갤러리 (np.memmap/버퍼 뷰 가능, 복사하지 않음)
+            sq_norms: 미리 계산된 행별 노름 제곱 (없으면 계산)
+            alive: 삭제되지 않은 행 마스크 (None이면 모두 유효)
+        """
+        self.encodings = np.asarray(encodings, dtype=np.float32)
+        self.sq_norms = squared_norms(self.encodings) if sq_norms is None else sq_norms
+
+        # 삭제된 행은 노름을 inf로 두어 거리 계산에서 자동으로 제외
+        if alive is not None and not alive.all():
+            self.sq_norms = np.where(alive, self.sq_norms, np.float32(np.inf))
+
+    @classmethod
+    def from_view(cls, view):
+        """LiveGallery의 GalleryView로 인덱스 생성 (뷰의 노름 캐시 재사용)"""
+        return cls(view.encodings, view.sq_norms, view.alive if view.dead_count else None)
+
+    def __len__(self):
+        return len(self.encodings)
+
+    def search_topk(self, queries, k):
+        """
+        쿼리 전체의 가까운 갤러리 행 k개 찾기
+
+        Args:
+            queries: (M, dim) 인코딩 (M개 얼굴)
+            k: 찾을 행 수
+
+        Returns:
+            (indices (M, k) int, distances (M, k) float32) 가까운 순, 행이 부족하면 거리 inf
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.encodings.shape[1])
+        if len(queries) == 0 or len(self.encodings) == 0:
+            return empty_topk(len(queries), k)
+
+        # (M, N) 거리 제곱 = ‖q‖² + ‖g‖² − 2·q·gᵀ (GEMM 한 번)
+        distances = queries @ self.encodings.T
+        distances *= -2.0
+        distances += self.sq_norms
+        distances += squared_norms(queries)[:, None]
+        np.maximum(distances, 0.0, out=distances)  # 반올림 오차로 생기는 음수 제거
+        return top_k(distances, k)
+
+    def search(self, queries):
+        """
+        쿼리 전체의 최근접 갤러리 행 찾기
+
+        Returns:
+            (best_indices (M,) int, best_distances (M,) float32, margins (M,) float32)
+            margin은 두 번째로 가까운 행과의 거리 차이 (행이 하나뿐이면 inf)
+        """
+        return best_of(*self.search_topk(queries, 2))
+
+
+class TemplateMatcher:
+    """
+    중심 우선 2단계 검색 (FaceIndex와 같은 search() 인터페이스)
+
+        1. 내부 인덱스(전체/범위/IVF/PQ)로 사람별 중심 인코딩에서 가까운 top_k명 찾기
+        2. 그 top_k명만 개별 템플릿과 비교해 (중심, 템플릿 중) 최단 거리로 다시 순위
+
+    비교 비용은 갤러리 인원 + 쿼리당 top_k명의 템플릿 수로, 전체 템플릿 수에 비례하지 않음
+    """
+
+    def __init__(self, inner, view, top_k=5):
+        """
+        Args:
+            inner: search_topk()를 제공하는 중심 인코딩 인덱스
+            view: LiveGallery의 GalleryView (templates: {id: (k, dim) 행렬})
+            top_k: 템플릿과 다시 비교할 후보 인원 수
+        """
+        self.inner = inner
+        self.view = view
+        self.top_k = max(2, top_k)
+
+    def __len__(self):
+        return len(self.inner)
+
+    def search(self, queries):
+        """
+        중심 검색 후 상위 후보만 템플릿으로 재순위
+
+        Returns:
+            FaceIndex.search()와 같음 (행 번호는 뷰 기준)
+        """
+        templates = self.view.templates
+        if not templates:
+            return self.inner.search(queries)
+
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.view.encodings.shape[1])
+        indices, distances = self.inner.search_topk(queries, self.top_k)
+
+        ids = self.view.ids
+        for i, j in zip(*np.nonzero(np.isfinite(distances))):
+            rows = templates.get(ids[indices[i, j]])
+            if rows is not None:
+                nearest = np.sqrt(squared_norms(rows - queries[i]).min())
+                distances[i, j] = min(distances[i, j], nearest)
+
+        order = np.argsort(distances, axis=1)
+        return best_of(np.take_along_axis(indices, order, axis=1), np.take_along_axis(distances, order, axis=1))
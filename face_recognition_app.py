@@ -24,6 +24,7 @@ def main():
             if recognition_screen.is_running:
                 recognition_screen.stop_recognition()
         
+        manager.db.close()
         root.destroy()
     
     root.protocol("WM_DELETE_WINDOW", on_closing)
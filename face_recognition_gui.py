@@ -7,9 +7,16 @@ import threading
 import time
 import numpy as np
 from database import FaceDatabase
+from detector_registry import DetectorRegistry
 
 class FaceRecognitionApp:
-    def __init__(self, root):
+    def __init__(self, root, detectors=None, detector_type="hog"):
+        """
+        Args:
+            root: Tk 루트 창
+            detectors: 공유할 DetectorRegistry (None이면 새로 생성, ScreenManager.detectors 재사용 가능)
+            detector_type: 'auto', 'retinaface', 'yolo', 'hog' (기본 HOG, 기존 단일 화면 동작과 같음)
+        """
         self.root = root
         self.root.title("얼굴 인식 시스템")
         self.root.geometry("1920x1080")
@@ -39,6 +46,11 @@ class FaceRecognitionApp:
         self.upsample_times = 1  # 얼굴 탐지 업샘플링 횟수 (0-2, 높을수록 작은 얼굴도 탐지)
         self.frame_scale = 0.25  # 프레임 축소 비율 (0.25-1.0, 높을수록 정확하지만 느림)
         
+        # 🔔 얼굴 감지기 (멀티 화면 버전과 같은 레지스트리, 백그라운드에서 미리 로드)
+        self.detector_type = detector_type
+        self.detectors = detectors if detectors is not None else DetectorRegistry(self.upsample_times)
+        self.detectors.preload(self.detector_type)
+        
         # 한글 폰트 설정
         try:
             # macOS 시스템 폰트 사용
@@ -522,7 +534,7 @@ class FaceRecognitionApp:
             elif key == 32:  # SPACE
                 # 얼굴 감지 및 인코딩
                 rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                face_locations = face_recognition.face_locations(rgb_frame)
+                face_locations = self.detectors.get(self.detector_type).detect(rgb_frame)
                 
                 if len(face_locations) == 0:
                     messagebox.showwarning("경고", "얼굴을 감지할 수 없습니다. 다시 시도하세요.")
@@ -621,7 +633,11 @@ class FaceRecognitionApp:
         target_face_locations = []    # 목표 위치
         smoothing_factor = 0.2        # 부드러움 정도 (0.1~0.5, 낮을수록 부드러움)
         
+        # 🔔 공유 감지기 (아직 로드 중이면 이 스레드에서 대기)
+        detector = self.detectors.get(self.detector_type)
+        
         print("[INFO] 비디오 처리 시작...")
+        print(f"[INFO] 감지기: {detector.info()}")
         print(f"[INFO] 성능 설정 - 업샘플: {self.upsample_times}, 스케일: {self.frame_scale}, 프레임 간격: {process_every_n_frames}")
         
         while self.is_running:
@@ -640,10 +656,9 @@ class FaceRecognitionApp:
                 
                 # 얼굴 위치 및 인코딩 (업샘플링으로 작은 얼굴도 탐지)
                 try:
-                    face_locations = face_recognition.face_locations(
-                        rgb_small_frame, 
-                        model="hog",
-                        number_of_times_to_upsample=self.upsample_times  # 원거리 얼굴 탐지 향상
+                    face_locations = detector.detect(
+                        rgb_small_frame,
+                        upsample_times=self.upsample_times  # 원거리 얼굴 탐지 향상 (HOG)
                     )
                     face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
                     
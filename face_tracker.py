@@ -0,0 +1,165 @@
+"""
+얼굴 추적 캐시 모듈
+처리 프레임 사이에 같은 자리에 있는 얼굴을 IoU로 이어 붙여(track) 마지막 인식 결과를 재사용하고,
+새 얼굴 / 크게 움직인 얼굴 / 갱신 주기가 지난 얼굴 / 확실하지 않은 얼굴만 다시 인코딩
+
+face_recognition.face_encodings()가 프레임 처리에서 가장 비싼 호출이므로,
+가만히 있는 사람은 refresh_interval마다 한 번만 인코딩
+"""
+import numpy as np
+
+
+def box_iou(boxes_a, boxes_b):
+    """
+    (top, right, bottom, left) 박스 집합 간 IoU 행렬
+
+    Returns:
+        (len(boxes_a), len(boxes_b)) float 배열
+    """
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    top = np.maximum(a[:, None, 0], b[None, :, 0])
+    right = np.minimum(a[:, None, 1], b[None, :, 1])
+    bottom = np.minimum(a[:, None, 2], b[None, :, 2])
+    left = np.maximum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(right - left, 0, None) * np.clip(bottom - top, 0, None)
+
+    area_a = (a[:, 1] - a[:, 3]) * (a[:, 2] - a[:, 0])
+    area_b = (b[:, 1] - b[:, 3]) * (b[:, 2] - b[:, 0])
+    union = area_a[:, None] + area_b[None, :] - inter
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(union > 0, inter / union, 0.0)
+
+
+class Track:
+    """추적 중인 얼굴 하나와 마지막 인식 결과"""
+    __slots__ = ("track_id", "box", "last_seen", "encoded_box", "decided_at",
+                 "name", "student_id", "distance", "certain")
+
+    def __init__(self, track_id, box, now):
+        self.track_id = track_id
+        self.box = box
+        self.last_seen = now
+        self.encoded_box = None  # 마지막으로 인코딩한 위치
+        self.decided_at = None
+        self.name = "Unknown"
+        self.student_id = None
+        self.distance = float("inf")
+        self.certain = False
+
+
+class TrackCache:
+    """
+    IoU 추적 + 트랙별 인식 결과 캐시
+
+    처리 프레임마다 update()로 감지된 박스를 트랙에 연결하고,
+    다시 인코딩해야 하는 얼굴만 store()로 새 결과를 기록
+    """
+
+    def __init__(self, refresh_interval=2.0, match_iou=0.3, reencode_iou=0.6, max_age=1.0):
+        """
+        Args:
+            refresh_interval: 확실한 결과라도 이 시간(초)이 지나면 다시 인코딩 (0이면 캐시 안 함)
+            match_iou: 이전 트랙과 이 값 이상 겹쳐야 같은 얼굴로 봄
+            reencode_iou: 마지막 인코딩 위치와의 IoU가 이 값보다 작으면 (크게 움직임) 다시 인코딩
+            max_age: 이 시간(초) 동안 감지되지 않은 트랙은 제거
+        """
+        self.refresh_interval = refresh_interval
+        self.match_iou = match_iou
+        self.reencode_iou = reencode_iou
+        self.max_age = max_age
+        self._tracks = {}
+        self._next_id = 0
+
+        # 재사용 통계
+        self.encoded = 0
+        self.reused = 0
+
+    @property
+    def reuse_rate(self):
+        total = self.encoded + self.reused
+        return self.reused / total if total else 0.0
+
+    def stats(self):
+        """재사용 통계 문자열"""
+        return (f"인코딩 {self.encoded:,}회, 재사용 {self.reused:,}회 ({self.reuse_rate:.0%}), "
+                f"추적 중 {len(self._tracks)}명")
+
+    def invalidate(self):
+        """모든 트랙의 인식 결과 무효화 (갤러리가 바뀌었을 때, 위치 추적은 유지)"""
+        for track in self._tracks.values():
+            track.decided_at = None
+
+    def _associate(self, boxes):
+        """감지 박스 → 기존 트랙 (IoU가 큰 쌍부터 탐욕적으로 연결, 연결 안 되면 None)"""
+        assigned = [None] * len(boxes)
+        tracks = list(self._tracks.values())
+        if not tracks or not boxes:
+            return assigned
+
+        iou = box_iou(boxes, [track.box for track in tracks])
+        rows, cols = np.nonzero(iou >= self.match_iou)
+        used = set()
+        for k in np.argsort(-iou[rows, cols], kind="stable"):
+            row, col = rows[k], cols[k]
+            if assigned[row] is None and col not in used:
+                assigned[row] = tracks[col]
+                used.add(col)
+        return assigned
+
+    def _is_fresh(self, track, box, now):
+        """캐시된 결과를 그대로 써도 되는지"""
+        if self.refresh_interval <= 0 or track.decided_at is None or not track.certain:
+            return False
+        if now - track.decided_at > self.refresh_interval:
+            return False
+        return box_iou([box], [track.encoded_box])[0, 0] >= self.reencode_iou
+
+    def update(self, boxes, now):
+        """
+        이번 처리 프레임의 감지 박스를 트랙에 연결
+
+        Args:
+            boxes: (top, right, bottom, left) 목록
+            now: 현재 시각 (초)
+
+        Returns:
+            (track_ids, stale) track_ids는 박스별 트랙 번호,
+            stale은 다시 인코딩해야 하는 박스 번호 목록
+        """
+        boxes = [tuple(box) for box in boxes]
+        track_ids = []
+        stale = []
+        for i, (box, track) in enumerate(zip(boxes, self._associate(boxes))):
+            if track is None:
+                track = Track(self._next_id, box, now)
+                self._tracks[track.track_id] = track
+                self._next_id += 1
+            if not self._is_fresh(track, box, now):
+                stale.append(i)
+            track.box = box
+            track.last_seen = now
+            track_ids.append(track.track_id)
+
+        # 한동안 보이지 않은 트랙 제거
+        for track_id in [tid for tid, t in self._tracks.items() if now - t.last_seen > self.max_age]:
+            del self._tracks[track_id]
+
+        self.encoded += len(stale)
+        self.reused += len(boxes) - len(stale)
+        return track_ids, stale
+
+    def store(self, track_id, name, student_id, distance, certain, now):
+        """다시 인코딩한 트랙의 인식 결과 기록 (certain=False면 다음 처리 프레임에 다시 인코딩)"""
+        track = self._tracks[track_id]
+        track.encoded_box = track.box
+        track.decided_at = now
+        track.name = name
+        track.student_id = student_id
+        track.distance = distance
+        track.certain = certain
+
+    def decision(self, track_id):
+        """트랙의 마지막 인식 결과 (name, student_id, distance)"""
+        track = self._tracks[track_id]
+        return track.name, track.student_id, track.distance
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+갤러리 분석 도구
+등록된 인코딩 전체를 블록 단위 행렬 곱으로 비교하여 (메모리 사용량은 블록 크기로 제한)
+개인별 매칭 임계값을 보정하고, 다른 학번으로 중복 등록된 같은 사람을 찾음
+
+임계값 보정은 사람별 등록 템플릿(face_templates) 전체를 비교 (registered_faces 행마다 임계값 하나)
+    - 본인 거리(genuine): 같은 사람의 등록 템플릿 사이 최대 거리 (템플릿이 한 장이면 없음)
+    - 타인 거리(impostor): 다른 사람 템플릿까지의 최소 거리
+    - 임계값: 본인 거리가 있으면 두 거리의 중간, 없으면 타인 거리 × IMPOSTOR_FRACTION
+      → 닮은 사람이 가까운 학생은 엄격하게, 주변이 비어 있는 학생은 느슨하게
+
+중복 검사: 거리가 중복 임계값 미만인 다른 학번 쌍을 모두 출력 (등록 시에도 같은 검사 사용)
+
+임베딩 모델마다 거리 척도가 다르므로 --model로 고른 모델의 행만 분석하고,
+중복 임계값과 보정 범위는 database.EMBEDDING_MODELS의 모델별 값을 기본으로 사용
+(아래 상수는 dlib 기본값)
+
+사용법:
+    python gallery_analysis.py audit --db face_recognition.db --report duplicates.csv
+    python gallery_analysis.py calibrate --db face_recognition.db
+    python gallery_analysis.py calibrate --dry-run     # 저장하지 않고 분포만 출력
+    python gallery_analysis.py calibrate --clear       # 보정값 삭제 (전역 설정 사용)
+    python gallery_analysis.py --model arcface audit   # ArcFace 갤러리 검사
+"""
+import argparse
+import csv
+import sys
+import time
+import numpy as np
+from face_index import squared_norms
+
+BLOCK_SIZE = 2048  # 한 번에 비교할 행/열 수 (블록당 BLOCK_SIZE² float32)
+IMPOSTOR_FRACTION = 0.85  # 본인 거리가 없을 때 가장 가까운 타인 거리의 이 비율까지 허용
+MIN_THRESHOLD = 0.35
+MAX_THRESHOLD = 0.55
+DUPLICATE_THRESHOLD = 0.35  # 이보다 가까운 두 인코딩은 같은 사람일 가능성이 높음
+
+
+def iter_distance_blocks(encodings, block_size=BLOCK_SIZE, queries=None):
+    """
+    거리 행렬을 블록 단위로 생성
+
+    Args:
+        encodings: (N, dim) 갤러리 (np.memmap 가능)
+        queries: 주어지면 (M, dim) 쿼리 × 갤러리, 없으면 갤러리 × 갤러리 (대칭이므로 위쪽 삼각 블록만)
+
+    Yields:
+        (row_start, col_start, (rows, cols) 거리 블록)
+    """
+    count = len(encodings)
+    symmetric = queries is None
+    row_source = encodings if symmetric else np.asarray(queries, dtype=np.float32).reshape(-1, encodings.shape[1])
+    for row_start in range(0, len(row_source), block_size):
+        rows = np.asarray(row_source[row_start:row_start + block_size], dtype=np.float32)
+        row_norms = squared_norms(rows)
+        for col_start in range(row_start if symmetric else 0, count, block_size):
+            if symmetric and col_start == row_start:
+                cols, col_norms = rows, row_norms
+            else:
+                cols = np.asarray(encodings[col_start:col_start + block_size], dtype=np.float32)
+                col_norms = squared_norms(cols)
+
+            block = rows @ cols.T
+            block *= -2.0
+            block += row_norms[:, None]
+            block += col_norms
+            np.maximum(block, 0.0, out=block)
+            yield row_start, col_start, np.sqrt(block, out=block)
+
+
+def genuine_impostor_distances(encodings, labels, block_size=BLOCK_SIZE):
+    """
+    행별 본인/타인 거리 (블록 단위 전체 쌍 비교)
+
+    Args:
+        encodings: (N, dim) 인코딩 (np.memmap 가능)
+        labels: (N,) 신원 라벨 (같은 사람의 여러 인코딩은 같은 값)
+
+    Returns:
+        (genuine (N,) 같은 라벨 최대 거리, 없으면 NaN,
+         impostor (N,) 다른 라벨 최소 거리, 없으면 inf)
+    """
+    count = len(encodings)
+    _, codes = np.unique(np.asarray(labels), return_inverse=True)
+    genuine = np.full(count, -np.inf, dtype=np.float32)
+    impostor = np.full(count, np.inf, dtype=np.float32)
+
+    for row_start, col_start, block in iter_distance_blocks(encodings, block_size):
+        row_codes = codes[row_start:row_start + block.shape[0]]
+        col_codes = codes[col_start:col_start + block.shape[1]]
+        same = row_codes[:, None] == col_codes[None, :]
+        if row_start == col_start:
+            np.fill_diagonal(same, False)
+            diagonal = np.eye(block.shape[0], dtype=bool)
+        else:
+            diagonal = None
+
+        # 타인: 다른 라벨 중 최소 (같은 라벨/자기 자신은 inf로 가림)
+        masked = np.where(same if diagonal is None else same | diagonal, np.inf, block)
+        rows = slice(row_start, row_start + block.shape[0])
+        cols = slice(col_start, col_start + block.shape[1])
+        np.minimum(impostor[rows], masked.min(axis=1), out=impostor[rows])
+        np.minimum(impostor[cols], masked.min(axis=0), out=impostor[cols])
+
+        # 본인: 같은 라벨 중 최대
+        if same.any():
+            masked = np.where(same, block, -np.inf)
+            np.maximum(genuine[rows], masked.max(axis=1), out=genuine[rows])
+            np.maximum(genuine[cols], masked.max(axis=0), out=genuine[cols])
+
+    genuine[np.isneginf(genuine)] = np.nan
+    return genuine, impostor
+
+
+def calibrate_thresholds(encodings, labels, impostor_fraction=IMPOSTOR_FRACTION,
+                         min_threshold=MIN_THRESHOLD, max_threshold=MAX_THRESHOLD, block_size=BLOCK_SIZE):
+    """
+    신원별 보정 임계값 계산 (같은 사람의 여러 템플릿이 본인 거리 분포를 만듦)
+
+    Args:
+        encodings: (N, dim) 템플릿 행 (np.memmap 가능)
+        labels: (N,) 신원 라벨 (registered_faces.id, 같은 사람의 템플릿은 같은 값)
+
+    Returns:
+        (identities (M,) 정렬된 라벨, thresholds (M,) float32, genuine (M,), impostor (M,))
+    """
+    row_genuine, row_impostor = genuine_impostor_distances(encodings, labels, block_size)
+    identities, codes = np.unique(np.asarray(labels), return_inverse=True)
+    codes = codes.reshape(-1)
+
+    # 템플릿 행 → 신원 (본인 거리는 최대, 타인 거리는 최소)
+    genuine = np.full(len(identities), np.nan, dtype=np.float32)
+    np.fmax.at(genuine, codes, row_genuine)
+    impostor = np.full(len(identities), np.inf, dtype=np.float32)
+    np.minimum.at(impostor, codes, row_impostor)
+
+    thresholds = np.where(
+        np.isnan(genuine),
+        impostor * impostor_fraction,
+        (np.nan_to_num(genuine) + impostor) / 2
+    )
+    thresholds = np.clip(thresholds, min_threshold, max_threshold).astype(np.float32)
+    return identities, thresholds, genuine, impostor
+
+
+def find_close_pairs(encodings, threshold=DUPLICATE_THRESHOLD, labels=None, queries=None, block_size=BLOCK_SIZE):
+    """
+    거리가 threshold 미만인 쌍 찾기 (블록 단위, 메모리는 블록 크기로 제한)
+
+    Args:
+        encodings: (N, dim) 갤러리
+        labels: (N,) 신원 라벨 (주어지면 같은 라벨끼리의 쌍은 제외)
+        queries: 주어지면 쿼리 × 갤러리 쌍만 검사 (등록 전 검사용)
+
+    Returns:
+        (rows, cols, distances) 거리순 정렬
+        queries가 없으면 rows < cols인 갤러리 행 쌍, 있으면 rows는 쿼리 번호
+    """
+    codes = None
+    if labels is not None:
+        _, codes = np.unique(np.asarray(labels), return_inverse=True)
+
+    found_rows, found_cols, found_distances = [], [], []
+    for row_start, col_start, block in iter_distance_blocks(encodings, block_size, queries):
+        close = block < threshold
+        if queries is None and row_start == col_start:
+            close = np.triu(close, k=1)  # 자기 자신과 중복 쌍 제외
+        rows, cols = np.nonzero(close)
+        if len(rows) == 0:
+            continue
+        distances = block[rows, cols]
+        rows = rows + row_start
+        cols = cols + col_start
+        if codes is not None:
+            different = codes[rows] != codes[cols]
+            rows, cols, distances = rows[different], cols[different], distances[different]
+        found_rows.append(rows)
+        found_cols.append(cols)
+        found_distances.append(distances)
+
+    if not found_rows:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+    rows, cols, distances = (np.concatenate(found_rows), np.concatenate(found_cols),
+                             np.concatenate(found_distances))
+    order = np.argsort(distances, kind="stable")
+    return rows[order], cols[order], distances[order]
+
+
+def _print_distribution(title, values):
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        print(f"  {title}: 없음")
+        return
+    p5, p50, p95 = np.percentile(values, [5, 50, 95])
+    print(f"  {title}: 최소 {values.min():.3f} / 5% {p5:.3f} / 중앙 {p50:.3f} / 95% {p95:.3f} / 최대 {values.max():.3f}")
+
+
+def run_calibrate(db, args):
+    """calibrate 명령: 개인별 임계값 계산 후 저장"""
+    if args.clear:
+        db.clear_match_thresholds()
+        print("[INFO] ✅ 개인별 임계값을 모두 삭제했습니다 (전역 설정 사용)")
+        return 0
+
+    face_ids, templates = db.get_template_rows()
+    count = len(np.unique(face_ids))
+    if count < 2:
+        print("[WARN] 보정하려면 2명 이상 등록되어 있어야 합니다")
+        return 1
+
+    print(f"[INFO] 임계값 보정 중... ({db.embedding_model}, {count}명, 템플릿 {len(face_ids)}장, 블록 {args.block_size})")
+    start_time = time.time()
+    identities, thresholds, genuine, impostor = calibrate_thresholds(
+        templates, face_ids,
+        impostor_fraction=args.fraction,
+        min_threshold=args.min,
+        max_threshold=args.max,
+        block_size=args.block_size
+    )
+    print(f"[INFO] 보정 완료 ({time.time() - start_time:.1f}초)")
+    _print_distribution("본인 거리", genuine)
+    _print_distribution("가장 가까운 타인 거리", impostor)
+    _print_distribution("보정 임계값", thresholds)
+
+    gallery = db.load_gallery()
+    people = dict(zip(gallery["ids"], zip(gallery["names"], gallery["student_ids"])))
+    strict = np.argsort(impostor)[:5]
+    print("  가장 닮은 사람이 가까운 학생:")
+    for row in strict:
+        name, student_id = people.get(int(identities[row]), ("?", "?"))
+        print(f"    - {name} ({student_id}): 타인 거리 {impostor[row]:.3f} → 임계값 {thresholds[row]:.3f}")
+
+    if args.dry_run:
+        print("[INFO] --dry-run: 저장하지 않았습니다")
+        return 0
+
+    db.set_match_thresholds(zip(identities.tolist(), thresholds.tolist()))
+    print(f"[INFO] ✅ 개인별 임계값 {count}개 저장")
+    return 0
+
+
+def run_audit(db, args):
+    """audit 명령: 같은 사람으로 의심되는 다른 학번 쌍 찾기"""
+    gallery = db.load_gallery()
+    count = len(gallery["ids"])
+    print(f"[INFO] 중복 검사 중... ({db.embedding_model}, {count}명, 임계값 {args.threshold}, 블록 {args.block_size})")
+    start_time = time.time()
+    rows, cols, distances = find_close_pairs(
+        gallery["encodings"], args.threshold,
+        labels=gallery["student_ids"],
+        block_size=args.block_size
+    )
+    print(f"[INFO] 검사 완료 ({time.time() - start_time:.1f}초)")
+
+    if len(rows) == 0:
+        print("[INFO] ✅ 중복 의심 쌍이 없습니다")
+        return 0
+
+    pairs = [
+        (gallery["student_ids"][i], gallery["names"][i], gallery["student_ids"][j], gallery["names"][j], float(d))
+        for i, j, d in zip(rows, cols, distances)
+    ]
+    print(f"[WARN] 중복 의심 쌍 {len(pairs)}건:")
+    for sid_a, name_a, sid_b, name_b, distance in pairs[:args.show]:
+        print(f"  - {name_a} ({sid_a}) ↔ {name_b} ({sid_b}): 거리 {distance:.3f}")
+    if len(pairs) > args.show:
+        print(f"  ... 외 {len(pairs) - args.show}건")
+
+    if args.report:
+        with open(args.report, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow(["student_id_a", "name_a", "student_id_b", "name_b", "distance"])
+            writer.writerows(pairs)
+        print(f"[INFO] 중복 의심 목록 저장: {args.report}")
+    return 1
+
+
+def main():
+    from database import DEFAULT_EMBEDDING_MODEL, EMBEDDING_MODELS, FaceDatabase
+
+    parser = argparse.ArgumentParser(description="갤러리 분석 도구")
+    parser.add_argument("--db", default="face_recognition.db", help="DB 파일 경로")
+    parser.add_argument("--model", choices=sorted(EMBEDDING_MODELS), default=DEFAULT_EMBEDDING_MODEL,
+                        help="분석할 임베딩 모델 (이 모델로 태그된 행만 비교)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    audit = subparsers.add_parser("audit", help="다른 학번으로 중복 등록된 얼굴 찾기")
+    audit.add_argument("--threshold", type=float, help="이 거리 미만이면 중복 의심 (기본: 모델별 값)")
+    audit.add_argument("--block-size", type=int, default=BLOCK_SIZE, help="블록 크기 (메모리 제한)")
+    audit.add_argument("--report", help="중복 의심 목록 CSV 저장 경로")
+    audit.add_argument("--show", type=int, default=20, help="화면에 출력할 최대 쌍 수")
+
+    calibrate = subparsers.add_parser("calibrate", help="개인별 매칭 임계값 보정")
+    calibrate.add_argument("--fraction", type=float, default=IMPOSTOR_FRACTION,
+                           help="가장 가까운 타인 거리 대비 허용 비율")
+    calibrate.add_argument("--min", type=float, help="임계값 하한 (기본: 모델별 값)")
+    calibrate.add_argument("--max", type=float, help="임계값 상한 (기본: 모델별 값)")
+    calibrate.add_argument("--block-size", type=int, default=BLOCK_SIZE, help="블록 크기 (메모리 제한)")
+    calibrate.add_argument("--dry-run", action="store_true", help="저장하지 않고 분포만 출력")
+    calibrate.add_argument("--clear", action="store_true", help="보정값 삭제 (전역 설정 사용)")
+    args = parser.parse_args()
+
+    # 지정하지 않은 임계값은 모델별 기본값 (거리 척도가 모델마다 다름)
+    defaults = EMBEDDING_MODELS[args.model]
+    if args.command == "audit" and args.threshold is None:
+        args.threshold = defaults["duplicate_threshold"]
+    if args.command == "calibrate":
+        if args.min is None:
+            args.min = defaults["min_threshold"]
+        if args.max is None:
+            args.max = defaults["max_threshold"]
+
+    db = FaceDatabase(args.db, embedding_model=args.model)
+    try:
+        if args.command == "audit":
+            return run_audit(db, args)
+        if args.command == "calibrate":
+            return run_calibrate(db, args)
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+갤러리 백업 아카이브 모듈
+등록된 얼굴 DB를 압축된 단일 파일로 내보내고 가져오기 (키오스크 배포/백업용)
+
+아카이브 형식 (zip, DEFLATE):
+    manifest.json       형식 이름/버전, 행 수, 인코딩 차원, 각 멤버의 sha256
+    names.npy 등        명단 열마다 하나의 고정 길이 유니코드 배열 (열 단위 저장)
+    encodings.npy       (N, dim) float32 인코딩 블록 하나
+모든 배열은 .npy 형식이며 pickle 없이 읽음
+"""
+import hashlib
+import json
+import time
+import zipfile
+import numpy as np
+
+ARCHIVE_FORMAT = "face-gallery"
+ARCHIVE_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+# 명단 열 (registered_faces 열 이름과 동일)
+TEXT_COLUMNS = ("name", "student_id", "department", "grade", "registered_date")
+ENCODINGS_MEMBER = "encodings"
+
+
+class ArchiveError(ValueError):
+    """아카이브 형식/무결성 오류"""
+
+
+class _HashingWriter:
+    """쓰는 바이트의 sha256을 함께 계산하는 파일 래퍼"""
+
+    def __init__(self, f):
+        self.f = f
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        return self.f.write(data)
+
+
+class _HashingReader:
+    """읽는 바이트의 sha256을 함께 계산하는 파일 래퍼"""
+
+    def __init__(self, f):
+        self.f = f
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.sha256.update(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def drain(self):
+        while self.read(1 << 20):
+            pass
+
+
+def write_archive(path, columns, encodings, metadata=None):
+    """
+    아카이브 쓰기 (멤버마다 zip 스트림에 바로 기록)
+
+    Args:
+        path: 출력 파일 경로
+        columns: {열 이름: 문자열 목록} (TEXT_COLUMNS)
+        encodings: (N, dim) float32 행렬 (np.memmap 가능)
+        metadata: manifest에 함께 기록할 값 (예: {"embedding_model": "dlib"})
+    """
+    encodings = np.asarray(encodings, dtype=np.float32)
+    count, dim = encodings.shape
+    members = {}
+
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        arrays = [(name, np.asarray(columns[name], dtype=str).reshape(count)) for name in TEXT_COLUMNS]
+        arrays.append((ENCODINGS_MEMBER, encodings))
+
+        for name, array in arrays:
+            with zf.open(f"{name}.npy", "w", force_zip64=True) as f:
+                writer = _HashingWriter(f)
+                np.lib.format.write_array(writer, array, allow_pickle=False)
+            members[name] = {
+                "sha256": writer.sha256.hexdigest(),
+                "dtype": array.dtype.str,
+                "shape": list(array.shape)
+            }
+
+        manifest = {
+            "format": ARCHIVE_FORMAT,
+            "version": ARCHIVE_VERSION,
+            "count": count,
+            "dim": dim,
+            "exported_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "members": members
+        }
+        if metadata:
+            manifest.update(metadata)
+        zf.writestr(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2))
+
+
+def read_archive(path):
+    """
+    아카이브 읽기 + 형식/체크섬 검증
+
+    Returns:
+        (manifest, {열 이름: 유니코드 배열}, (N, dim) float32 인코딩 행렬)
+    """
+    with zipfile.ZipFile(path, "r") as zf:
+        try:
+            manifest = json.loads(zf.read(MANIFEST_NAME))
+        except KeyError:
+            raise ArchiveError(f"manifest.json이 없습니다: {path}")
+
+        if manifest.get("format") != ARCHIVE_FORMAT:
+            raise ArchiveError(f"갤러리 아카이브가 아닙니다: {path}")
+        if manifest.get("version") != ARCHIVE_VERSION:
+            raise ArchiveError(f"지원하지 않는 아카이브 버전입니다: {manifest.get('version')}")
+
+        arrays = {}
+        for name, info in manifest["members"].items():
+            with zf.open(f"{name}.npy", "r") as f:
+                reader = _HashingReader(f)
+                array = np.lib.format.read_array(reader, allow_pickle=False)
+                reader.drain()
+            if reader.sha256.hexdigest() != info["sha256"]:
+                raise ArchiveError(f"체크섬 불일치: {name}.npy")
+            arrays[name] = array
+
+    count, dim = manifest["count"], manifest["dim"]
+    encodings = arrays.get(ENCODINGS_MEMBER)
+    if encodings is None or encodings.shape != (count, dim):
+        raise ArchiveError("인코딩 블록 크기가 manifest와 다릅니다")
+
+    columns = {}
+    for name in TEXT_COLUMNS:
+        if name not in arrays or arrays[name].shape != (count,):
+            raise ArchiveError(f"명단 열이 없거나 크기가 다릅니다: {name}")
+        columns[name] = arrays[name]
+
+    return manifest, columns, np.ascontiguousarray(encodings, dtype=np.float32)
+
+
+def main():
+    import argparse
+    from database import DEFAULT_EMBEDDING_MODEL, EMBEDDING_MODELS, FaceDatabase
+
+    parser = argparse.ArgumentParser(description="얼굴 갤러리 내보내기/가져오기")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("archive", help="아카이브 파일 경로 (.fga)")
+    parser.add_argument("--db", default="face_recognition.db", help="DB 파일 경로")
+    parser.add_argument("--replace", action="store_true", help="가져오기 전에 기존 등록 얼굴 삭제")
+    parser.add_argument("--model", choices=sorted(EMBEDDING_MODELS), default=DEFAULT_EMBEDDING_MODEL,
+                        help="내보내거나 가져올 갤러리의 임베딩 모델")
+    args = parser.parse_args()
+
+    db = FaceDatabase(args.db, embedding_model=args.model)
+    start_time = time.time()
+    try:
+        if args.command == "export":
+            count = db.export_gallery(args.archive)
+            print(f"[INFO] ✅ 내보내기 완료: {count}명 → {args.archive} ({time.time() - start_time:.1f}초)")
+        else:
+            imported, skipped = db.import_gallery(args.archive, replace=args.replace)
+            print(f"[INFO] ✅ 가져오기 완료: {imported}명 ({time.time() - start_time:.1f}초)")
+            if skipped:
+                print(f"[WARN] 이미 등록된 학번 {skipped}건은 건너뛰었습니다")
+    except ArchiveError as e:
+        print(f"[ERROR] {e}")
+        return 1
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
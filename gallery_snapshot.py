@@ -0,0 +1,111 @@
+"""
+갤러리 스냅샷 모듈
+등록된 얼굴 인코딩 행렬을 SQLite 옆의 사이드카 파일로 저장하고
+np.memmap으로 열어 여러 프로세스가 같은 페이지 캐시를 공유하도록 함
+
+파일 형식 (little-endian):
+    [0:64)            헤더 (매직, 버전, 행 수, 차원, 세대 번호, 오프셋)
+    [ids_offset)      int64 id 배열 (registered_faces.id, 행 순서)
+    [enc_offset)      float32 (N, dim) 인코딩 행렬 (64바이트 정렬)
+"""
+import os
+import struct
+import numpy as np
+
+MAGIC = b"FGAL"
+FORMAT_VERSION = 1
+HEADER_SIZE = 64
+ALIGNMENT = 64
+
+# magic, version, count, dim, generation, ids_offset, enc_offset
+_HEADER = struct.Struct("<4sIQIQQQ")
+
+IDS_DTYPE = np.dtype('<i8')
+ENCODINGS_DTYPE = np.dtype('<f4')
+
+
+def snapshot_path(db_name, tag=None):
+    """
+    DB 파일 경로 → 스냅샷 파일 경로 (face_recognition.db → face_recognition.gallery)
+
+    tag를 주면 같은 DB의 다른 갤러리용 경로 (예: arcface → face_recognition.arcface.gallery)
+    """
+    base = os.path.splitext(db_name)[0]
+    if tag:
+        base += f".{tag}"
+    return base + ".gallery"
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_snapshot(path, ids, encodings, generation):
+    """
+    스냅샷 파일을 원자적으로 다시 쓰기 (임시 파일 작성 후 os.replace)
+
+    Args:
+        path: 스냅샷 파일 경로
+        ids: registered_faces.id 배열 (N,)
+        encodings: 인코딩 행렬 (N, dim)
+        generation: 이 스냅샷이 반영한 갤러리 세대 번호
+    """
+    ids = np.ascontiguousarray(ids, dtype=IDS_DTYPE)
+    encodings = np.ascontiguousarray(encodings, dtype=ENCODINGS_DTYPE)
+    count, dim = encodings.shape
+
+    ids_offset = HEADER_SIZE
+    enc_offset = _align(ids_offset + ids.nbytes)
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, count, dim, generation, ids_offset, enc_offset)
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(header.ljust(HEADER_SIZE, b"\0"))
+            f.write(ids.tobytes())
+            f.write(b"\0" * (enc_offset - ids_offset - ids.nbytes))
+            f.write(encodings.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class GallerySnapshot:
+    """메모리 맵으로 연 읽기 전용 갤러리 스냅샷"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) < _HEADER.size:
+            raise ValueError(f"스냅샷 헤더가 손상되었습니다: {path}")
+
+        magic, version, count, dim, generation, ids_offset, enc_offset = _HEADER.unpack_from(header)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"지원하지 않는 스냅샷 형식입니다: {path}")
+
+        self.path = path
+        self.count = count
+        self.dim = dim
+        self.generation = generation
+
+        if count == 0:
+            # 길이 0 파일 영역은 mmap할 수 없음
+            self.ids = np.empty(0, dtype=IDS_DTYPE)
+            self.encodings = np.empty((0, dim), dtype=ENCODINGS_DTYPE)
+        else:
+            self.ids = np.memmap(path, dtype=IDS_DTYPE, mode="r", offset=ids_offset, shape=(count,))
+            self.encodings = np.memmap(path, dtype=ENCODINGS_DTYPE, mode="r", offset=enc_offset, shape=(count, dim))
+
+
+def open_snapshot(path):
+    """스냅샷 열기 (파일이 없거나 손상되었으면 None)"""
+    if not os.path.exists(path):
+        return None
+    try:
+        return GallerySnapshot(path)
+    except (OSError, ValueError) as e:
+        print(f"[WARN] 갤러리 스냅샷 로드 실패: {e}")
+        return None
@@ -2,16 +2,25 @@
 멀티 화면 GUI를 위한 화면 관리 클래스들
 """
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
+from tkinter import ttk, messagebox, simpledialog, filedialog
 import cv2
 from PIL import Image, ImageTk, ImageDraw, ImageFont
-import face_recognition
 import threading
 import time
 import numpy as np
 import queue
-from database import FaceDatabase
-from yolo_face_detector import YOLOFaceDetector
+from database import FaceDatabase, template_centroid
+from presence_tracker import PresenceTracker
+from live_gallery import LiveGallery
+from face_index import FaceIndex, TemplateMatcher, match_thresholds
+import ann_index
+import pq_index
+from roster_scope import RosterScope, ScopedIndex
+from hot_set import HotSetMatcher
+from face_tracker import TrackCache
+from bulk_enroll import bulk_enroll
+from detector_registry import DetectorRegistry, available_detectors
+from embedding_engine import ENGINE_NAMES, available_engines, get_engine, make_crop
 
 class ScreenManager:
     """화면 전환을 관리하는 클래스"""
@@ -19,18 +28,81 @@ class ScreenManager:
         self.root = root
         self.current_screen = None
         self.screens = {}
-        self.db = FaceDatabase()
         
         # 전역 설정
         self.settings = {
             'camera_index': 0,
+            'detector_type': 'auto',  # 'auto', 'retinaface', 'yolo', 'hog'
+            'retinaface_det_size': 640,  # RetinaFace 입력 크기 (320/480이면 빠르지만 작은 얼굴은 놓칠 수 있음)
+            'embedding_model': 'dlib',  # 'dlib' (128차원) 또는 'arcface' (512차원, models/arcface.onnx)
+            'arcface_tolerance': 1.10,  # ArcFace 매칭 거리 임계값 (단위 벡터 거리, 코사인 유사도 약 0.4)
+            'dlib_detector_landmarks': False,  # dlib 정렬에 감지기 랜드마크 사용 (embedding_engine.py check-alignment 통과 후에만)
             'tolerance': 0.45,
             'distance_threshold': 0.50,
             'upsample_times': 1,
             'frame_scale': 0.25,
-            'show_confidence': True
+            'show_confidence': True,
+            'presence_gap': 10.0,  # 이 시간(초) 이상 안 보이면 재실 구간 종료
+            'log_retention_days': 90,  # 원본 로그 보존 기간 (이후 일별 요약으로 압축)
+            'match_backend': 'exact',  # 'exact' (전수 비교), 'ivf' (근사 검색), 'pq' (저메모리)
+            'ann_nprobe': 8,  # IVF에서 쿼리마다 살펴볼 군집 수 (↑ 정확도, ↓ 속도)
+            'ann_min_gallery': 20000,  # 이 인원 이상일 때만 근사 검색 사용
+            'pq_rerank': 64,  # PQ에서 원본 벡터로 다시 비교할 후보 수
+            'scope_department': '',  # 인식 범위 (빈 값은 제한 없음)
+            'scope_grade': '',
+            'scope_student_ids': [],
+            'scope_fallback': True,  # 범위 안에서 못 찾으면 전체 갤러리에서 다시 찾기
+            'hot_set_size': 64,  # 최근 인식된 얼굴 캐시 크기 (0이면 사용 안 함)
+            'hot_set_margin': 0.1,  # 캐시만으로 확정하려면 임계값보다 이만큼 더 가까워야 함
+            'use_calibrated_thresholds': True,  # 개인별 보정 임계값 사용 (gallery_analysis.py calibrate)
+            'register_captures': 3,  # 등록 시 촬영할 템플릿 수 (여러 각도/표정)
+            'template_top_k': 5,  # 중심 검색 후 개별 템플릿과 다시 비교할 후보 인원 수
+            'track_refresh_interval': 2.0,  # 같은 자리의 얼굴은 이 시간(초)마다만 다시 인코딩 (0이면 매번)
+            'track_reencode_iou': 0.6,  # 마지막 인코딩 위치와의 IoU가 이보다 작으면 (크게 움직임) 다시 인코딩
+            'track_certain_margin': 0.05  # 임계값보다 이만큼 더 가까워야 결과를 캐시 (아니면 매번 인코딩)
         }
         
+        # 🔔 갤러리는 설정된 임베딩 모델로 태그된 얼굴만 조회
+        self.db = FaceDatabase(embedding_model=self.settings['embedding_model'])
+        
+        # 🔔 감지기는 모든 화면이 공유 (종류마다 한 번만 로드, 백그라운드에서 미리 로드)
+        self.detectors = DetectorRegistry(self.settings['upsample_times'], self.settings['retinaface_det_size'])
+        self.detectors.preload(self.settings['detector_type'])
+        
+        # 🔔 오래된 인식 로그를 백그라운드에서 일별 요약으로 압축
+        self.db.start_log_compaction(retention_days=self.settings['log_retention_days'])
+        
+    def set_embedding_model(self, model):
+        """🔔 임베딩 모델 변경 (DB 갤러리 조회/등록 대상도 같은 모델로)"""
+        self.settings['embedding_model'] = model
+        self.db.set_embedding_model(model)
+    
+    def get_embedder(self):
+        """
+        🔔 현재 설정의 임베딩 엔진 (처음 사용할 때 로드, 모든 화면이 공유)
+        
+        ArcFace를 로드할 수 없으면 dlib으로 되돌림 (갤러리도 dlib 모델로 전환)
+        """
+        model = self.settings['embedding_model']
+        try:
+            embedder = get_engine(model)
+        except Exception as e:
+            if model == 'dlib':
+                raise
+            print(f"[WARN] {ENGINE_NAMES[model]} 임베딩 엔진 초기화 실패, dlib으로 대체: {e}")
+            self.set_embedding_model('dlib')
+            embedder = get_engine('dlib')
+        if embedder.name == 'dlib':
+            # 🔔 기본은 일괄 등록(HOG)과 같은 dlib 예측기 정렬
+            embedder.use_landmarks = self.settings['dlib_detector_landmarks']
+        return embedder
+    
+    def match_threshold(self, embedder):
+        """임베딩 엔진에 맞는 매칭 거리 임계값 (모델마다 거리 척도가 다름)"""
+        if embedder.name == 'arcface':
+            return self.settings['arcface_tolerance']
+        return min(self.settings['tolerance'], self.settings['distance_threshold'])
+    
     def show_screen(self, screen_name):
         """화면 전환"""
         if self.current_screen:
@@ -287,11 +359,7 @@ class SettingsScreen(tk.Frame):
         ).pack(anchor=tk.W, pady=5)
         
         # 현재 사용 가능한 감지기 확인
-        available_detectors = self._check_available_detectors()
-        
-        # 기본값 설정 (설정에 없으면 'auto')
-        if 'detector_type' not in self.manager.settings:
-            self.manager.settings['detector_type'] = 'auto'
+        available = available_detectors()
         
         self.detector_var = tk.StringVar(value=self.manager.settings['detector_type'])
         
@@ -305,7 +373,7 @@ class SettingsScreen(tk.Frame):
         
         for text, value, emoji in detectors:
             # 사용 가능한지 확인
-            if value == 'auto' or value in available_detectors:
+            if value == 'auto' or value in available:
                 status = "✅"
             else:
                 status = "❌"
@@ -317,7 +385,7 @@ class SettingsScreen(tk.Frame):
                 value=value,
                 font=("Arial", 11),
                 bg="#ecf0f1",
-                state=tk.NORMAL if (value == 'auto' or value in available_detectors) else tk.DISABLED
+                state=tk.NORMAL if (value == 'auto' or value in available) else tk.DISABLED
             )
             radio.pack(anchor=tk.W, padx=20, pady=5)
         
@@ -332,6 +400,31 @@ class SettingsScreen(tk.Frame):
         self.detector_status.pack(pady=10)
         self._update_detector_status()
         
+        # 🔔 RetinaFace 입력 크기 (작을수록 빠름)
+        det_size_row = tk.Frame(detector_frame, bg="#ecf0f1")
+        det_size_row.pack(anchor=tk.W, padx=20, pady=5)
+        tk.Label(
+            det_size_row,
+            text="RetinaFace 입력 크기:",
+            font=("Arial", 11),
+            bg="#ecf0f1"
+        ).pack(side=tk.LEFT)
+        self.det_size_var = tk.IntVar(value=self.manager.settings['retinaface_det_size'])
+        ttk.Combobox(
+            det_size_row,
+            textvariable=self.det_size_var,
+            values=(320, 480, 640),
+            width=6,
+            state="readonly"
+        ).pack(side=tk.LEFT, padx=5)
+        tk.Label(
+            det_size_row,
+            text="(작을수록 빠르지만 먼 얼굴은 놓칠 수 있음)",
+            font=("Arial", 9),
+            bg="#ecf0f1",
+            fg="#7f8c8d"
+        ).pack(side=tk.LEFT)
+        
         # 설치 안내
         install_info = tk.Frame(detector_frame, bg="#ecf0f1")
         install_info.pack(fill=tk.X, pady=10)
@@ -344,7 +437,7 @@ class SettingsScreen(tk.Frame):
             fg="#7f8c8d"
         ).pack(anchor=tk.W)
         
-        if 'retinaface' not in available_detectors:
+        if 'retinaface' not in available:
             tk.Label(
                 install_info,
                 text="  • RetinaFace: python download_retinaface.py",
@@ -353,7 +446,7 @@ class SettingsScreen(tk.Frame):
                 fg="#7f8c8d"
             ).pack(anchor=tk.W)
         
-        if 'yolo' not in available_detectors:
+        if 'yolo' not in available:
             tk.Label(
                 install_info,
                 text="  • YOLO-Face: models/README.md 참조",
@@ -362,6 +455,54 @@ class SettingsScreen(tk.Frame):
                 fg="#7f8c8d"
             ).pack(anchor=tk.W)
         
+        # 🔔 얼굴 인코딩(임베딩) 모델
+        embedding_frame = tk.LabelFrame(
+            scrollable_frame,
+            text=" 얼굴 인코딩 모델 ",
+            font=("Arial", 16, "bold"),
+            bg="#ecf0f1",
+            fg="#2c3e50",
+            padx=20,
+            pady=20
+        )
+        embedding_frame.pack(fill=tk.X, padx=20, pady=10)
+        
+        engines = available_engines()
+        self.embedding_var = tk.StringVar(value=self.manager.settings['embedding_model'])
+        embedding_options = [
+            ("dlib ResNet (128차원, 기본 내장, CPU)", "dlib"),
+            ("ArcFace (512차원, 프레임의 얼굴을 한 번에 배치 추론, GPU 가속)", "arcface"),
+        ]
+        for text, value in embedding_options:
+            tk.Radiobutton(
+                embedding_frame,
+                text=f"{text} {'✅' if value in engines else '❌'}",
+                variable=self.embedding_var,
+                value=value,
+                font=("Arial", 11),
+                bg="#ecf0f1",
+                state=tk.NORMAL if value in engines else tk.DISABLED
+            ).pack(anchor=tk.W, padx=20, pady=5)
+        
+        counts = self.manager.db.get_embedding_model_counts()
+        tk.Label(
+            embedding_frame,
+            text="등록 인원: " + ", ".join(f"{ENGINE_NAMES[value]} {counts.get(value, 0)}명"
+                                         for _, value in embedding_options),
+            font=("Arial", 10, "bold"),
+            bg="#ecf0f1",
+            fg="#2980b9"
+        ).pack(pady=5)
+        tk.Label(
+            embedding_frame,
+            text="💡 모델마다 인코딩이 달라 다른 모델로 등록된 얼굴은 비교하지 않습니다.\n"
+                 "    모델을 바꾼 뒤 python embedding_engine.py reembed --model <모델> 로 변환하세요.",
+            font=("Arial", 9),
+            bg="#ecf0f1",
+            fg="#7f8c8d",
+            justify=tk.LEFT
+        ).pack(anchor=tk.W)
+        
         # 성능 프리셋
         preset_frame = tk.LabelFrame(
             scrollable_frame,
@@ -460,6 +601,159 @@ class SettingsScreen(tk.Frame):
             bg="#ecf0f1"
         ).pack(anchor=tk.W, pady=10)
         
+        # 개인별 보정 임계값
+        self.calibrated_var = tk.BooleanVar(value=self.manager.settings['use_calibrated_thresholds'])
+        tk.Checkbutton(
+            advanced_frame,
+            text="개인별 보정 임계값 사용 (python gallery_analysis.py calibrate)",
+            variable=self.calibrated_var,
+            font=("Arial", 11),
+            bg="#ecf0f1"
+        ).pack(anchor=tk.W, pady=10)
+        
+        # 🔔 등록 시 촬영 장수 (사람별 템플릿 수)
+        tk.Label(
+            advanced_frame,
+            text="등록 촬영 장수 (여러 각도/표정으로 찍을수록 인식이 안정적):",
+            font=("Arial", 11, "bold"),
+            bg="#ecf0f1"
+        ).pack(anchor=tk.W, pady=5)
+        
+        self.captures_var = tk.IntVar(value=self.manager.settings['register_captures'])
+        tk.Scale(
+            advanced_frame,
+            from_=1,
+            to=5,
+            resolution=1,
+            orient=tk.HORIZONTAL,
+            variable=self.captures_var,
+            bg="#ecf0f1",
+            length=400
+        ).pack(fill=tk.X, pady=5)
+        
+        # 🔔 얼굴 추적 캐시 갱신 주기
+        tk.Label(
+            advanced_frame,
+            text="같은 얼굴 재확인 주기 (초, 0이면 매 처리 프레임마다 인코딩):",
+            font=("Arial", 11, "bold"),
+            bg="#ecf0f1"
+        ).pack(anchor=tk.W, pady=5)
+        
+        self.track_refresh_var = tk.DoubleVar(value=self.manager.settings['track_refresh_interval'])
+        tk.Scale(
+            advanced_frame,
+            from_=0,
+            to=5,
+            resolution=0.5,
+            orient=tk.HORIZONTAL,
+            variable=self.track_refresh_var,
+            bg="#ecf0f1",
+            length=400
+        ).pack(fill=tk.X, pady=5)
+        
+        # 🔔 대규모 갤러리 검색 방식
+        search_frame = tk.LabelFrame(
+            scrollable_frame,
+            text=" 대규모 갤러리 검색 ",
+            font=("Arial", 16, "bold"),
+            bg="#ecf0f1",
+            fg="#2c3e50",
+            padx=20,
+            pady=20
+        )
+        search_frame.pack(fill=tk.X, padx=20, pady=10)
+        
+        self.backend_var = tk.StringVar(value=self.manager.settings['match_backend'])
+        backends = [
+            ("전수 비교 (정확, 수천 명까지 권장)", "exact"),
+            (f"IVF 근사 검색 ({self.manager.settings['ann_min_gallery']:,}명 이상일 때 사용)", "ivf"),
+            ("PQ 압축 갤러리 (저메모리 장치/Jetson 권장)", "pq"),
+        ]
+        for text, value in backends:
+            tk.Radiobutton(
+                search_frame,
+                text=text,
+                variable=self.backend_var,
+                value=value,
+                font=("Arial", 11),
+                bg="#ecf0f1"
+            ).pack(anchor=tk.W, padx=20, pady=5)
+        
+        tk.Label(
+            search_frame,
+            text="검색 범위 nprobe (높을수록 정확, 낮을수록 빠름):",
+            font=("Arial", 11, "bold"),
+            bg="#ecf0f1"
+        ).pack(anchor=tk.W, pady=5)
+        
+        self.nprobe_var = tk.IntVar(value=self.manager.settings['ann_nprobe'])
+        tk.Scale(
+            search_frame,
+            from_=1,
+            to=64,
+            resolution=1,
+            orient=tk.HORIZONTAL,
+            variable=self.nprobe_var,
+            bg="#ecf0f1",
+            length=400
+        ).pack(fill=tk.X, pady=5)
+        
+        # 🔔 인식 범위 (수업 명단)
+        scope_frame = tk.LabelFrame(
+            scrollable_frame,
+            text=" 인식 범위 (수업 명단) ",
+            font=("Arial", 16, "bold"),
+            bg="#ecf0f1",
+            fg="#2c3e50",
+            padx=20,
+            pady=20
+        )
+        scope_frame.pack(fill=tk.X, padx=20, pady=10)
+        
+        groups = self.manager.db.get_roster_groups()
+        scope_fields = tk.Frame(scope_frame, bg="#ecf0f1")
+        scope_fields.pack(fill=tk.X, pady=5)
+        
+        tk.Label(scope_fields, text="학과:", font=("Arial", 11, "bold"), bg="#ecf0f1").grid(row=0, column=0, sticky=tk.W, pady=5)
+        self.scope_department_var = tk.StringVar(value=self.manager.settings['scope_department'])
+        ttk.Combobox(
+            scope_fields,
+            textvariable=self.scope_department_var,
+            values=[""] + groups["departments"],
+            font=("Arial", 11),
+            width=25
+        ).grid(row=0, column=1, sticky=tk.W, padx=10, pady=5)
+        
+        tk.Label(scope_fields, text="학년:", font=("Arial", 11, "bold"), bg="#ecf0f1").grid(row=1, column=0, sticky=tk.W, pady=5)
+        self.scope_grade_var = tk.StringVar(value=self.manager.settings['scope_grade'])
+        ttk.Combobox(
+            scope_fields,
+            textvariable=self.scope_grade_var,
+            values=[""] + groups["grades"],
+            font=("Arial", 11),
+            width=25
+        ).grid(row=1, column=1, sticky=tk.W, padx=10, pady=5)
+        
+        tk.Label(
+            scope_frame,
+            text="학번 목록 (쉼표/줄바꿈으로 구분, 비우면 제한 없음):",
+            font=("Arial", 11, "bold"),
+            bg="#ecf0f1"
+        ).pack(anchor=tk.W, pady=5)
+        
+        self.scope_ids_text = tk.Text(scope_frame, height=4, font=("Arial", 11))
+        self.scope_ids_text.insert("1.0", "\n".join(self.manager.settings['scope_student_ids']))
+        self.scope_ids_text.pack(fill=tk.X, pady=5)
+        
+        self.scope_fallback_var = tk.BooleanVar(value=self.manager.settings['scope_fallback'])
+        tk.Checkbutton(
+            scope_frame,
+            text="범위 안에서 못 찾으면 전체 갤러리에서 다시 찾기",
+            variable=self.scope_fallback_var,
+            font=("Arial", 11),
+            bg="#ecf0f1"
+        ).pack(anchor=tk.W, pady=10)
+        
         # 저장 버튼
         tk.Button(
             scrollable_frame,
@@ -479,38 +773,22 @@ class SettingsScreen(tk.Frame):
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
     
-    def _check_available_detectors(self):
-        """사용 가능한 감지기 확인"""
-        available = []
-        
-        # RetinaFace 확인
-        try:
-            from pathlib import Path
-            retinaface_model = Path("models/retinaface.onnx")
-            if retinaface_model.exists() and retinaface_model.stat().st_size > 1000000:
-                available.append('retinaface')
-        except:
-            pass
-        
-        # YOLO-Face 확인
-        try:
-            from pathlib import Path
-            yolo_models = [
-                Path("models/yolov8n-face.pt"),
-                Path("models/yolov8s-face.pt"),
-                Path("models/yolov8m-face.pt"),
-                Path("models/yolov5n-face.pt"),
-                Path("models/yolov5s-face.pt"),
-            ]
-            if any(m.exists() and m.stat().st_size > 1000000 for m in yolo_models):
-                available.append('yolo')
-        except:
-            pass
-        
-        # HOG는 항상 사용 가능
-        available.append('hog')
-        
-        return available
+    def _save_embedding_model(self):
+        """🔔 임베딩 모델 변경 (새 모델로 등록된 얼굴이 부족하면 변환 안내)"""
+        model = self.embedding_var.get()
+        if model == self.manager.settings['embedding_model']:
+            return
+        self.manager.set_embedding_model(model)
+        
+        counts = self.manager.db.get_embedding_model_counts()
+        missing = sum(counts.values()) - counts.get(model, 0)
+        if missing:
+            messagebox.showwarning(
+                "인코딩 모델 변경",
+                f"{missing}명은 다른 모델로 등록되어 있어 인식되지 않습니다.\n\n"
+                f"python embedding_engine.py reembed --model {model}\n\n"
+                "위 명령으로 저장된 등록 사진에서 다시 계산하세요."
+            )
     
     def _update_detector_status(self):
         """현재 감지기 상태 업데이트"""
@@ -518,7 +796,7 @@ class SettingsScreen(tk.Frame):
         
         if detector_type == 'auto':
             # 자동 선택 시 실제 사용될 감지기 표시
-            available = self._check_available_detectors()
+            available = available_detectors()
             if 'retinaface' in available:
                 actual = "RetinaFace 🏆"
             elif 'yolo' in available:
@@ -595,7 +873,21 @@ class SettingsScreen(tk.Frame):
         self.manager.settings['distance_threshold'] = self.tolerance_var.get() + 0.05
         self.manager.settings['upsample_times'] = self.upsample_var.get()
         self.manager.settings['show_confidence'] = self.confidence_var.get()
+        self.manager.settings['use_calibrated_thresholds'] = self.calibrated_var.get()
+        self.manager.settings['register_captures'] = self.captures_var.get()
+        self.manager.settings['track_refresh_interval'] = self.track_refresh_var.get()
         self.manager.settings['detector_type'] = self.detector_var.get()
+        self.manager.settings['retinaface_det_size'] = self.det_size_var.get()
+        self.manager.detectors.hog.upsample_times = self.manager.settings['upsample_times']
+        self.manager.detectors.set_det_size(self.manager.settings['retinaface_det_size'])
+        self.manager.detectors.preload(self.manager.settings['detector_type'])
+        self._save_embedding_model()
+        self.manager.settings['match_backend'] = self.backend_var.get()
+        self.manager.settings['ann_nprobe'] = self.nprobe_var.get()
+        self.manager.settings['scope_department'] = self.scope_department_var.get().strip()
+        self.manager.settings['scope_grade'] = self.scope_grade_var.get().strip()
+        self.manager.settings['scope_student_ids'] = self.scope_ids_text.get("1.0", tk.END).replace(",", " ").split()
+        self.manager.settings['scope_fallback'] = self.scope_fallback_var.get()
         
         # 감지기 상태 업데이트
         self._update_detector_status()
@@ -610,56 +902,8 @@ class RegisterScreen(tk.Frame):
         super().__init__(parent, bg="#ecf0f1")
         self.manager = manager
         
-        # 🔔 감지기 초기화 (RecognitionScreen과 동일)
-        self.detector = None
-        self.detector_type = "HOG"
-        self._initialize_detector()
-        
         self.setup_ui()
     
-    def _initialize_detector(self):
-        """사용자 설정에 따라 감지기 초기화 (RecognitionScreen과 동일)"""
-        if 'detector_type' not in self.manager.settings:
-            self.manager.settings['detector_type'] = 'auto'
-        
-        detector_choice = self.manager.settings['detector_type']
-        
-        if detector_choice == 'retinaface':
-            if self._try_init_retinaface():
-                return
-        elif detector_choice == 'yolo':
-            if self._try_init_yolo():
-                return
-        elif detector_choice == 'hog':
-            self.detector_type = "HOG"
-            return
-        
-        # 'auto' 모드 또는 선택한 감지기 사용 불가 시 자동 선택
-        if self._try_init_retinaface():
-            return
-        if self._try_init_yolo():
-            return
-        
-        self.detector_type = "HOG"
-    
-    def _try_init_retinaface(self):
-        try:
-            from retinaface_detector import RetinaFaceDetector
-            self.detector = RetinaFaceDetector(conf_threshold=0.5)
-            self.detector_type = "RetinaFace"
-            return True
-        except:
-            return False
-    
-    def _try_init_yolo(self):
-        try:
-            from yolo_face_detector import YOLOFaceDetector
-            self.detector = YOLOFaceDetector(conf_threshold=0.3)
-            self.detector_type = "YOLO-Face"
-            return True
-        except:
-            return False
-    
     def setup_ui(self):
         # 헤더
         header = tk.Frame(self, bg="#34495e", height=80)
@@ -708,6 +952,23 @@ class RegisterScreen(tk.Frame):
             activeforeground="black"
         ).pack(fill=tk.X, pady=10)
         
+        # 일괄 등록 버튼 (CSV + 사진 폴더)
+        self.bulk_button = tk.Button(
+            main_frame,
+            text="사진 폴더로 일괄 등록하기",
+            command=self.bulk_register,
+            bg="#3498db",
+            fg="black",
+            font=("Arial", 14, "bold"),
+            cursor="hand2",
+            height=2,
+            relief=tk.RAISED,
+            bd=3,
+            activebackground="#3498db",
+            activeforeground="black"
+        )
+        self.bulk_button.pack(fill=tk.X, pady=10)
+        
         # 안내 메시지
         info_frame = tk.Frame(main_frame, bg="#3498db", relief=tk.RAISED, bd=2)
         info_frame.pack(fill=tk.X, pady=10)
@@ -744,6 +1005,77 @@ class RegisterScreen(tk.Frame):
         count = self.manager.db.get_registered_count()
         self.stats_label.config(text=f"현재 등록된 얼굴: {count}명")
     
+    def bulk_register(self):
+        """CSV 명단 + 사진 폴더로 일괄 등록 (백그라운드 스레드 + 프로세스 풀)"""
+        csv_path = filedialog.askopenfilename(
+            title="명단 CSV 선택 (name, student_id, department, grade, image)",
+            filetypes=[("CSV", "*.csv"), ("모든 파일", "*.*")]
+        )
+        if not csv_path:
+            return
+        
+        image_dir = filedialog.askdirectory(title="사진 폴더 선택")
+        if not image_dir:
+            return
+        
+        # 작업 스레드는 상태만 기록하고, GUI 갱신은 메인 스레드에서 폴링
+        self.bulk_state = {"done": 0, "total": 0, "result": None, "error": None}
+        
+        def progress(done, total):
+            self.bulk_state["done"] = done
+            self.bulk_state["total"] = total
+        
+        def run():
+            try:
+                self.bulk_state["result"] = bulk_enroll(
+                    self.manager.db, csv_path, image_dir,
+                    detector=self.manager.settings['detector_type'],
+                    upsample_times=self.manager.settings.get('upsample_times', 1),
+                    progress=progress,
+                    duplicate_threshold=self.manager.db.duplicate_threshold,
+                    det_size=self.manager.settings['retinaface_det_size'],
+                    dlib_landmarks=self.manager.settings['dlib_detector_landmarks']
+                )
+            except Exception as e:
+                self.bulk_state["error"] = e
+        
+        self.bulk_button.config(state=tk.DISABLED)
+        self.bulk_thread = threading.Thread(target=run, daemon=True)
+        self.bulk_thread.start()
+        self._poll_bulk_register()
+    
+    def _poll_bulk_register(self):
+        """일괄 등록 진행 상황 표시 (메인 스레드)"""
+        state = self.bulk_state
+        if self.bulk_thread.is_alive():
+            self.stats_label.config(text=f"일괄 등록 중... {state['done']}/{state['total']}")
+            self.after(200, self._poll_bulk_register)
+            return
+        
+        self.bulk_button.config(state=tk.NORMAL)
+        self.update_stats()
+        
+        if state["error"] is not None:
+            messagebox.showerror("오류", f"일괄 등록 실패: {state['error']}")
+            return
+        
+        enrolled, failures = state["result"]
+        reasons = {
+            "no_face": "얼굴 없음",
+            "multiple_faces": "여러 얼굴",
+            "duplicate_student_id": "중복 학번",
+            "missing_field": "빈 항목",
+        }
+        message = f"{enrolled}명이 등록되었습니다."
+        if failures:
+            lines = [f"{line}행 ({student_id or 'N/A'}): {reasons.get(reason, reason)}"
+                     for line, student_id, reason in failures[:20]]
+            if len(failures) > 20:
+                lines.append(f"... 외 {len(failures) - 20}건")
+            message += f"\n\n실패 {len(failures)}건:\n" + "\n".join(lines)
+        messagebox.showinfo("일괄 등록 완료", message)
+        print(f"[INFO] 일괄 등록: 성공 {enrolled}명, 실패 {len(failures)}건")
+    
     def register_new_face(self):
         """새 얼굴 등록"""
         # 학생 정보 입력 받기
@@ -764,8 +1096,7 @@ class RegisterScreen(tk.Frame):
             return
         
         # 이미 등록된 학번인지 확인
-        known_faces = self.manager.db.get_all_faces()
-        if student_id in known_faces["student_ids"]:
+        if self.manager.db.exists(student_id):
             messagebox.showerror("오류", f"학번 '{student_id}'은(는) 이미 등록되어 있습니다.")
             return
         
@@ -776,9 +1107,26 @@ class RegisterScreen(tk.Frame):
             messagebox.showerror("오류", f"카메라 {camera_index}를 열 수 없습니다.\n환경 설정에서 카메라를 확인하세요.")
             return
         
-        messagebox.showinfo("안내", "카메라를 보고 스페이스바를 눌러 사진을 촬영하세요.\nESC를 누르면 취소됩니다.")
+        # 🔔 여러 장 촬영해 사람별 템플릿으로 저장 (각도/표정을 조금씩 바꿔 촬영)
+        captures = max(1, self.manager.settings.get('register_captures', 1))
+        messagebox.showinfo(
+            "안내",
+            f"카메라를 보고 스페이스바를 눌러 사진을 촬영하세요. (총 {captures}장)\n"
+            "고개 각도나 표정을 조금씩 바꿔 촬영하면 인식이 더 안정적입니다.\n"
+            "ENTER를 누르면 지금까지 촬영한 사진으로 등록하고, ESC를 누르면 취소됩니다."
+        )
         
-        encoding = None
+        # 🔔 설정된 임베딩 엔진으로 인코딩하고, 모델을 바꿀 때 다시 계산할 수 있게 얼굴 사진도 저장
+        try:
+            embedder = self.manager.get_embedder()
+        except Exception as e:
+            cap.release()
+            messagebox.showerror("오류", f"인코딩 엔진을 불러올 수 없습니다: {e}")
+            return
+        
+        encodings = []
+        crops = []
+        cancelled = False
         
         while True:
             ret, frame = cap.read()
@@ -789,7 +1137,7 @@ class RegisterScreen(tk.Frame):
             display_frame = frame.copy()
             cv2.putText(
                 display_frame,
-                f"Registering: {name}",
+                f"Registering: {name} ({len(encodings)}/{captures})",
                 (10, 30),
                 cv2.FONT_HERSHEY_SIMPLEX,
                 1,
@@ -798,7 +1146,7 @@ class RegisterScreen(tk.Frame):
             )
             cv2.putText(
                 display_frame,
-                "SPACE: Capture | ESC: Cancel",
+                "SPACE: Capture | ENTER: Done | ESC: Cancel",
                 (10, 70),
                 cv2.FONT_HERSHEY_SIMPLEX,
                 0.7,
@@ -811,22 +1159,18 @@ class RegisterScreen(tk.Frame):
             key = cv2.waitKey(1) & 0xFF
             
             if key == 27:  # ESC
+                cancelled = True
+                break
+            elif key == 13 and encodings:  # ENTER
                 break
             elif key == 32:  # SPACE
                 # 🔔 얼굴 감지 및 인코딩 (설정된 감지기 사용)
                 rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
                 
-                # RecognitionScreen과 동일한 감지기 사용
+                # 🔔 RecognitionScreen과 같은 공유 감지기 사용 (이미 로드되어 있으면 재사용)
                 try:
-                    if self.detector and self.detector_type != "HOG":
-                        # 🔔 RetinaFace/YOLO는 upsample_times 불필요
-                        face_locations = self.detector.detect_faces(rgb_frame)
-                    else:
-                        face_locations = face_recognition.face_locations(
-                            rgb_frame,
-                            model="hog",
-                            number_of_times_to_upsample=self.manager.settings.get('upsample_times', 1)
-                        )
+                    detector = self.manager.detectors.get(self.manager.settings['detector_type'])
+                    face_locations = detector.detect(rgb_frame)
                 except Exception as e:
                     print(f"[ERROR] 얼굴 감지 오류: {e}")
                     messagebox.showerror("오류", f"얼굴 감지 실패: {e}")
@@ -840,18 +1184,35 @@ class RegisterScreen(tk.Frame):
                     continue
                 
                 # 얼굴 인코딩 생성
-                face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-                encoding = face_encodings[0]
+                # 🔔 감지기 5점 랜드마크가 있으면 정렬에 쓰고 등록 사진에도 함께 저장
+                landmarks = None if face_locations.landmarks is None else face_locations.landmarks[0]
+                encodings.append(embedder.embed(rgb_frame, face_locations)[0])
+                crops.append(make_crop(rgb_frame, face_locations[0], landmarks))
+                print(f"[INFO] 등록 촬영 {len(encodings)}/{captures}")
                 
-                messagebox.showinfo("성공", f"'{name}'의 얼굴이 촬영되었습니다!")
-                break
+                if len(encodings) >= captures:
+                    break
         
         cap.release()
         cv2.destroyAllWindows()
         
         # 데이터베이스에 저장
-        if encoding is not None:
-            if self.manager.db.add_face(name, student_id, department, grade, encoding):
+        if encodings and not cancelled:
+            encoding = np.array(encodings, dtype=np.float32)
+            messagebox.showinfo("성공", f"'{name}'의 얼굴이 {len(encoding)}장 촬영되었습니다!")
+            
+            # 🔔 다른 학번으로 이미 등록된 같은 사람인지 확인 (템플릿 평균으로 비교)
+            similar = self.manager.db.find_similar_faces(template_centroid(encoding, embedder.name))
+            if similar:
+                lines = "\n".join(f"  • {face['name']} ({face['student_id']}) - 거리 {face['distance']:.2f}"
+                                  for face in similar[:5])
+                if not messagebox.askyesno(
+                    "중복 의심",
+                    f"이미 등록된 얼굴과 매우 비슷합니다:\n\n{lines}\n\n그래도 '{name}'(으)로 등록하시겠습니까?"
+                ):
+                    return
+            
+            if self.manager.db.add_face(name, student_id, department, grade, encoding, crops=crops):
                 messagebox.showinfo("성공", f"'{name}' (학번: {student_id})이(가) 성공적으로 등록되었습니다!")
                 self.update_stats()
             else:
@@ -860,9 +1221,12 @@ class RegisterScreen(tk.Frame):
 
 class DatabaseScreen(tk.Frame):
     """데이터베이스 관리 화면"""
+    ROSTER_BATCH_SIZE = 500  # 목록을 한 번에 그릴 행 수
+    
     def __init__(self, parent, manager):
         super().__init__(parent, bg="#ecf0f1")
         self.manager = manager
+        self.roster_iter = None
         self.setup_ui()
     
     def setup_ui(self):
@@ -1000,16 +1364,26 @@ class DatabaseScreen(tk.Frame):
         count = self.manager.db.get_registered_count()
         self.stats_text.config(text=f"등록된 얼굴: {count}명")
         
-        # 목록 업데이트
+        # 목록 업데이트 (인코딩 없이 묶음 단위로 나눠 그려 화면이 멈추지 않게 함)
         self.face_listbox.delete(0, tk.END)
-        known_faces = self.manager.db.get_all_faces()
-        for i in range(len(known_faces["names"])):
-            name = known_faces["names"][i]
-            student_id = known_faces["student_ids"][i]
-            department = known_faces["departments"][i]
-            grade = known_faces["grades"][i]
-            display_text = f"{name} | {student_id} | {department} | {grade}학년"
-            self.face_listbox.insert(tk.END, display_text)
+        self.roster_iter = self.manager.db.iter_roster(batch_size=self.ROSTER_BATCH_SIZE)
+        self._load_roster_batch(self.roster_iter)
+    
+    def _load_roster_batch(self, roster_iter):
+        """목록 한 묶음 추가 후 다음 묶음 예약"""
+        if roster_iter is not self.roster_iter:
+            return  # 그 사이에 새로고침됨
+        
+        batch = next(roster_iter, None)
+        if batch is None:
+            return
+        
+        self.face_listbox.insert(
+            tk.END,
+            *(f"{name} | {student_id} | {department} | {grade}학년"
+              for name, student_id, department, grade in batch)
+        )
+        self.after(1, self._load_roster_batch, roster_iter)
     
     def delete_selected(self):
         """선택된 얼굴 삭제"""
@@ -1037,47 +1411,148 @@ class DatabaseScreen(tk.Frame):
     
     def show_logs(self):
         """인식 로그 표시"""
-        logs = self.manager.db.get_recognition_logs(limit=100)
+        logs, _ = self.manager.db.get_recognition_logs_page(limit=1)
         
         if not logs:
             messagebox.showinfo("로그", "인식 로그가 없습니다.")
             return
         
-        # 새 창으로 로그 표시
-        log_window = tk.Toplevel(self)
-        log_window.title("인식 로그")
-        log_window.geometry("600x400")
+        # 새 창으로 로그 표시 (스크롤할 때 다음 페이지를 불러옴)
+        RecognitionLogWindow(self, self.manager.db)
+
+
+class RecognitionLogWindow(tk.Toplevel):
+    """인식 로그 창 (필터 + 키셋 페이지네이션으로 필요한 만큼만 로드)"""
+    PAGE_SIZE = 100
+    
+    PERIODS = {
+        "전체": None,
+        "최근 24시간": 24 * 3600,
+        "최근 7일": 7 * 24 * 3600,
+        "최근 30일": 30 * 24 * 3600,
+    }
+    STATUSES = {
+        "전체": None,
+        "등록됨": True,
+        "미등록": False,
+    }
+    
+    def __init__(self, parent, db):
+        super().__init__(parent)
+        self.db = db
+        self.next_cursor = None
+        self.filters = {}
+        self.loading = False
+        
+        self.title("인식 로그")
+        self.geometry("700x450")
+        self.setup_ui()
+        self.apply_filters()
+    
+    def setup_ui(self):
+        # 필터
+        filter_frame = tk.Frame(self)
+        filter_frame.pack(fill=tk.X, padx=10, pady=(10, 0))
+        
+        tk.Label(filter_frame, text="학번:").pack(side=tk.LEFT)
+        self.student_id_var = tk.StringVar()
+        student_entry = tk.Entry(filter_frame, textvariable=self.student_id_var, width=12)
+        student_entry.pack(side=tk.LEFT, padx=(0, 10))
+        student_entry.bind("<Return>", lambda e: self.apply_filters())
+        
+        tk.Label(filter_frame, text="상태:").pack(side=tk.LEFT)
+        self.status_var = tk.StringVar(value="전체")
+        ttk.Combobox(
+            filter_frame,
+            textvariable=self.status_var,
+            values=list(self.STATUSES),
+            state="readonly",
+            width=8
+        ).pack(side=tk.LEFT, padx=(0, 10))
+        
+        tk.Label(filter_frame, text="기간:").pack(side=tk.LEFT)
+        self.period_var = tk.StringVar(value="전체")
+        ttk.Combobox(
+            filter_frame,
+            textvariable=self.period_var,
+            values=list(self.PERIODS),
+            state="readonly",
+            width=10
+        ).pack(side=tk.LEFT, padx=(0, 10))
+        
+        tk.Button(filter_frame, text="조회", command=self.apply_filters).pack(side=tk.LEFT)
+        
+        # 로그 목록
+        tree_frame = tk.Frame(self)
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        scrollbar = tk.Scrollbar(tree_frame)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
-        # 텍스트 위젯
-        text_frame = tk.Frame(log_window)
-        text_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        columns = ("timestamp", "name", "student_id", "status")
+        self.tree = ttk.Treeview(tree_frame, columns=columns, show="headings")
+        for column, heading, width in zip(columns, ("시간", "이름", "학번", "상태"), (180, 180, 120, 80)):
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=width)
+        self.tree.pack(fill=tk.BOTH, expand=True)
         
-        scrollbar = tk.Scrollbar(text_frame)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # 스크롤이 끝에 가까워지면 다음 페이지 로드
+        def on_scroll(first, last):
+            scrollbar.set(first, last)
+            if float(last) > 0.95:
+                self.load_next_page()
         
-        text_widget = tk.Text(
-            text_frame,
-            font=("Courier", 10),
-            yscrollcommand=scrollbar.set
-        )
-        text_widget.pack(fill=tk.BOTH, expand=True)
-        scrollbar.config(command=text_widget.yview)
-        
-        # 로그 삽입
-        text_widget.insert(tk.END, "=== 최근 100개 인식 로그 ===\n\n")
-        text_widget.insert(tk.END, "시간 | 이름 | 학번 | 상태\n")
-        text_widget.insert(tk.END, "-" * 60 + "\n")
-        for log in logs:
-            log_id, name, student_id, is_registered, timestamp = log
-            status = "[등록됨]" if is_registered else "[미등록]"
-            student_id_str = student_id if student_id else "N/A"
-            text_widget.insert(tk.END, f"{timestamp} | {name} | {student_id_str} | {status}\n")
-        
-        text_widget.config(state=tk.DISABLED)
+        self.tree.config(yscrollcommand=on_scroll)
+        scrollbar.config(command=self.tree.yview)
+        
+        self.status_label = tk.Label(self, text="", font=("Arial", 10))
+        self.status_label.pack(pady=(0, 10))
+    
+    def apply_filters(self):
+        """필터를 적용하고 첫 페이지부터 다시 로드"""
+        student_id = self.student_id_var.get().strip()
+        period = self.PERIODS[self.period_var.get()]
+        
+        self.filters = {
+            "student_id": student_id or None,
+            "is_registered": self.STATUSES[self.status_var.get()],
+            "since": time.time() - period if period else None,
+        }
+        self.next_cursor = None
+        self.tree.delete(*self.tree.get_children())
+        self.load_next_page(first_page=True)
+    
+    def load_next_page(self, first_page=False):
+        """다음 페이지 로드 (더 이상 없으면 아무것도 안 함)"""
+        if self.loading or (not first_page and self.next_cursor is None):
+            return
+        
+        self.loading = True
+        try:
+            logs, self.next_cursor = self.db.get_recognition_logs_page(
+                cursor=self.next_cursor,
+                limit=self.PAGE_SIZE,
+                **self.filters
+            )
+            for log_id, name, student_id, is_registered, timestamp in logs:
+                status = "[등록됨]" if is_registered else "[미등록]"
+                student_id_str = student_id if student_id else "N/A"
+                self.tree.insert("", tk.END, iid=str(log_id), values=(timestamp, name, student_id_str, status))
+        finally:
+            self.loading = False
+        
+        loaded = len(self.tree.get_children())
+        more = " (스크롤하면 더 불러옵니다)" if self.next_cursor else ""
+        self.status_label.config(text=f"표시된 로그: {loaded}개{more}")
 
 
 class RecognitionScreen(tk.Frame):
     """얼굴 인식 실행 화면"""
+    # 로그 일괄 기록 (그룹 커밋) 설정
+    LOG_BATCH_SIZE = 64       # 이 개수가 모이면 즉시 기록
+    LOG_FLUSH_INTERVAL = 1.0  # 최대 대기 시간 (초)
+    GALLERY_POLL_INTERVAL = 1.0  # 등록/삭제 확인 주기 (초)
+    
     def __init__(self, parent, manager):
         super().__init__(parent, bg="#2c3e50")
         self.manager = manager
@@ -1092,15 +1567,6 @@ class RecognitionScreen(tk.Frame):
         self.log_queue = queue.Queue()
         self.logging_thread = None
         
-        # 감지기 초기화 (사용자 설정 우선)
-        self.detector = None
-        self.detector_type = "HOG"
-        self._initialize_detector()
-        
-        # 하위 호환성을 위한 별칭
-        self.yolo_detector = self.detector
-        self.use_yolo = (self.detector_type != "HOG")
-        
         # 한글 폰트 설정 (프로젝트 폴더 우선)
         font_paths = [
             "fonts/NanumGothic.ttf",  # 프로젝트 폴더
@@ -1129,73 +1595,6 @@ class RecognitionScreen(tk.Frame):
         
         self.setup_ui()
     
-    def _initialize_detector(self):
-        """사용자 설정에 따라 감지기 초기화"""
-        # 기본값 설정
-        if 'detector_type' not in self.manager.settings:
-            self.manager.settings['detector_type'] = 'auto'
-        
-        detector_choice = self.manager.settings['detector_type']
-        
-        print(f"[INFO] 감지기 설정: {detector_choice}")
-        
-        # 사용자가 특정 감지기를 선택한 경우
-        if detector_choice == 'retinaface':
-            if self._try_init_retinaface():
-                return
-            else:
-                print("[WARN] RetinaFace를 사용할 수 없습니다. 다른 감지기로 전환합니다.")
-        
-        elif detector_choice == 'yolo':
-            if self._try_init_yolo():
-                return
-            else:
-                print("[WARN] YOLO-Face를 사용할 수 없습니다. 다른 감지기로 전환합니다.")
-        
-        elif detector_choice == 'hog':
-            self.detector_type = "HOG"
-            print("[INFO] ℹ️  HOG 감지기 사용 (사용자 선택)")
-            return
-        
-        # 'auto' 모드 또는 선택한 감지기 사용 불가 시 자동 선택
-        print("[INFO] 자동 감지기 선택 중...")
-        
-        # RetinaFace 시도
-        if self._try_init_retinaface():
-            return
-        
-        # YOLO-Face 시도
-        if self._try_init_yolo():
-            return
-        
-        # HOG 사용 (기본)
-        self.detector_type = "HOG"
-        print("[INFO] ℹ️  HOG 감지기 사용 (기본)")
-    
-    def _try_init_retinaface(self):
-        """RetinaFace 초기화 시도"""
-        try:
-            from retinaface_detector import RetinaFaceDetector
-            self.detector = RetinaFaceDetector(conf_threshold=0.5)
-            self.detector_type = "RetinaFace"
-            print("[INFO] ✅ RetinaFace 감지기 사용")
-            return True
-        except Exception as e:
-            print(f"[WARN] RetinaFace 초기화 실패: {e}")
-            return False
-    
-    def _try_init_yolo(self):
-        """YOLO-Face 초기화 시도"""
-        try:
-            from yolo_face_detector import YOLOFaceDetector
-            self.detector = YOLOFaceDetector(conf_threshold=0.3)
-            self.detector_type = "YOLO-Face"
-            print("[INFO] ✅ YOLO-Face 감지기 사용")
-            return True
-        except Exception as e:
-            print(f"[WARN] YOLO-Face 초기화 실패: {e}")
-            return False
-    
     def setup_ui(self):
         # 헤더
         header = tk.Frame(self, bg="#34495e", height=80)
@@ -1287,16 +1686,9 @@ class RecognitionScreen(tk.Frame):
         self.status_label.pack(pady=10)
         
         # 감지기 정보 표시
-        detector_emoji = {
-            "RetinaFace": "🏆",
-            "YOLO-Face": "⚡",
-            "HOG": "🔧"
-        }
-        emoji = detector_emoji.get(self.detector_type, "🔍")
-        
         self.detector_info = tk.Label(
             self,
-            text=f"감지 엔진: {emoji} {self.detector_type}",
+            text=f"감지 엔진: {self.manager.detectors.describe(self.manager.settings['detector_type'])}",
             font=("Arial", 11, "bold"),
             bg="#2c3e50",
             fg="#3498db"
@@ -1306,23 +1698,16 @@ class RecognitionScreen(tk.Frame):
     def on_show(self):
         """화면이 표시될 때"""
         if not self.is_running:
-            # 🔔 설정이 변경되었을 수 있으므로 감지기 재로드
-            self._initialize_detector()
-            
-            detector_emoji = {
-                "RetinaFace": "🏆",
-                "YOLO-Face": "⚡",
-                "HOG": "🔧"
-            }
-            emoji = detector_emoji.get(self.detector_type, "🔍")
+            # 🔔 설정이 변경되었을 수 있으므로 선택한 감지기를 미리 로드 (이미 로드된 모델은 재사용)
+            detector_type = self.manager.settings['detector_type']
+            self.manager.detectors.preload(detector_type)
             self.status_label.config(text=f"대기 중 - '시작' 버튼을 누르세요")
-            self.detector_info.config(text=f"감지 엔진: {emoji} {self.detector_type}")
+            self.detector_info.config(text=f"감지 엔진: {self.manager.detectors.describe(detector_type)}")
     
     def start_recognition(self):
         """얼굴 인식 시작"""
         # 등록된 얼굴 확인
-        known_faces = self.manager.db.get_all_faces()
-        if len(known_faces["names"]) == 0:
+        if self.manager.db.get_registered_count() == 0:
             if not messagebox.askyesno("경고", "등록된 얼굴이 없습니다.\n\n그래도 카메라를 시작하시겠습니까?"):
                 return
         
@@ -1359,13 +1744,10 @@ class RecognitionScreen(tk.Frame):
         self.start_button.config(state=tk.DISABLED)
         self.stop_button.config(state=tk.NORMAL)
         
-        detector_emoji = {
-            "RetinaFace": "🏆",
-            "YOLO-Face": "⚡",
-            "HOG": "🔧"
-        }
-        emoji = detector_emoji.get(self.detector_type, "🔍")
-        self.status_label.config(text=f"실행 중... ({emoji} {self.detector_type})", fg="#27ae60")
+        detector_text = self.manager.detectors.describe(self.manager.settings['detector_type'])
+        scope = RosterScope.from_settings(self.manager.settings)
+        scope_text = f" | 범위: {scope.describe()}" if scope else ""
+        self.status_label.config(text=f"실행 중... ({detector_text}){scope_text}", fg="#27ae60")
         
         # 🔔 비동기 로깅 스레드 시작
         self.logging_thread = threading.Thread(target=self._process_log_queue, daemon=True)
@@ -1384,9 +1766,17 @@ class RecognitionScreen(tk.Frame):
         """얼굴 인식 정지"""
         self.is_running = False
         
+        # 🔔 인식 스레드가 마지막 프레임을 끝낼 때까지 대기 (로그 큐에 더 넣지 않도록)
+        if self.recognition_thread and self.recognition_thread.is_alive():
+            self.recognition_thread.join(timeout=2.0)
+        
         if self.video_capture:
             self.video_capture.release()
         
+        # 🔔 로깅 스레드가 남은 로그를 모두 기록하고 종료할 때까지 대기
+        if self.logging_thread and self.logging_thread.is_alive():
+            self.logging_thread.join(timeout=5.0)
+        
         # 🔔 큐 비우기
         while not self.frame_queue.empty():
             try:
@@ -1394,12 +1784,6 @@ class RecognitionScreen(tk.Frame):
             except queue.Empty:
                 break
         
-        while not self.log_queue.empty():
-            try:
-                self.log_queue.get_nowait()
-            except queue.Empty:
-                break
-        
         self.start_button.config(state=tk.NORMAL)
         self.stop_button.config(state=tk.DISABLED)
         self.status_label.config(text="정지됨", fg="#e74c3c")
@@ -1426,16 +1810,48 @@ class RecognitionScreen(tk.Frame):
         display_face_locations = []
         display_face_names = []
         
-        # 로깅 쿨다운 관리
+        # 로깅 쿨다운 관리 (미등록 얼굴용)
         last_logged_names = {}
         log_cooldown = 5.0  # 5초마다 로그
         
-        # 등록된 얼굴 로드 (NumPy 배열로 미리 변환)
-        known_faces = self.manager.db.get_all_faces()
-        known_encodings_array = np.array(known_faces["encodings"]) if len(known_faces["encodings"]) > 0 else None
+        # 🔔 등록된 사람은 재실 구간 단위로 기록 (도착 시 1회 로그 + 떠난 뒤 구간 1행)
+        presence = PresenceTracker(absence_gap=self.manager.settings.get('presence_gap', 10.0))
+        
+        # 🔔 공유 감지기 (아직 로드 중이면 이 스레드에서 완료될 때까지 대기)
+        detector = self.manager.detectors.get(self.manager.settings['detector_type'])
+        print(f"[INFO] 감지기: {detector.info()}")
+        
+        # 🔔 임베딩 엔진 (갤러리보다 먼저: 로드 실패로 dlib으로 바뀌면 갤러리도 dlib 모델로 로드)
+        embedder = self.manager.get_embedder()
+        print(f"[INFO] 인코딩: {embedder.info()}")
+        
+        # 등록된 얼굴 로드 (메모리 맵 스냅샷 → (N, dim) float32 행렬, 같은 임베딩 모델의 얼굴만)
+        # 🔔 실행 중 등록/삭제는 감시 스레드가 증분 반영하고 뷰를 통째로 교체
+        # 🔔 PQ 모드는 인코딩 버퍼를 디스크 메모리 맵에 두고 코드만 메모리에 유지
+        gallery = LiveGallery(self.manager.db, disk_backed=self.manager.settings['match_backend'] == 'pq')
+        threading.Thread(target=self._watch_gallery, args=(gallery,), daemon=True).start()
+        index_view = None
+        index = None
+        matcher = None
+        
+        # 🔔 인식 범위 (수업 명단): 범위의 부분 행렬만 비교
+        scope = RosterScope.from_settings(self.manager.settings)
+        match_threshold = self.manager.match_threshold(embedder)
+        use_calibrated = self.manager.settings['use_calibrated_thresholds']
+        
+        # 🔔 최근 인식된 얼굴을 먼저 비교 (확실하면 전체 검색 생략)
+        hot_set = None
+        if self.manager.settings['hot_set_size'] > 0:
+            hot_set = HotSetMatcher(self.manager.settings['hot_set_size'], match_threshold,
+                                    self.manager.settings['hot_set_margin'], use_calibrated)
+        
+        # 🔔 얼굴 추적 캐시: 가만히 있는 얼굴은 마지막 인식 결과를 재사용하고 인코딩 생략
+        tracks = TrackCache(self.manager.settings['track_refresh_interval'],
+                            reencode_iou=self.manager.settings['track_reencode_iou'])
+        certain_margin = self.manager.settings['track_certain_margin']
         
         print("[INFO] 비디오 처리 시작...")
-        print(f"[INFO] 등록된 얼굴: {len(known_faces['names'])}명")
+        print(f"[INFO] 등록된 얼굴: {gallery.view.size}명")
         print(f"[INFO] 성능 설정 - 프레임스킵: {process_every_n_frames}, 업샘플: {self.manager.settings['upsample_times']}, 스케일: {self.manager.settings['frame_scale']}")
         
         fps_start_time = time.time()
@@ -1464,24 +1880,42 @@ class RecognitionScreen(tk.Frame):
                 small_frame = cv2.resize(frame, (0, 0), fx=frame_scale, fy=frame_scale, interpolation=cv2.INTER_NEAREST)
                 rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
                 
+                # 🔔 이번 프레임에 사용할 갤러리 뷰 (처리 도중 교체되어도 일관성 유지)
+                # 뷰가 바뀌었을 때만 인덱스를 다시 만듦 (노름 캐시는 뷰에 있음)
+                view = gallery.view
+                if index_view is not view:
+                    # 범위만 검색하면 전체 갤러리 인덱스는 만들지 않음
+                    if not scope or self.manager.settings['scope_fallback']:
+                        index = self._build_index(view, index)
+                    matcher = index
+                    if scope:
+                        matcher = ScopedIndex(view, scope, index, match_threshold)
+                        print(f"[INFO] 인식 범위: {scope.describe()} ({len(matcher)}명)")
+                    # 🔔 템플릿이 여러 장인 사람은 중심 검색 상위 후보만 개별 템플릿과 비교
+                    if view.templates:
+                        matcher = TemplateMatcher(matcher, view, self.manager.settings['template_top_k'])
+                    if hot_set is not None:
+                        hot_set.rebind(view, matcher)
+                        matcher = hot_set
+                    # 등록/삭제가 반영되면 캐시된 인식 결과도 다시 확인
+                    if index_view is not None:
+                        tracks.invalidate()
+                    index_view = view
+                
                 # 얼굴 위치 및 인코딩
                 try:
-                    # RetinaFace, YOLO-Face 또는 HOG 사용
-                    if self.detector and self.detector_type != "HOG":
-                        # 🔔 RetinaFace/YOLO는 upsample_times 불필요
-                        face_locations = self.detector.detect_faces(rgb_small_frame)
-                    else:
-                        face_locations = face_recognition.face_locations(
-                            rgb_small_frame,
-                            model="hog",
-                            number_of_times_to_upsample=self.manager.settings['upsample_times']
-                        )
+                    # RetinaFace, YOLO-Face 또는 HOG 사용 (공유 감지기)
+                    # 🔔 박스/신뢰도/5점 랜드마크 배열 (Detections)을 그대로 인코더에 전달
+                    face_locations = detector.detect(rgb_small_frame)
                     
-                    # 얼굴이 없으면 인코딩 스킵 (성능 향상)
-                    if len(face_locations) == 0:
-                        face_encodings = []
+                    # 🔔 새 얼굴/움직인 얼굴/갱신 주기가 지난 얼굴/불확실한 얼굴만 인코딩
+                    # (ArcFace는 이 얼굴들을 배치 추론 한 번으로 인코딩)
+                    current_time = time.time()
+                    track_ids, stale = tracks.update(face_locations, current_time)
+                    if stale:
+                        face_encodings = embedder.embed(rgb_small_frame, face_locations.select(stale))
                     else:
-                        face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
+                        face_encodings = []
                     
                 except Exception as e:
                     print(f"[ERROR] 얼굴 인식 오류: {e}")
@@ -1490,44 +1924,44 @@ class RecognitionScreen(tk.Frame):
                 face_names = []
                 face_student_ids = []
                 
-                for face_encoding in face_encodings:
-                    name = "Unknown"
-                    student_id = None
-                    confidence = 0.0
+                if stale:
+                    # 🔔 인코딩한 얼굴 전체를 행렬 곱 한 번으로 매칭
+                    best_indices, best_distances, _ = matcher.search(face_encodings)
                     
-                    if known_encodings_array is not None:
-                        try:
-                            # NumPy로 빠른 거리 계산
-                            face_distances = np.linalg.norm(known_encodings_array - face_encoding, axis=1)
-                            best_match_index = face_distances.argmin()
-                            best_distance = face_distances[best_match_index]
-                            
-                            # 신뢰도 계산
-                            confidence = max(0, 1 - best_distance)
-                            
-                            # 매칭 확인 (단일 비교로 최적화)
-                            tolerance = self.manager.settings['tolerance']
-                            distance_threshold = self.manager.settings['distance_threshold']
-                            
-                            if best_distance <= min(tolerance, distance_threshold):
-                                name = known_faces["names"][best_match_index]
-                                student_id = known_faces["student_ids"][best_match_index]
-                                
-                                # 🔔 비동기 로깅 큐에 넣기
-                                current_time = time.time()
-                                if student_id not in last_logged_names or \
-                                   (current_time - last_logged_names[student_id]) > log_cooldown:
-                                    self.log_queue.put((name, student_id, True))
-                                    last_logged_names[student_id] = current_time
-                        except Exception as e:
-                            pass  # 에러 무시하고 계속
+                    # 🔔 최근접 행별 임계값을 한 번에 적용 (개인별 보정값이 없으면 전역 설정)
+                    if use_calibrated:
+                        limits = match_thresholds(view, best_indices, match_threshold)
+                    else:
+                        limits = np.full(len(best_distances), match_threshold, dtype=np.float32)
+                    accepted = best_distances <= limits
+                    certain = best_distances <= limits - certain_margin
+                    
+                    for i, best_match_index, best_distance, is_match, is_certain in zip(
+                            stale, best_indices, best_distances, accepted, certain):
+                        if is_match:
+                            tracks.store(track_ids[i], view.names[best_match_index],
+                                         view.student_ids[best_match_index], float(best_distance),
+                                         bool(is_certain), current_time)
+                        else:
+                            tracks.store(track_ids[i], "Unknown", None, float(best_distance), False, current_time)
+                
+                for track_id in track_ids:
+                    name, student_id, best_distance = tracks.decision(track_id)
+                    
+                    # 신뢰도 계산 (임베딩 모델마다 거리 척도가 다름)
+                    confidence = embedder.confidence(best_distance)
+                    
+                    if student_id is not None:
+                        # 🔔 재실 구간 갱신 (새로 도착했을 때만 비동기 로깅 큐에 넣기)
+                        if presence.observe(student_id, name, best_distance, current_time):
+                            self.log_queue.put(("log", (name, student_id, True, current_time)))
                     
                     # Unknown 로그 (빈도 낮춤)
                     if name == "Unknown":
                         if "Unknown" not in last_logged_names or \
                            (time.time() - last_logged_names["Unknown"]) > log_cooldown * 2:  # Unknown은 더 낮은 빈도
                             # 🔔 비동기 로깅 큐에 넣기
-                            self.log_queue.put(("Unknown", None, False))
+                            self.log_queue.put(("log", ("Unknown", None, False, time.time())))
                             last_logged_names["Unknown"] = time.time()
                     
                     # 신뢰도 표시 (문자열 포맷 최적화)
@@ -1539,10 +1973,13 @@ class RecognitionScreen(tk.Frame):
                     face_names.append(name_with_confidence)
                     face_student_ids.append(student_id)
                 
+                # 🔔 한동안 보이지 않은 사람의 재실 구간 닫기
+                for interval in presence.expire(time.time()):
+                    self.log_queue.put(("presence", interval.as_tuple()))
+                
                 # 화면 표시용 위치 업데이트 (스케일 적용)
                 scale_factor = int(1 / frame_scale)
-                display_face_locations = [(t*scale_factor, r*scale_factor, b*scale_factor, l*scale_factor)
-                                         for (t, r, b, l) in face_locations]
+                display_face_locations = face_locations.scaled(scale_factor).to_legacy()
                 display_face_names = face_names
             
             # 🔔 매 프레임 화면 표시 (PIL로 한글 지원)
@@ -1585,6 +2022,10 @@ class RecognitionScreen(tk.Frame):
             
             # FPS 정보
             info_text = f"FPS: {int(current_fps)} | 얼굴: {len(display_face_names)}"
+            if hot_set is not None:
+                info_text += f" | 캐시 적중: {hot_set.hit_rate:.0%}"
+            if tracks.reused:
+                info_text += f" | 추적 재사용: {tracks.reuse_rate:.0%}"
             draw.text((10, 10), info_text, font=self.font_small, fill=(0, 255, 0))
             
             # 🔔 리사이즈 및 PhotoImage 변환
@@ -1604,8 +2045,49 @@ class RecognitionScreen(tk.Frame):
                 except queue.Full:
                     pass  # 큐가 꽉 찼으면 그냥 넘어감
         
+        # 🔔 아직 열려 있는 재실 구간 기록
+        for interval in presence.close_all():
+            self.log_queue.put(("presence", interval.as_tuple()))
+        
+        if hot_set is not None:
+            print(f"[INFO] 최근 인식 캐시: {hot_set.stats()}")
+        print(f"[INFO] 얼굴 추적 캐시: {tracks.stats()}")
         print("[INFO] 비디오 처리 종료")
     
+    def _build_index(self, view, previous):
+        """
+        🔔 갤러리 뷰에 맞는 검색 인덱스 생성
+        
+        IVF 근사 검색은 설정에서 켜져 있고 갤러리가 충분히 클 때만 사용
+        (이전 IVF/PQ 인덱스가 있으면 군집 중심/코드북을 재사용해 새 행만 배정)
+        """
+        settings = self.manager.settings
+        db_name = self.manager.db.db_name
+        tag = self.manager.db.gallery_tag  # 임베딩 모델마다 인덱스 파일을 따로 사용
+        try:
+            if settings['match_backend'] == 'ivf' and view.size >= settings['ann_min_gallery']:
+                if isinstance(previous, ann_index.IVFIndex):
+                    return previous.update(view)
+                return ann_index.load_or_train(ann_index.ivf_path(db_name, tag), view, nprobe=settings['ann_nprobe'])
+            
+            if settings['match_backend'] == 'pq' and view.size >= pq_index.CODEBOOK_SIZE:
+                if isinstance(previous, pq_index.PQIndex):
+                    return previous.update(view)
+                return pq_index.load_or_train(pq_index.pq_path(db_name, tag), view, rerank=settings['pq_rerank'])
+        except Exception as e:
+            print(f"[WARN] {settings['match_backend'].upper()} 인덱스 사용 불가, 전수 비교로 대체: {e}")
+        return FaceIndex.from_view(view)
+    
+    def _watch_gallery(self, gallery):
+        """🔔 갤러리 감시 스레드 (DB 변경을 주기적으로 확인해 증분 반영)"""
+        while self.is_running:
+            time.sleep(self.GALLERY_POLL_INTERVAL)
+            try:
+                if gallery.poll():
+                    print(f"[INFO] 갤러리 갱신: {gallery.view.size}명 (세대 {gallery.view.generation})")
+            except Exception as e:
+                print(f"[ERROR] 갤러리 갱신 실패: {e}")
+    
     def update_gui(self):
         """🔔 메인 스레드에서 큐를 확인하고 GUI를 안전하게 업데이트"""
         if not self.is_running:
@@ -1626,21 +2108,45 @@ class RecognitionScreen(tk.Frame):
         self.master.after(16, self.update_gui)
     
     def _process_log_queue(self):
-        """🔔 비동기 로깅 처리 스레드"""
-        while self.is_running:
+        """🔔 비동기 로깅 처리 스레드 (개수/시간 기준 그룹 커밋)"""
+        batch = []
+        last_flush = time.time()
+        
+        while True:
+            # 다음 플러시 시각까지만 대기
+            timeout = max(0.0, self.LOG_FLUSH_INTERVAL - (time.time() - last_flush))
             try:
-                # 큐에서 로그 데이터 가져오기 (최대 1초 대기)
-                log_data = self.log_queue.get(timeout=1.0)
-                name, student_id, is_registered = log_data
-                
-                # DB에 기록 (시간이 걸려도 비디오 처리에 영향 없음)
-                try:
-                    self.manager.db.log_recognition(name, student_id, is_registered)
-                except Exception as e:
-                    print(f"[ERROR] 로그 기록 실패: {e}")
-            
+                batch.append(self.log_queue.get(timeout=timeout))
+                # 이미 쌓여 있는 로그는 기다리지 않고 한 번에 가져오기
+                while len(batch) < self.LOG_BATCH_SIZE:
+                    batch.append(self.log_queue.get_nowait())
             except queue.Empty:
-                continue  # 타임아웃 시 계속
+                pass
+            
+            # 인식 스레드가 끝난 뒤(마지막 재실 구간까지 넣은 뒤) 큐가 비면 종료
+            recognition_done = not (self.recognition_thread and self.recognition_thread.is_alive())
+            stopping = not self.is_running and recognition_done and self.log_queue.empty()
+            
+            if batch and (len(batch) >= self.LOG_BATCH_SIZE or
+                          time.time() - last_flush >= self.LOG_FLUSH_INTERVAL or
+                          stopping):
+                self._flush_log_batch(batch)
+                batch = []
+                last_flush = time.time()
+            elif not batch:
+                last_flush = time.time()  # 대기 시간은 첫 로그가 들어온 뒤부터 계산
+            
+            if stopping:
+                break
         
         print("[INFO] 로깅 스레드 종료")
-
+    
+    def _flush_log_batch(self, batch):
+        """로그 묶음을 DB에 기록 (인식 로그, 재실 구간 각각 한 트랜잭션)"""
+        logs = [entry for kind, entry in batch if kind == "log"]
+        intervals = [entry for kind, entry in batch if kind == "presence"]
+        try:
+            self.manager.db.log_recognitions(logs)
+            self.manager.db.save_presence_intervals(intervals)
+        except Exception as e:
+            print(f"[ERROR] 로그 기록 실패 ({len(batch)}건): {e}")
@@ -0,0 +1,135 @@
+"""
+최근 인식된 얼굴 캐시(hot set) 모듈
+카메라 앞에는 같은 몇십 명이 몇 분씩 머무르므로, 최근 매칭된 얼굴(LRU)과 먼저 비교하고
+충분히 확실하게 맞으면 전체 갤러리 검색을 건너뜀
+"""
+from collections import OrderedDict
+import numpy as np
+from face_index import FaceIndex, match_thresholds
+
+
+class HotSetMatcher:
+    """
+    LRU 캐시 우선 검색 (FaceIndex와 같은 search() 인터페이스)
+
+    캐시 최단 거리가 그 행의 임계값 - safe_margin 이하면 캐시 결과를 그대로 사용하고,
+    아니면 내부 인덱스(전체/범위/IVF/PQ)로 검색한 뒤 매칭된 행을 캐시에 넣음
+    (행의 임계값은 인식 화면과 같은 기준: 개인별 보정값, 없으면 전역 threshold)
+    """
+
+    def __init__(self, capacity=64, threshold=0.45, safe_margin=0.1, use_calibrated=True):
+        """
+        Args:
+            capacity: 캐시할 얼굴 수
+            threshold: 매칭 거리 임계값 (보정값이 없는 행)
+            safe_margin: 캐시만으로 확정하려면 임계값보다 이만큼 더 가까워야 함
+            use_calibrated: 개인별 보정 임계값(view.thresholds) 사용
+        """
+        self.capacity = capacity
+        self.threshold = threshold
+        self.safe_margin = safe_margin
+        self.use_calibrated = use_calibrated
+        self.view = None
+        self.inner = None
+        self._rows = OrderedDict()  # 뷰 행 번호 → None (삽입/사용 순서 = LRU 순서)
+        self._hot_rows = None
+        self._hot_index = None
+
+        # 적중률 통계
+        self.hits = 0
+        self.misses = 0
+        self.rows_skipped = 0  # 캐시 적중으로 비교를 건너뛴 갤러리 행 수
+
+    def rebind(self, view, inner):
+        """
+        새 갤러리 뷰/내부 인덱스로 교체
+
+        뒤에 행이 추가되기만 한 뷰면 캐시를 유지하고 (삭제된 행만 제거),
+        행 순서가 바뀐 뷰(압축/전체 재로드)면 캐시를 비움
+        """
+        if self.view is not None and view.ids is self.view.ids and view.count >= self.view.count:
+            for row in [row for row in self._rows if not view.alive[row]]:
+                del self._rows[row]
+        else:
+            self._rows.clear()
+        self.view = view
+        self.inner = inner
+        self._hot_index = None
+
+    def _touch(self, row):
+        """행을 가장 최근 사용으로 표시 (가득 차면 가장 오래된 행 제거)"""
+        if row in self._rows:
+            self._rows.move_to_end(row)
+            return
+        self._rows[row] = None
+        if len(self._rows) > self.capacity:
+            self._rows.popitem(last=False)
+        self._hot_index = None
+
+    def _get_hot_index(self):
+        """캐시 행들의 작은 부분 행렬 인덱스 (구성이 바뀔 때만 다시 만듦)"""
+        if self._hot_index is None:
+            self._hot_rows = np.fromiter(self._rows, dtype=np.intp, count=len(self._rows))
+            self._hot_index = FaceIndex(self.view.encodings[self._hot_rows], self.view.sq_norms[self._hot_rows])
+        return self._hot_index
+
+    def _limits(self, rows):
+        """뷰 행별 매칭 임계값"""
+        if self.use_calibrated:
+            return match_thresholds(self.view, rows, self.threshold)
+        return np.full(len(rows), self.threshold, dtype=np.float32)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        """적중률 통계 문자열"""
+        return (f"캐시 적중 {self.hits}/{self.hits + self.misses} ({self.hit_rate:.0%}), "
+                f"건너뛴 비교 {self.rows_skipped:,}행")
+
+    def search(self, queries):
+        """
+        캐시에서 먼저 찾고, 확정되지 않은 쿼리만 내부 인덱스로 검색
+
+        Returns:
+            FaceIndex.search()와 같음 (행 번호는 뷰 기준)
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if len(queries) == 0:
+            return self.inner.search(queries)
+
+        count = len(queries)
+        best_indices = np.zeros(count, dtype=np.intp)
+        best_distances = np.full(count, np.inf, dtype=np.float32)
+        margins = np.full(count, np.inf, dtype=np.float32)
+        miss = np.ones(count, dtype=bool)
+
+        if self._rows:
+            indices, distances, hot_margins = self._get_hot_index().search(queries)
+            rows = self._hot_rows[indices]
+            hit = distances <= self._limits(rows) - self.safe_margin
+            hit_rows = rows[hit]
+            best_indices[hit] = hit_rows
+            best_distances[hit] = distances[hit]
+            margins[hit] = hot_margins[hit]
+            miss = ~hit
+            for row in hit_rows:
+                self._touch(int(row))
+
+        hits = count - int(miss.sum())
+        self.hits += hits
+        self.misses += count - hits
+        self.rows_skipped += hits * len(self.inner)
+
+        if miss.any():
+            misses = np.flatnonzero(miss)
+            indices, distances, inner_margins = self.inner.search(queries[misses])
+            best_indices[misses] = indices
+            best_distances[misses] = distances
+            margins[misses] = inner_margins
+            for row in indices[distances <= self._limits(indices)]:
+                self._touch(int(row))
+
+        return best_indices, best_distances, margins
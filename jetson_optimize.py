@@ -304,6 +304,8 @@ def print_recommendations():
    - 고속 모드 사용 (upsample=0, scale=0.25)
    - 프레임 처리 간격 늘리기 (3-5 프레임)
    - 동시 인식 인원 제한 (3-5명)
+   - 환경 설정 → 대규모 갤러리 검색 → "PQ 압축 갤러리" 선택
+     (얼굴당 16바이트 코드만 메모리에 유지, 미리 학습: python3 pq_index.py)
 
 6️⃣  GUI 문제 해결:
    export DISPLAY=:0
@@ -0,0 +1,223 @@
+"""
+라이브 갤러리 모듈
+인식이 실행되는 동안 DB의 등록/삭제를 변경 기록(change feed)으로 받아
+메모리 갤러리에 점진적으로 반영하고, 인식 스레드에는 불변 뷰를 원자적으로 교체해 제공
+"""
+import os
+import tempfile
+import numpy as np
+from face_index import squared_norms
+
+
+def _threshold_array(thresholds):
+    """임계값 목록 (None 포함) → float32 배열 (None은 NaN)"""
+    return np.array([np.nan if t is None else t for t in thresholds], dtype=np.float32)
+
+
+class GalleryView:
+    """
+    갤러리의 불변 뷰 (인식 스레드는 프레임마다 이 객체 하나만 참조)
+
+    encodings/sq_norms/thresholds/alive는 공유 버퍼의 앞 count행만 가리키므로,
+    이후 추가되는 행(버퍼 뒤쪽)에 쓰더라도 이 뷰는 영향을 받지 않음
+    """
+    __slots__ = ("generation", "count", "dead_count", "encodings", "sq_norms", "thresholds", "alive",
+                 "templates", "ids", "names", "student_ids", "departments", "grades")
+
+    def __init__(self, generation, count, dead_count, encodings, sq_norms, thresholds, alive,
+                 templates, ids, names, student_ids, departments, grades):
+        self.generation = generation
+        self.count = count
+        self.dead_count = dead_count
+        self.encodings = encodings
+        self.sq_norms = sq_norms
+        self.thresholds = thresholds  # 개인별 보정 임계값 (보정 안 된 행은 NaN)
+        self.alive = alive
+        self.templates = templates  # 템플릿이 2개 이상인 얼굴의 {id: (k, dim) 행렬} (encodings는 평균)
+        self.ids = ids
+        self.names = names
+        self.student_ids = student_ids
+        self.departments = departments
+        self.grades = grades
+
+    @property
+    def size(self):
+        """삭제되지 않은 얼굴 수"""
+        return self.count - self.dead_count
+
+
+class LiveGallery:
+    """
+    증분 갱신되는 메모리 갤러리
+
+    - 추가: 여유 용량이 있으면 버퍼 뒤에 바로 쓰고, 부족하면 2배로 늘려 복사 (분할 상환 O(1))
+    - 삭제: 행을 지우지 않고 alive 마스크만 끔 (tombstone), 삭제 비율이 높아지면 압축
+    - 템플릿 사전은 바뀔 때만 복사해 교체 (기존 뷰는 이전 사전을 계속 사용)
+    - 갱신은 watcher 스레드 하나에서만 호출하고, 읽는 쪽은 view 속성만 사용
+    - disk_backed=True면 인코딩 버퍼를 DB 폴더의 임시 파일에 메모리 맵으로 두어
+      커널이 필요할 때만 페이지를 올리고 회수할 수 있게 함 (저메모리 장치용)
+    """
+    MIN_CAPACITY = 64
+    COMPACT_RATIO = 0.25  # 삭제 행이 이 비율을 넘으면 압축
+
+    def __init__(self, db, disk_backed=False):
+        self.db = db
+        self.disk_backed = disk_backed
+        self.view = None
+        self._row_by_id = {}
+        self.load()
+
+    def _allocate(self, capacity, dim):
+        """인코딩 버퍼 할당 (disk_backed면 임시 파일 메모리 맵)"""
+        if not self.disk_backed:
+            return np.empty((capacity, dim), dtype=np.float32)
+        # 이름 없는 임시 파일: 맵이 닫히면 자동 삭제
+        with tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(self.db.db_name))) as f:
+            return np.memmap(f, dtype=np.float32, mode="w+", shape=(capacity, dim))
+
+    def load(self):
+        """DB(스냅샷)에서 전체 갤러리 다시 로드"""
+        gallery = self.db.load_gallery()
+        encodings = np.asarray(gallery["encodings"])
+        count, dim = encodings.shape
+
+        capacity = max(self.MIN_CAPACITY, count * 2)
+        buffer = self._allocate(capacity, dim)
+        buffer[:count] = encodings
+        sq_norms = np.empty(capacity, dtype=np.float32)
+        sq_norms[:count] = squared_norms(buffer[:count])
+        thresholds = np.empty(capacity, dtype=np.float32)
+        thresholds[:count] = _threshold_array(gallery["thresholds"])
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:count] = True
+
+        self._buffer = buffer
+        self._sq_norms = sq_norms
+        self._thresholds = thresholds
+        self._alive = alive
+        self._templates = dict(gallery["templates"])
+        self._ids = list(gallery["ids"])
+        self._names = list(gallery["names"])
+        self._student_ids = list(gallery["student_ids"])
+        self._departments = list(gallery["departments"])
+        self._grades = list(gallery["grades"])
+        self._row_by_id = {face_id: row for row, face_id in enumerate(self._ids)}
+        self._publish(gallery["generation"], count, 0)
+
+    def poll(self):
+        """
+        DB 변경 확인 후 반영
+
+        Returns:
+            갤러리가 바뀌었으면 True
+        """
+        generation = self.db.gallery_generation()
+        if generation == self.view.generation:
+            return False
+
+        changes = self.db.get_gallery_changes(self.view.generation)
+        if changes is None:
+            self.load()
+        else:
+            self.apply(changes)
+        return True
+
+    def apply(self, changes):
+        """get_gallery_changes() 결과 반영 (이미 반영된 변경은 무시)"""
+        count = self.view.count
+        dead_count = self.view.dead_count
+
+        # 삭제: alive 마스크를 복사한 뒤 끔 (기존 뷰는 이전 마스크를 계속 사용)
+        deleted_rows = [self._row_by_id.pop(face_id) for face_id in changes["deleted_ids"]
+                        if face_id in self._row_by_id]
+        if deleted_rows:
+            self._alive = self._alive.copy()
+            self._alive[deleted_rows] = False
+            dead_count += len(deleted_rows)
+
+        stale = [face_id for face_id in changes["deleted_ids"] if face_id in self._templates]
+        if stale or changes["added"]["templates"]:
+            self._templates = dict(self._templates)
+            for face_id in stale:
+                del self._templates[face_id]
+            self._templates.update(changes["added"]["templates"])
+
+        # 추가: 버퍼 뒤쪽 빈 공간에 쓰기
+        added = changes["added"]
+        new_rows = [i for i, face_id in enumerate(added["ids"]) if face_id not in self._row_by_id]
+        if new_rows:
+            self._reserve(count + len(new_rows))
+            end = count + len(new_rows)
+            self._buffer[count:end] = added["encodings"][new_rows]
+            self._sq_norms[count:end] = squared_norms(self._buffer[count:end])
+            self._thresholds[count:end] = _threshold_array(added["thresholds"])[new_rows]
+            self._alive[count:end] = True
+            for offset, i in enumerate(new_rows):
+                self._row_by_id[added["ids"][i]] = count + offset
+                self._ids.append(added["ids"][i])
+                self._names.append(added["names"][i])
+                self._student_ids.append(added["student_ids"][i])
+                self._departments.append(added["departments"][i])
+                self._grades.append(added["grades"][i])
+            count = end
+
+        if dead_count > self.MIN_CAPACITY and dead_count > count * self.COMPACT_RATIO:
+            self._compact(count)
+            count, dead_count = len(self._ids), 0
+
+        self._publish(changes["generation"], count, dead_count)
+
+    def _reserve(self, needed):
+        """용량이 부족하면 2배로 늘린 새 버퍼로 복사"""
+        capacity = len(self._buffer)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+
+        count = self.view.count
+        buffer = self._allocate(capacity, self._buffer.shape[1])
+        buffer[:count] = self._buffer[:count]
+        sq_norms = np.empty(capacity, dtype=np.float32)
+        sq_norms[:count] = self._sq_norms[:count]
+        thresholds = np.empty(capacity, dtype=np.float32)
+        thresholds[:count] = self._thresholds[:count]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:count] = self._alive[:count]
+        self._buffer = buffer
+        self._sq_norms = sq_norms
+        self._thresholds = thresholds
+        self._alive = alive
+
+    def _compact(self, count):
+        """삭제된 행을 제거한 새 버퍼/목록 생성"""
+        keep = np.flatnonzero(self._alive[:count])
+        capacity = max(self.MIN_CAPACITY, len(keep) * 2)
+
+        buffer = self._allocate(capacity, self._buffer.shape[1])
+        buffer[:len(keep)] = self._buffer[keep]
+        sq_norms = np.empty(capacity, dtype=np.float32)
+        sq_norms[:len(keep)] = self._sq_norms[keep]
+        thresholds = np.empty(capacity, dtype=np.float32)
+        thresholds[:len(keep)] = self._thresholds[keep]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(keep)] = True
+
+        self._buffer = buffer
+        self._sq_norms = sq_norms
+        self._thresholds = thresholds
+        self._alive = alive
+        self._ids = [self._ids[i] for i in keep]
+        self._names = [self._names[i] for i in keep]
+        self._student_ids = [self._student_ids[i] for i in keep]
+        self._departments = [self._departments[i] for i in keep]
+        self._grades = [self._grades[i] for i in keep]
+        self._row_by_id = {face_id: row for row, face_id in enumerate(self._ids)}
+
+    def _publish(self, generation, count, dead_count):
+        """새 뷰로 원자적 교체 (속성 대입 한 번)"""
+        self.view = GalleryView(
+            generation, count, dead_count,
+            self._buffer[:count], self._sq_norms[:count], self._thresholds[:count], self._alive[:count],
+            self._templates, self._ids, self._names, self._student_ids, self._departments, self._grades
+        )
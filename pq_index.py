@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+곱 양자화(PQ) 갤러리 인덱스 모듈
+메모리가 적은 엣지 장치(Jetson 4GB 등)에서 인코딩 전체 대신 얼굴당 수십 바이트 코드만 메모리에 유지
+
+    1. 128차원 인코딩을 M개 부분 공간으로 나누고, 부분 공간마다 256개 중심(코드북)을 k-means로 학습
+    2. 얼굴마다 부분 공간별 가장 가까운 중심 번호(uint8) M개만 저장 (M=16이면 16바이트, float32의 1/32)
+    3. 검색: 쿼리-코드북 거리표(M×256)를 만들고 코드로 표를 찾아 더해 근사 거리 계산 (ADC)
+    4. 근사 거리 상위 후보(shortlist)만 디스크의 원본 벡터를 읽어 정확한 거리로 재순위
+
+코드북과 코드는 DB 옆 <db>.pq.npz 파일에 세대 번호와 함께 저장
+
+사용법 (인식 시작 전에 미리 학습):
+    python pq_index.py --db face_recognition.db --subspaces 16
+"""
+import os
+import time
+import numpy as np
+from face_index import best_of, empty_topk, squared_norms, top_k
+from ann_index import assign_to_centroids, match_stored_ids, train_kmeans
+
+PQ_SUFFIX = ".pq.npz"
+DEFAULT_SUBSPACES = 16
+CODEBOOK_SIZE = 256  # uint8 코드
+DEFAULT_RERANK = 64  # 정확한 거리로 다시 비교할 후보 수
+ENCODE_CHUNK = 4096
+
+
+def pq_path(db_name, tag=None):
+    """
+    DB 파일 경로 → PQ 인덱스 파일 경로 (face_recognition.db → face_recognition.pq.npz)
+
+    tag를 주면 같은 DB의 다른 갤러리용 경로 (예: arcface → face_recognition.arcface.pq.npz)
+    """
+    base = os.path.splitext(db_name)[0]
+    if tag:
+        base += f".{tag}"
+    return base + PQ_SUFFIX
+
+
+def train_codebooks(encodings, subspaces=DEFAULT_SUBSPACES):
+    """
+    부분 공간별 코드북 학습
+
+    Returns:
+        (M, 256, dim/M) float32 코드북
+    """
+    encodings = np.asarray(encodings, dtype=np.float32)
+    dim = encodings.shape[1]
+    if dim % subspaces:
+        raise ValueError(f"인코딩 차원 {dim}은 부분 공간 수 {subspaces}로 나누어 떨어져야 합니다")
+    if len(encodings) < CODEBOOK_SIZE:
+        raise ValueError(f"PQ 학습에는 최소 {CODEBOOK_SIZE}명이 필요합니다 (현재 {len(encodings)}명)")
+
+    sub_dim = dim // subspaces
+    return np.stack([
+        train_kmeans(np.ascontiguousarray(encodings[:, m * sub_dim:(m + 1) * sub_dim]), CODEBOOK_SIZE, seed=m)
+        for m in range(subspaces)
+    ])
+
+
+def encode(encodings, codebooks):
+    """
+    인코딩 → PQ 코드
+
+    Returns:
+        (M, N) uint8 코드 (부분 공간별로 연속 저장해 검색 시 순차 접근)
+    """
+    subspaces, _, sub_dim = codebooks.shape
+    codes = np.empty((subspaces, len(encodings)), dtype=np.uint8)
+    for start in range(0, len(encodings), ENCODE_CHUNK):
+        chunk = np.asarray(encodings[start:start + ENCODE_CHUNK], dtype=np.float32)
+        for m in range(subspaces):
+            codes[m, start:start + len(chunk)] = assign_to_centroids(
+                chunk[:, m * sub_dim:(m + 1) * sub_dim], codebooks[m]
+            )
+    return codes
+
+
+def save_pq(path, codebooks, ids, codes, generation):
+    """PQ 인덱스 파일을 원자적으로 저장 (임시 파일 작성 후 os.replace)"""
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                codebooks=np.asarray(codebooks, dtype=np.float32),
+                ids=np.asarray(ids, dtype=np.int64),
+                codes=np.asarray(codes, dtype=np.uint8),
+                generation=np.int64(generation)
+            )
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_pq(path):
+    """PQ 인덱스 파일 읽기 (없거나 손상되었으면 None)"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            return {
+                "codebooks": data["codebooks"],
+                "ids": data["ids"],
+                "codes": data["codes"],
+                "generation": int(data["generation"])
+            }
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[WARN] PQ 인덱스 로드 실패: {e}")
+        return None
+
+
+class PQIndex:
+    """
+    PQ 근사 검색 + 정확 재순위 인덱스 (FaceIndex와 같은 search() 인터페이스)
+
+    메모리에는 코드 (M, N) uint8과 코드북만 두고,
+    재순위할 후보 행만 뷰의 인코딩 버퍼(디스크 메모리 맵)에서 읽음
+    """
+
+    def __init__(self, codebooks, codes, encodings, alive, ids, rerank=DEFAULT_RERANK, source_ids=None):
+        """
+        Args:
+            codebooks: (M, 256, dim/M) 코드북
+            codes: (M, N) uint8 코드
+            encodings: (N, dim) 원본 인코딩 (LiveGallery의 disk_backed 버퍼, 복사하지 않음)
+            alive: 삭제되지 않은 행 마스크 (None이면 모두 유효)
+            ids: 행별 얼굴 id 목록 (N개)
+            rerank: 정확한 거리로 다시 비교할 후보 수
+            source_ids: ids를 잘라 온 LiveGallery 공유 목록 (다음 뷰에서 코드 재사용 판단용)
+        """
+        self.codebooks = np.asarray(codebooks, dtype=np.float32)
+        self.codes = codes
+        self.encodings = encodings
+        self.alive = alive
+        self.ids = ids
+        self.source_ids = ids if source_ids is None else source_ids
+        self.count = codes.shape[1]
+        self.rerank = max(2, rerank)
+        self._codebook_norms = np.einsum("mkd,mkd->mk", self.codebooks, self.codebooks)
+
+    @classmethod
+    def from_view(cls, view, codebooks, rerank=DEFAULT_RERANK, previous=None, stored=None):
+        """
+        GalleryView로 인덱스 생성
+
+        Args:
+            previous: 이전 뷰의 PQIndex (같은 행 순서면 코드 재사용)
+            stored: load_pq() 결과 (id가 같은 행은 저장된 코드 재사용)
+        """
+        # view.ids는 watcher 스레드가 계속 늘리는 공유 목록이므로 뷰 행 수만큼만 사용
+        ids = view.ids[:view.count]
+
+        if previous is not None and previous.source_ids is view.ids and previous.count <= view.count:
+            # 뒤에 추가된 행만 인코딩
+            codes = np.concatenate((previous.codes, encode(view.encodings[previous.count:], codebooks)), axis=1)
+        else:
+            codes = np.empty((len(codebooks), view.count), dtype=np.uint8)
+            missing = np.ones(view.count, dtype=bool)
+            if stored is not None:
+                found, positions = match_stored_ids(stored["ids"], ids)
+                codes[:, found] = stored["codes"][:, positions]
+                missing = ~found
+            if missing.any():
+                rows = np.flatnonzero(missing)
+                codes[:, rows] = encode(view.encodings[rows], codebooks)
+
+        alive = view.alive if view.dead_count else None
+        return cls(codebooks, codes, view.encodings, alive, ids, rerank, source_ids=view.ids)
+
+    def update(self, view):
+        """새 뷰에 맞춘 인덱스 (코드북은 그대로 사용)"""
+        return PQIndex.from_view(view, self.codebooks, self.rerank, previous=self)
+
+    def __len__(self):
+        return self.count
+
+    def approximate_distances(self, query):
+        """ADC: 쿼리 하나와 모든 행의 근사 거리 제곱 (N,)"""
+        subspaces, _, sub_dim = self.codebooks.shape
+        parts = query.reshape(subspaces, sub_dim)
+
+        # 거리표 (M, 256) = ‖q_m‖² + ‖c‖² − 2·q_m·c
+        tables = self._codebook_norms - 2.0 * np.einsum("mkd,md->mk", self.codebooks, parts)
+        tables += np.einsum("md,md->m", parts, parts)[:, None]
+
+        distances = tables[0][self.codes[0]]
+        for m in range(1, subspaces):
+            distances += tables[m][self.codes[m]]
+        return distances
+
+    def search_topk(self, queries, k):
+        """
+        쿼리마다 근사 거리 상위 rerank개를 고른 뒤 원본 벡터로 정확한 거리 비교
+
+        Returns:
+            FaceIndex.search_topk()와 같음 (indices (M, k), distances (M, k))
+        """
+        dim = self.codebooks.shape[0] * self.codebooks.shape[2]
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, dim)
+        count = len(queries)
+        indices, distances = empty_topk(count, k)
+        if count == 0 or self.count == 0:
+            return indices, distances
+
+        rerank = max(self.rerank, k)
+        for i, query in enumerate(queries):
+            approx = self.approximate_distances(query)
+            if self.alive is not None:
+                approx[~self.alive] = np.inf
+
+            if self.count > rerank:
+                shortlist = np.argpartition(approx, rerank - 1)[:rerank]
+            else:
+                shortlist = np.arange(self.count)
+            shortlist = shortlist[np.isfinite(approx[shortlist])]
+            if len(shortlist) == 0:
+                continue
+
+            # 후보 행만 디스크에서 읽어 정확한 거리 계산 (순차 접근을 위해 정렬)
+            shortlist.sort()
+            candidates = np.asarray(self.encodings[shortlist], dtype=np.float32)
+            columns, distances[i] = top_k(squared_norms(candidates - query)[None, :], k)
+            indices[i] = shortlist[np.minimum(columns[0], len(shortlist) - 1)]
+
+        return indices, distances
+
+    def search(self, queries):
+        """
+        쿼리마다 최근접 행 찾기
+
+        Returns:
+            FaceIndex.search()와 같음 (best_indices, best_distances, margins)
+        """
+        return best_of(*self.search_topk(queries, 2))
+
+
+def load_or_train(path, view, rerank=DEFAULT_RERANK, subspaces=DEFAULT_SUBSPACES):
+    """
+    저장된 PQ 인덱스를 불러오거나 (없으면) 학습해서 뷰에 맞춘 인덱스 반환
+
+    뷰와 저장된 코드가 다르면 (새 등록/삭제) 갱신된 코드를 다시 저장
+    """
+    stored = load_pq(path)
+    dim = view.encodings.shape[1]
+    if stored is not None and stored["codebooks"].shape[0] * stored["codebooks"].shape[2] != dim:
+        stored = None
+
+    if stored is None:
+        live_rows = np.flatnonzero(view.alive)
+        print(f"[INFO] PQ 코드북 학습 중... ({len(live_rows)}명, 부분 공간 {subspaces}개)")
+        start_time = time.time()
+        codebooks = train_codebooks(view.encodings[live_rows], subspaces)
+        print(f"[INFO] PQ 코드북 학습 완료 ({time.time() - start_time:.1f}초)")
+    else:
+        codebooks = stored["codebooks"]
+
+    index = PQIndex.from_view(view, codebooks, rerank, stored=stored)
+
+    if stored is None or stored["generation"] != view.generation:
+        alive = np.asarray(view.alive, dtype=bool)
+        save_pq(path, codebooks, np.asarray(index.ids, dtype=np.int64)[alive],
+                index.codes[:, alive], view.generation)
+    return index
+
+
+def main():
+    import argparse
+    from database import DEFAULT_EMBEDDING_MODEL, EMBEDDING_MODELS, FaceDatabase
+    from live_gallery import LiveGallery
+
+    parser = argparse.ArgumentParser(description="PQ 갤러리 인덱스 학습")
+    parser.add_argument("--db", default="face_recognition.db", help="DB 파일 경로")
+    parser.add_argument("--model", choices=sorted(EMBEDDING_MODELS), default=DEFAULT_EMBEDDING_MODEL,
+                        help="인덱스를 만들 임베딩 모델의 갤러리")
+    parser.add_argument("--subspaces", type=int, default=DEFAULT_SUBSPACES,
+                        help="부분 공간 수 = 얼굴당 코드 바이트 수 (128의 약수)")
+    parser.add_argument("--rebuild", action="store_true", help="기존 인덱스를 지우고 다시 학습")
+    args = parser.parse_args()
+
+    db = FaceDatabase(args.db, embedding_model=args.model)
+    try:
+        path = pq_path(args.db, db.gallery_tag)
+        if args.rebuild and os.path.exists(path):
+            os.remove(path)
+
+        view = LiveGallery(db, disk_backed=True).view
+        if view.size == 0:
+            print("[WARN] 등록된 얼굴이 없습니다")
+            return 1
+        index = load_or_train(path, view, subspaces=args.subspaces)
+        print(f"[INFO] ✅ PQ 인덱스: {len(index)}명, 얼굴당 {index.codes.shape[0]}바이트 → {path}")
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return 1
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+출석(재실) 구간 추적 모듈
+같은 사람이 카메라 앞에 머무는 동안의 인식 결과를 메모리에서 하나의 구간으로 합치고,
+설정된 시간 이상 보이지 않으면 구간을 닫아 DB에 한 번만 기록하도록 함
+"""
+
+
+class PresenceInterval:
+    """한 사람의 연속 재실 구간"""
+    __slots__ = ("student_id", "name", "first_seen", "last_seen", "frame_count", "best_distance")
+
+    def __init__(self, student_id, name, timestamp, distance):
+        self.student_id = student_id
+        self.name = name
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.frame_count = 1
+        self.best_distance = distance
+
+    def as_tuple(self):
+        """DB 저장용 튜플 (student_id, name, first_seen, last_seen, frame_count, best_distance)"""
+        return (self.student_id, self.name, self.first_seen, self.last_seen,
+                self.frame_count, self.best_distance)
+
+
+class PresenceTracker:
+    """학번별 재실 구간을 메모리에서 갱신(upsert)하는 추적기 (단일 스레드에서 사용)"""
+
+    def __init__(self, absence_gap=10.0):
+        """
+        Args:
+            absence_gap: 이 시간(초) 이상 보이지 않으면 구간을 닫음
+        """
+        self.absence_gap = absence_gap
+        self.open_intervals = {}
+
+    def observe(self, student_id, name, distance, timestamp):
+        """
+        인식 결과 반영
+
+        Returns:
+            새 구간이 열렸으면 True (도착), 기존 구간이 갱신되었으면 False
+        """
+        interval = self.open_intervals.get(student_id)
+        if interval is None:
+            self.open_intervals[student_id] = PresenceInterval(student_id, name, timestamp, distance)
+            return True
+
+        interval.last_seen = timestamp
+        interval.frame_count += 1
+        if distance < interval.best_distance:
+            interval.best_distance = distance
+        return False
+
+    def expire(self, now):
+        """absence_gap 이상 보이지 않은 구간을 닫고 반환"""
+        expired = [student_id for student_id, interval in self.open_intervals.items()
+                   if now - interval.last_seen > self.absence_gap]
+        return [self.open_intervals.pop(student_id) for student_id in expired]
+
+    def close_all(self):
+        """열린 구간을 모두 닫고 반환 (인식 종료 시)"""
+        closed = list(self.open_intervals.values())
+        self.open_intervals.clear()
+        return closed
@@ -1,35 +1,59 @@
 """
 RetinaFace 얼굴 감지 모듈
-insightface 라이브러리를 사용하여 정확한 얼굴 감지
+models/retinaface.onnx가 있으면 onnxruntime 전용 엔진(retinaface_onnx)으로 감지만 실행하고,
+없으면 insightface 라이브러리(FaceAnalysis)를 사용
+
+감지 모델만 실행 (FaceAnalysis 기본 팩의 랜드마크 106점/성별·나이/인식 모델은 로드하지 않음,
+임베딩은 embedding_engine이 감지 결과의 랜드마크로 정렬해 계산)
 """
 import cv2
 import numpy as np
 from pathlib import Path
+from detections import Detections
+from retinaface_onnx import DEFAULT_MODEL_PATH, RetinaFaceONNX
 
 class RetinaFaceDetector:
-    """RetinaFace 기반 얼굴 감지기 (insightface 사용)"""
+    """RetinaFace 기반 얼굴 감지기 (ONNX 전용 엔진 우선, 없으면 insightface)"""
     
-    def __init__(self, model_path=None, conf_threshold=0.5, nms_threshold=0.4):
+    def __init__(self, model_path=None, conf_threshold=0.5, nms_threshold=0.4, det_size=640):
         """
         RetinaFace 초기화
         
         Args:
-            model_path: RetinaFace 모델 경로 (사용되지 않음, 호환성 유지)
+            model_path: RetinaFace ONNX 모델 경로 (None이면 models/retinaface.onnx)
             conf_threshold: 감지 신뢰도 임계값 (0.0-1.0)
             nms_threshold: NMS(Non-Maximum Suppression) 임계값
+            det_size: 감지 입력 크기 (640보다 작으면 빠르지만 작은 얼굴은 놓칠 수 있음)
         """
         self.conf_threshold = conf_threshold
         self.nms_threshold = nms_threshold
+        self.det_size = det_size
+        self.engine = None
+        self.app = None
+        
+        print(f"[INFO] RetinaFace 초기화: 신뢰도={conf_threshold}, 입력 크기={det_size}")
         
-        print(f"[INFO] RetinaFace 초기화: 신뢰도={conf_threshold}")
+        # 🔔 ONNX 모델 파일을 onnxruntime으로 직접 실행 (FaceAnalysis 전체를 띄우지 않음)
+        onnx_path = Path(model_path) if model_path else DEFAULT_MODEL_PATH
+        if onnx_path.exists():
+            try:
+                self.engine = RetinaFaceONNX(onnx_path, det_size, conf_threshold, nms_threshold)
+                self.device = self.engine.get_device_info()
+                print(f"[INFO] ✅ RetinaFace 모델 로드 완료 (onnxruntime: {onnx_path})")
+                return
+            except ImportError as e:
+                print(f"[WARN] onnxruntime이 없어 insightface로 전환합니다: {e}")
+            except Exception as e:
+                print(f"[WARN] RetinaFace ONNX 로드 실패, insightface로 전환합니다: {e}")
         
         # insightface 사용
         try:
             from insightface.app import FaceAnalysis
             
             print(f"[INFO] insightface RetinaFace 로드 중...")
-            self.app = FaceAnalysis(providers=['CPUExecutionProvider'])
-            self.app.prepare(ctx_id=0, det_size=(640, 640))
+            # 🔔 감지 모델만 로드 (얼굴마다 도는 분석 모델을 실행하지 않음)
+            self.app = FaceAnalysis(allowed_modules=['detection'], providers=['CPUExecutionProvider'])
+            self.app.prepare(ctx_id=0, det_size=(det_size, det_size), det_thresh=conf_threshold)
             self.device = "CPU"
             print("[INFO] ✅ RetinaFace 모델 로드 완료 (insightface)")
             
@@ -63,6 +87,32 @@ RetinaFace를 사용하려면 insightface를 설치해야 합니다.
             print(f"[ERROR] RetinaFace 초기화 실패: {e}")
             raise RuntimeError(f"RetinaFace 모델 로드 실패: {e}")
     
+    def detect(self, image):
+        """
+        이미지에서 얼굴 감지 (구조화된 결과)
+        
+        Args:
+            image: RGB 이미지 (numpy array)
+        
+        Returns:
+            Detections
+                boxes: (N, 4) (top, right, bottom, left) face_recognition 순서
+                scores: (N,) 감지 신뢰도
+                landmarks: (N, 5, 2) 5점 랜드마크 (눈 2, 코, 입꼬리 2) 원본 좌표
+        """
+        height, width = image.shape[:2]
+        
+        if self.engine is not None:
+            boxes, scores, landmarks = self.engine.detect(image)
+        else:
+            # BGR 변환 (insightface는 BGR 사용)
+            faces = self.app.get(cv2.cvtColor(image, cv2.COLOR_RGB2BGR))
+            boxes = np.array([face.bbox for face in faces], dtype=np.float32).reshape(-1, 4)
+            scores = np.array([face.det_score for face in faces], dtype=np.float32)
+            landmarks = np.array([face.kps for face in faces], dtype=np.float32).reshape(-1, 5, 2)
+        
+        return Detections.from_xyxy(boxes, scores, landmarks, height, width)
+    
     def detect_faces(self, image, upsample_times=0):
         """
         이미지에서 얼굴 감지
@@ -76,37 +126,7 @@ RetinaFace를 사용하려면 insightface를 설치해야 합니다.
                            face_recognition 형식과 호환
         """
         try:
-            # BGR 변환 (insightface는 BGR 사용)
-            image_bgr = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-            
-            # 얼굴 감지
-            faces = self.app.get(image_bgr)
-            
-            # face_recognition 형식으로 변환
-            face_locations = []
-            for face in faces:
-                # bbox 형식: [x1, y1, x2, y2]
-                bbox = face.bbox.astype(int)
-                x1, y1, x2, y2 = bbox
-                
-                # face_recognition 형식: (top, right, bottom, left)
-                top = y1
-                right = x2
-                bottom = y2
-                left = x1
-                
-                # 이미지 범위 내로 클리핑
-                h, w = image.shape[:2]
-                top = max(0, min(top, h))
-                bottom = max(0, min(bottom, h))
-                left = max(0, min(left, w))
-                right = max(0, min(right, w))
-                
-                # 유효한 박스만 추가
-                if bottom > top and right > left:
-                    face_locations.append((top, right, bottom, left))
-            
-            return face_locations
+            return self.detect(image).to_legacy()
             
         except Exception as e:
             print(f"[ERROR] RetinaFace 감지 오류: {e}")
@@ -116,9 +136,22 @@ RetinaFace를 사용하려면 insightface를 설치해야 합니다.
         """현재 사용 중인 디바이스 정보 반환"""
         return f"{self.device}"
     
+    def set_det_size(self, det_size):
+        """감지 입력 크기 변경 (insightface 모드는 다시 시작해야 적용)"""
+        if det_size == self.det_size:
+            return
+        self.det_size = det_size
+        if self.engine is not None:
+            self.engine.set_det_size(det_size)
+            print(f"[INFO] RetinaFace 입력 크기 변경: {det_size}")
+        else:
+            print(f"[WARN] insightface 모드에서는 입력 크기 변경이 다시 시작한 뒤 적용됩니다: {det_size}")
+    
     def set_confidence_threshold(self, threshold):
         """신뢰도 임계값 변경"""
         self.conf_threshold = threshold
+        if self.engine is not None:
+            self.engine.conf_threshold = threshold
         print(f"[INFO] RetinaFace 신뢰도 임계값 변경: {threshold}")
 
 
@@ -0,0 +1,195 @@
+"""
+RetinaFace(SCRFD) ONNX Runtime 감지 엔진
+download_retinaface.py가 복사한 models/retinaface.onnx (insightface det_10g)를
+insightface.app.FaceAnalysis 없이 onnxruntime으로 직접 실행
+
+    1. 레터박스 전처리: 비율을 유지해 det_size 입력의 왼쪽 위에 축소, 입력 버퍼는 재사용
+    2. stride 8/16/32 출력의 앵커 중심(캐시)에서 박스/랜드마크를 NumPy로 한 번에 복원
+    3. 점수 순 탐욕적 NMS (insightface와 같은 결과, 단계마다 남은 후보와의 IoU를 한 번에 계산)
+
+det_size를 640보다 작게(예: 320, 480) 주면 작은 얼굴 감지는 줄지만 추론이 크게 빨라짐
+"""
+import cv2
+import numpy as np
+from pathlib import Path
+from detections import Detections
+
+DEFAULT_MODEL_PATH = Path("models") / "retinaface.onnx"
+DEFAULT_DET_SIZE = 640
+STRIDES = (8, 16, 32)
+NUM_ANCHORS = 2  # 위치마다 앵커 2개 (det_10g/det_500m 공통)
+MAX_CANDIDATES = 1000  # NMS 전 점수 상위 후보 수
+PAD_VALUE = -127.5 / 128.0  # 레터박스 여백 (검은 픽셀을 정규화한 값)
+
+
+def _size_pair(det_size):
+    """det_size (정수 또는 (너비, 높이)) → 32의 배수로 맞춘 (너비, 높이)"""
+    width, height = (det_size, det_size) if np.isscalar(det_size) else det_size
+    return max(32, int(width) // 32 * 32), max(32, int(height) // 32 * 32)
+
+
+def distance_to_boxes(centers, distances):
+    """앵커 중심 (N, 2) + (왼, 위, 오른, 아래) 거리 (N, 4) → (x1, y1, x2, y2) 박스"""
+    return np.concatenate((centers - distances[:, :2], centers + distances[:, 2:]), axis=1)
+
+
+def distance_to_landmarks(centers, offsets):
+    """앵커 중심 (N, 2) + 랜드마크 오프셋 (N, 10) → (N, 5, 2) 좌표"""
+    return centers[:, None, :] + offsets.reshape(-1, 5, 2)
+
+
+def nms(boxes, scores, threshold):
+    """
+    탐욕적(greedy) NMS (insightface SCRFD와 같은 결과)
+
+    점수가 가장 높은 남은 박스를 고르고, 그 박스와 threshold 넘게 겹치는
+    나머지 후보를 한 번에 제거하는 과정을 반복 (단계마다 벡터화)
+    이미 제거된 박스는 다른 박스를 제거하지 않으므로 붐비는 장면에서도 과하게 지우지 않음
+
+    Returns:
+        남길 후보 번호 (점수 내림차순)
+    """
+    order = np.argsort(-scores, kind="stable")[:MAX_CANDIDATES]
+    x1, y1, x2, y2 = boxes[order].T
+    # insightface와 같이 픽셀 경계를 포함한 넓이 (+1)
+    areas = (x2 - x1 + 1) * (y2 - y1 + 1)
+
+    keep = []
+    remaining = np.arange(len(order))
+    while len(remaining):
+        best, rest = remaining[0], remaining[1:]
+        keep.append(best)
+        inter_w = np.maximum(0.0, np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest]) + 1)
+        inter_h = np.maximum(0.0, np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest]) + 1)
+        inter = inter_w * inter_h
+        iou = inter / (areas[best] + areas[rest] - inter)
+        remaining = rest[iou <= threshold]
+    return order[np.asarray(keep, dtype=np.intp)]
+
+
+class RetinaFaceONNX:
+    """onnxruntime으로 직접 실행하는 RetinaFace(SCRFD) 감지 엔진"""
+
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, det_size=DEFAULT_DET_SIZE,
+                 conf_threshold=0.5, nms_threshold=0.4, providers=None):
+        """
+        Args:
+            model_path: ONNX 모델 경로 (기본 models/retinaface.onnx)
+            det_size: 입력 크기 (정수 또는 (너비, 높이), 32의 배수로 맞춤)
+            conf_threshold: 감지 신뢰도 임계값
+            nms_threshold: NMS IoU 임계값
+            providers: onnxruntime 실행 프로바이더 (None이면 사용 가능한 GPU 우선)
+        """
+        import onnxruntime
+
+        model_path = Path(model_path)
+        if not model_path.exists():
+            raise FileNotFoundError(f"RetinaFace 모델이 없습니다: {model_path} (python download_retinaface.py)")
+
+        if providers is None:
+            available = onnxruntime.get_available_providers()
+            providers = [p for p in ("CUDAExecutionProvider", "CPUExecutionProvider") if p in available]
+
+        self.session = onnxruntime.InferenceSession(str(model_path), providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_names = [output.name for output in self.session.get_outputs()]
+        self.has_landmarks = len(self.output_names) == 3 * len(STRIDES)
+        self.device = self.session.get_providers()[0].replace("ExecutionProvider", "")
+
+        self.conf_threshold = conf_threshold
+        self.nms_threshold = nms_threshold
+        self.set_det_size(det_size)
+
+    def set_det_size(self, det_size):
+        """입력 크기 변경 (입력 버퍼와 앵커 캐시를 새로 만듦)"""
+        self.det_size = _size_pair(det_size)
+        width, height = self.det_size
+        self._input = np.full((1, 3, height, width), PAD_VALUE, dtype=np.float32)
+        self._filled = (height, width)  # 직전 레터박스 이미지가 채운 영역
+        self._centers = {}
+
+    def _anchor_centers(self, stride):
+        """stride별 앵커 중심 (H/s × W/s × 앵커 수, 2) (입력 크기마다 한 번만 계산)"""
+        centers = self._centers.get(stride)
+        if centers is None:
+            width, height = self.det_size
+            ys, xs = np.mgrid[:height // stride, :width // stride]
+            centers = (np.stack((xs, ys), axis=-1).reshape(-1, 2) * stride).astype(np.float32)
+            centers = self._centers[stride] = np.repeat(centers, NUM_ANCHORS, axis=0)
+        return centers
+
+    def _letterbox(self, image):
+        """
+        RGB 이미지를 비율 유지로 축소해 입력 버퍼 왼쪽 위에 정규화하여 씀
+
+        Returns:
+            원본 좌표로 되돌릴 배율 (원본 / 입력)
+        """
+        width, height = self.det_size
+        image_height, image_width = image.shape[:2]
+        scale = min(width / image_width, height / image_height)
+        new_width = max(1, int(round(image_width * scale)))
+        new_height = max(1, int(round(image_height * scale)))
+        resized = cv2.resize(image, (new_width, new_height))
+
+        # 이전 프레임보다 작게 채우면 남은 영역을 여백 값으로 되돌림 (보통 카메라 해상도가 같아 생략)
+        if self._filled != (new_height, new_width):
+            self._input.fill(PAD_VALUE)
+            self._filled = (new_height, new_width)
+
+        region = self._input[0, :, :new_height, :new_width]
+        np.subtract(resized.transpose(2, 0, 1), 127.5, out=region, casting="unsafe")
+        region *= 1.0 / 128.0
+        return 1.0 / scale
+
+    def detect(self, image):
+        """
+        얼굴 감지
+
+        Args:
+            image: RGB 이미지 (H, W, 3) uint8
+
+        Returns:
+            (boxes (N, 4) float32 원본 좌표 x1, y1, x2, y2,
+             scores (N,) float32,
+             landmarks (N, 5, 2) float32 또는 None) 점수 내림차순
+        """
+        scale = self._letterbox(image)
+        outputs = self.session.run(self.output_names, {self.input_name: self._input})
+        count = len(STRIDES)
+
+        boxes, scores, landmarks = [], [], []
+        for i, stride in enumerate(STRIDES):
+            stride_scores = outputs[i].reshape(-1)
+            keep = np.flatnonzero(stride_scores >= self.conf_threshold)
+            if len(keep) == 0:
+                continue
+            centers = self._anchor_centers(stride)[keep]
+            scores.append(stride_scores[keep])
+            boxes.append(distance_to_boxes(centers, outputs[i + count].reshape(-1, 4)[keep] * stride))
+            if self.has_landmarks:
+                landmarks.append(distance_to_landmarks(centers, outputs[i + 2 * count].reshape(-1, 10)[keep] * stride))
+
+        if not scores:
+            empty_landmarks = np.zeros((0, 5, 2), dtype=np.float32) if self.has_landmarks else None
+            return np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32), empty_landmarks
+
+        scores = np.concatenate(scores)
+        boxes = np.concatenate(boxes) * scale
+        keep = nms(boxes, scores, self.nms_threshold)
+        if self.has_landmarks:
+            return boxes[keep], scores[keep], np.concatenate(landmarks)[keep] * scale
+        return boxes[keep], scores[keep], None
+
+    def detect_faces(self, image):
+        """
+        얼굴 감지 (face_recognition 형식)
+
+        Returns:
+            [(top, right, bottom, left), ...] 이미지 범위로 자른 정수 좌표
+        """
+        return Detections.from_xyxy(*self.detect(image), *image.shape[:2]).to_legacy()
+
+    def get_device_info(self):
+        """현재 사용 중인 실행 프로바이더"""
+        return self.device
@@ -0,0 +1,109 @@
+"""
+명단 범위(scope) 매칭 모듈
+인식 세션을 학과/학년 또는 학번 목록으로 좁혀 그 명단의 부분 행렬만 비교하고,
+범위 안에서 매칭에 실패한 얼굴만 (선택적으로) 전체 갤러리에서 다시 찾음
+"""
+import numpy as np
+from face_index import FaceIndex, best_of
+
+
+class RosterScope:
+    """인식 범위 (빈 조건은 제한 없음, 조건끼리는 AND)"""
+
+    def __init__(self, department=None, grade=None, student_ids=None):
+        self.department = department or None
+        self.grade = grade or None
+        self.student_ids = frozenset(student_ids) if student_ids else None
+
+    @classmethod
+    def from_settings(cls, settings):
+        """ScreenManager.settings → RosterScope (조건이 하나도 없으면 None)"""
+        scope = cls(
+            settings.get('scope_department'),
+            settings.get('scope_grade'),
+            settings.get('scope_student_ids')
+        )
+        return scope if scope else None
+
+    def __bool__(self):
+        return any(value is not None for value in (self.department, self.grade, self.student_ids))
+
+    @property
+    def key(self):
+        """범위 식별 키 (부분 행렬 캐시용)"""
+        return (self.department, self.grade, self.student_ids)
+
+    def describe(self):
+        """화면/로그 표시용 설명"""
+        parts = []
+        if self.department:
+            parts.append(self.department)
+        if self.grade:
+            parts.append(f"{self.grade}학년")
+        if self.student_ids is not None:
+            parts.append(f"학번 {len(self.student_ids)}개")
+        return " / ".join(parts) if parts else "전체"
+
+    def rows(self, view):
+        """뷰에서 범위에 속하고 삭제되지 않은 행 번호 (int 배열)"""
+        mask = np.array(view.alive, dtype=bool)
+        if self.department is not None:
+            mask &= np.fromiter((d == self.department for d in view.departments[:view.count]), bool, view.count)
+        if self.grade is not None:
+            mask &= np.fromiter((g == self.grade for g in view.grades[:view.count]), bool, view.count)
+        if self.student_ids is not None:
+            mask &= np.fromiter((s in self.student_ids for s in view.student_ids[:view.count]), bool, view.count)
+        return np.flatnonzero(mask)
+
+
+class ScopedIndex:
+    """
+    범위 부분 행렬 검색 + 전체 갤러리 대체 검색 (FaceIndex와 같은 search() 인터페이스)
+
+    부분 행렬은 뷰가 바뀔 때 한 번만 복사하므로 프레임마다의 비용은 명단 크기에 비례
+    """
+
+    def __init__(self, view, scope, fallback=None, fallback_threshold=None):
+        """
+        Args:
+            view: LiveGallery의 GalleryView
+            scope: RosterScope
+            fallback: 범위 안에서 매칭 실패 시 사용할 전체 갤러리 인덱스 (None이면 대체 검색 안 함)
+            fallback_threshold: 범위 안 최단 거리가 이 값보다 크면 대체 검색
+        """
+        self.scope = scope
+        self.rows = scope.rows(view)
+        self.index = FaceIndex(view.encodings[self.rows], view.sq_norms[self.rows])
+        self.fallback = fallback
+        self.fallback_threshold = fallback_threshold
+
+    def __len__(self):
+        return len(self.rows)
+
+    def search_topk(self, queries, k):
+        """
+        범위 안에서 먼저 검색하고, 최근접이 임계값을 넘은 쿼리만 전체 갤러리에서 다시 검색
+
+        Returns:
+            FaceIndex.search_topk()와 같음 (행 번호는 뷰 기준)
+        """
+        indices, distances = self.index.search_topk(queries, k)
+        if len(self.rows):
+            indices = self.rows[np.minimum(indices, len(self.rows) - 1)]
+
+        if self.fallback is not None and self.fallback_threshold is not None:
+            failed = np.flatnonzero(distances[:, 0] > self.fallback_threshold)
+            if len(failed):
+                queries = np.asarray(queries, dtype=np.float32).reshape(len(distances), -1)
+                indices[failed], distances[failed] = self.fallback.search_topk(queries[failed], k)
+
+        return indices, distances
+
+    def search(self, queries):
+        """
+        범위 검색 + 대체 검색으로 최근접 행 찾기
+
+        Returns:
+            FaceIndex.search()와 같음 (행 번호는 뷰 기준)
+        """
+        return best_of(*self.search_topk(queries, 2))
@@ -7,6 +7,7 @@ import torch
 import cv2
 import numpy as np
 from pathlib import Path
+from detections import Detections
 
 # 🔔 ultralytics 라이브러리가 YOLOv8과 v5를 모두 처리
 try:
@@ -80,16 +81,15 @@ class YOLOFaceDetector:
         
         return None
     
-    def detect_faces(self, image):
+    def detect(self, image):
         """
-        이미지에서 얼굴 감지
+        이미지에서 얼굴 감지 (구조화된 결과)
         
         Args:
             image: RGB 이미지 (numpy array)
         
         Returns:
-            face_locations: 얼굴 위치 리스트 [(top, right, bottom, left), ...]
-                           face_recognition 형식과 호환
+            Detections (박스, 신뢰도, 모델이 키포인트를 내면 5점 랜드마크)
         """
         # 🔔 수정: upsample_times 인자 및 로직 제거
         # (입력 이미지는 screen_manager에서 이미 스케일링됨)
@@ -103,28 +103,26 @@ class YOLOFaceDetector:
             device=self.device
         )
         
-        # 결과 파싱 (ultralytics v8 형식)
+        # 🔔 결과를 배열 그대로 변환 (얼굴마다 도는 파이썬 루프 없이 좌표 변환 + 클리핑)
         boxes = results[0].boxes
-        detections = boxes.xyxy.cpu().numpy()  # [x1, y1, x2, y2]
+        keypoints = getattr(results[0], "keypoints", None)
+        landmarks = None
+        if keypoints is not None and keypoints.xy.shape[1:] == (5, 2):
+            landmarks = keypoints.xy.cpu().numpy()  # yolov8-face: 눈 2, 코, 입꼬리 2
+        return Detections.from_xyxy(boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), landmarks, h, w)
+    
+    def detect_faces(self, image):
+        """
+        이미지에서 얼굴 감지
         
-        face_locations = []
-        for (x1, y1, x2, y2) in detections:
-            # 좌표 변환: YOLO (x1, y1, x2, y2) → face_recognition (top, right, bottom, left)
-            # 🔔 수정: scale 보정 제거
-            top = int(y1)
-            right = int(x2)
-            bottom = int(y2)
-            left = int(x1)
-            
-            # 이미지 범위 내로 클리핑
-            top = max(0, min(top, h))
-            bottom = max(0, min(bottom, h))
-            left = max(0, min(left, w))
-            right = max(0, min(right, w))
-            
-            face_locations.append((top, right, bottom, left))
+        Args:
+            image: RGB 이미지 (numpy array)
         
-        return face_locations
+        Returns:
+            face_locations: 얼굴 위치 리스트 [(top, right, bottom, left), ...]
+                           face_recognition 형식과 호환
+        """
+        return self.detect(image).to_legacy()
     
     def get_device_info(self):
         """현재 사용 중인 디바이스 정보 반환"""